@@ -4,10 +4,17 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import os
+import pathlib
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 import uenv
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
+
+from cached_build import CachedBuildMixin  # noqa: E402
+
 arbor_references = {
     'gh200': {
         'serial': {
@@ -43,7 +50,7 @@ class arbor_download(rfm.RunOnlyRegressionTest):
         return sn.assert_eq(self.job.exitcode, 0)
 
 
-class arbor_build(rfm.CompileOnlyRegressionTest):
+class arbor_build(rfm.CompileOnlyRegressionTest, CachedBuildMixin):
     descr = 'Build Arbor'
     valid_systems = ['*']
     valid_prog_environs = ['+arbor-dev']
@@ -67,6 +74,7 @@ class arbor_build(rfm.CompileOnlyRegressionTest):
         self.prebuild_cmds = [
             f'tar --strip-components=1 -xzf {tarsource} -C {self.stagedir}'
         ]
+        self.build_cache_sources = [tarsource]
 
         self.build_system.config_opts = [
             '-DARB_WITH_MPI=on',
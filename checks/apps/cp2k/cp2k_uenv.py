@@ -4,7 +4,9 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import os
+import pathlib
 import shutil
+import sys
 from packaging.version import Version
 import re
 
@@ -14,6 +16,12 @@ import reframe.utility.udeps as udeps
 from reframe.core.builtins import xfail
 from uenv import uarch
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
+
+from cached_build import CachedBuildMixin  # noqa: E402
+from mirrored_download import MirroredDownloadMixin  # noqa: E402
+from perf_references import PerfReferencesMixin  # noqa: E402
+
 cp2k_references = {
     'md': {
         'gh200': {'time_run': xfail('Known performance regression', (45, None, 0.05, 's'))},
@@ -95,7 +103,7 @@ def version_from_uenv():
     'CP2K 2025.1 issues with libxc linking.',
     lambda test: test.version == "2025.1"
 )
-class cp2k_download(rfm.RunOnlyRegressionTest):
+class cp2k_download(rfm.RunOnlyRegressionTest, MirroredDownloadMixin):
     version = variable(str, value='')
     descr = 'Download CP2K source code'
     sourcesdir = None
@@ -113,10 +121,8 @@ class cp2k_download(rfm.RunOnlyRegressionTest):
 
         url = 'https://jfrog.svc.cscs.ch/artifactory/cscs-reframe-tests'
 
-        self.executable_opts = [
-            '--quiet',
-            f'{url}/cp2k/v{self.version}.tar.gz'
-        ]
+        self.download_url = f'{url}/cp2k/v{self.version}.tar.gz'
+        self.executable_opts = ['--quiet', self.download_url]
 
     @sanity_function
     def validate_download(self):
@@ -127,7 +133,7 @@ class cp2k_download(rfm.RunOnlyRegressionTest):
 
 
 @rfm.simple_test
-class Cp2kBuildTestUENV(rfm.CompileOnlyRegressionTest):
+class Cp2kBuildTestUENV(rfm.CompileOnlyRegressionTest, CachedBuildMixin):
     descr = 'CP2K Build Test'
     valid_prog_environs = ['+cp2k-dev -dlaf']
     valid_systems = ['+uenv']
@@ -156,6 +162,7 @@ class Cp2kBuildTestUENV(rfm.CompileOnlyRegressionTest):
         self.prebuild_cmds = [
             f'tar --strip-components=1 -xzf {tarsource} -C {self.stagedir}'
         ]
+        self.build_cache_sources = [tarsource]
 
         try:
             self.build_system.config_opts = self.current_environ.extras['cmake'].split()
@@ -193,7 +200,7 @@ class Cp2kBuildTestUENV(rfm.CompileOnlyRegressionTest):
         return os.path.isfile(self.cp2k_executable)
 
 
-class Cp2kCheck_UENV(rfm.RunOnlyRegressionTest):
+class Cp2kCheck_UENV(rfm.RunOnlyRegressionTest, PerfReferencesMixin):
     maintainers = ['SSA']
     valid_systems = ['+uenv']
     valid_prog_environs = ['+cp2k -dlaf']
@@ -3,11 +3,17 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 import os
+import pathlib
+import sys
 
 import reframe as rfm
 import reframe.utility.sanity as sn
 from uenv import uarch
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
+
+from cached_build import CachedBuildMixin  # noqa: E402
+
 gromacs_references = {
     'STMV': {
         'gh200': {
@@ -70,7 +76,7 @@ class gromacs_download(rfm.RunOnlyRegressionTest):
 
 
 @rfm.simple_test
-class gromacs_build_test(rfm.CompileOnlyRegressionTest):
+class gromacs_build_test(rfm.CompileOnlyRegressionTest, CachedBuildMixin):
     """
     Test GROMACS build from source using the develop view
     """
@@ -95,6 +101,7 @@ class gromacs_build_test(rfm.CompileOnlyRegressionTest):
             f'v{self.gromacs_sources.version}.tar.gz'
         )
         self.prebuild_cmds = [f'tar --strip-components=1 -xzf {tarsource}']
+        self.build_cache_sources = [tarsource]
         self.build_system.config_opts = [
             '-DREGRESSIONTEST_DOWNLOAD=OFF',
             '-DGMX_MPI=ON',
@@ -3,11 +3,18 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 import os
+import pathlib
+import sys
 
 import reframe as rfm
 import reframe.utility.sanity as sn
 from uenv import uarch
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
+
+from cached_build import CachedBuildMixin  # noqa: E402
+from mirrored_download import MirroredDownloadMixin  # noqa: E402
+
 lammps_references = {
     'lj_gpu': {
         'gh200': {'time_run': (45, None, 0.05, 's')},
@@ -49,16 +56,16 @@ slurm_config = {
 }
 
 
-class lammps_download(rfm.RunOnlyRegressionTest):
+class lammps_download(rfm.RunOnlyRegressionTest, MirroredDownloadMixin):
     descr = 'Download LAMMPS source code'
     version = variable(str, value='20230802.3')
     sourcesdir = None
-    executable = 'wget'
-    executable_opts = [
-        '--quiet',
+    download_url = (
         'https://jfrog.svc.cscs.ch/artifactory/cscs-reframe-tests/lammps/'
-        'LAMMPS_20230802.3_Source.tar.gz',
-    ]
+        'LAMMPS_20230802.3_Source.tar.gz'
+    )
+    executable = 'wget'
+    executable_opts = ['--quiet', download_url]
     local = True
 
     @sanity_function
@@ -67,7 +74,7 @@ class lammps_download(rfm.RunOnlyRegressionTest):
 
 
 @rfm.simple_test
-class lammps_build_test(rfm.CompileOnlyRegressionTest):
+class lammps_build_test(rfm.CompileOnlyRegressionTest, CachedBuildMixin):
     '''
     Test LAMMPS build from source using the develop-kokkos view
     '''
@@ -99,6 +106,7 @@ class lammps_build_test(rfm.CompileOnlyRegressionTest):
         )
         # Extract source code
         self.prebuild_cmds = [f'tar zxf {tarsource}']
+        self.build_cache_sources = [tarsource]
 
     @sanity_function
     def validate_test(self):
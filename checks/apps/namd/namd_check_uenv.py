@@ -4,12 +4,19 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import os
+import pathlib
+import sys
 
 import reframe as rfm
 import reframe.utility.sanity as sn
 import reframe.utility.udeps as udeps
 import uenv
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
+
+from cached_build import CachedBuildMixin  # noqa: E402
+from mirrored_download import MirroredDownloadMixin  # noqa: E402
+
 namd_references = {
     'stmv': {
         'gh200': {'ns_day': (86, -0.05, None, 'ns/day')}, 
@@ -37,7 +44,7 @@ slurm_config = {
 }
 
 
-class namd_download(rfm.RunOnlyRegressionTest):
+class namd_download(rfm.RunOnlyRegressionTest, MirroredDownloadMixin):
     '''
     Download NAMD source code.
     '''
@@ -51,12 +58,15 @@ class namd_download(rfm.RunOnlyRegressionTest):
 
     @run_before('run')
     def set_args(self):
+        self.download_url = (f'{self.artifactory}/'
+                             f'uenv-sources/namd/NAMD_{self.version}_Source'
+                             f'.tar.gz')
+        self.download_auth = 'CSCS_REGISTRY'
         self.executable_opts = [
             '-f',  # Try to have curl not return 0 on server error
             '-L',
             '-u', '${CSCS_REGISTRY_USERNAME}:${CSCS_REGISTRY_PASSWORD}',
-            f'{self.artifactory}/'
-            f'uenv-sources/namd/NAMD_{self.version}_Source.tar.gz',
+            self.download_url,
             '--output', f'NAMD_{self.version}_Source.tar.gz',
         ]
 
@@ -65,7 +75,7 @@ class namd_download(rfm.RunOnlyRegressionTest):
         return sn.assert_eq(self.job.exitcode, 0)
 
 
-class namd_input_download(rfm.RunOnlyRegressionTest):
+class namd_input_download(rfm.RunOnlyRegressionTest, MirroredDownloadMixin):
     '''
     Download NAMD input files.
     '''
@@ -78,10 +88,12 @@ class namd_input_download(rfm.RunOnlyRegressionTest):
 
     @run_before('run')
     def set_args(self):
+        self.download_url = (f'{self.artifactory}/cscs-reframe-tests/'
+                             f'NAMD-uenv.tar.gz')
         self.executable_opts = [
             '-f',  # Try to have curl not return 0 on server error
             '-L',
-            f'{self.artifactory}/cscs-reframe-tests/NAMD-uenv.tar.gz',
+            self.download_url,
             '--output', f'NAMD-uenv.tar.gz',
         ]
 
@@ -136,7 +148,7 @@ class AutotoolsCustom(rfm.core.buildsystems.Autotools):
 
 
 @rfm.simple_test
-class NamdBuildTestUENV(rfm.CompileOnlyRegressionTest):
+class NamdBuildTestUENV(rfm.CompileOnlyRegressionTest, CachedBuildMixin):
     '''
     Test NAMD build from source.
     '''
@@ -175,6 +187,7 @@ class NamdBuildTestUENV(rfm.CompileOnlyRegressionTest):
             # Link against tcl8.6 (provided by the UENV)
             'sed -i \'s/-ltcl8.5/-ltcl8.6/g\' arch/Linux-ARM64.tcl',
         ]
+        self.build_cache_sources = [tarsource]
 
         # UENV_MOUNT_POINT is not available outside of an UENV
         prefix = os.path.join('/user-environment', 'env',
@@ -3,12 +3,18 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
+import pathlib
+import sys
+
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
+from selective_pull import SelectivePullMixin  # noqa: E402
+
 
 @rfm.simple_test
-class HDF5Test(rfm.RegressionTest):
+class HDF5Test(rfm.RegressionTest, SelectivePullMixin):
     lang = parameter(['c', 'f90'])
     linkage = parameter(['dynamic'])
     valid_prog_environs = ['PrgEnv-aocc', 'PrgEnv-cray', 'PrgEnv-gnu']
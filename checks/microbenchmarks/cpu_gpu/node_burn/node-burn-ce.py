@@ -15,15 +15,23 @@ sys.path.append(str(pathlib.Path(__file__).parent.parent.parent.parent /
                     'mixins'))
 
 from container_engine import ContainerEngineMixin  # noqa: E402
+from node_perf import NodePerfMixin  # noqa: E402
+from output_digest import OutputDigestMixin  # noqa: E402
+from perf_references import PerfReferencesMixin  # noqa: E402
 
 
-class NodeBurnCE(rfm.RunOnlyRegressionTest, ContainerEngineMixin):
+class NodeBurnCE(rfm.RunOnlyRegressionTest, ContainerEngineMixin,
+                 OutputDigestMixin, PerfReferencesMixin, NodePerfMixin):
     '''The base class of the node burn test using the Container Engine.
 
        Every child class of `NodeBurnCE` can be made flexible on demand by
        using the `-S flexible=True` cli option of ReFrame and further control
        of the flexible node allocation can be achieved using the
        `--flex-alloc-nodes` option.
+
+       The results of every node and device are written to `node_perf.csv`
+       and the nodes that are slower than the others or than the reference
+       to `slow_nodes.json`.
     '''
 
     image_repository = 'jfrog.svc.cscs.ch#reframe-oci/node-burn'
@@ -41,6 +49,11 @@ class NodeBurnCE(rfm.RunOnlyRegressionTest, ContainerEngineMixin):
         else:
             self.num_tasks = self.num_tasks_per_node
 
+    @run_after('init')
+    def set_digest_patterns(self):
+        # Keep only the result lines of the nodes
+        self.digest_patterns = [rf'nid\d+:{self.test_hw}']
+
     @property
     @deferrable
     def num_tasks_assigned(self):
@@ -51,7 +64,7 @@ class NodeBurnCE(rfm.RunOnlyRegressionTest, ContainerEngineMixin):
         regex = rf'(nid\d+):{self.test_hw}.*\s+(\d+\.\d+)\s+\S+'
 
         # Count the number of output performance values per node
-        nodes = sn.extractall(regex, self.stdout, 1, str)
+        nodes = sn.extractall(regex, self.output_digest, 1, str)
         node_counter = collections.Counter(nodes)
         num_res = sn.count(nodes)
 
@@ -85,8 +98,8 @@ class NodeBurnGemmCE(NodeBurnCE):
 
     @performance_function('GFlops')
     def nb_gflops(self):
-        regex = rf'nid\d+:{self.test_hw}.*\s+(\d+\.\d+)\s+GFlops,'
-        return sn.min(sn.extractall(regex, self.stdout, 1, float))
+        return self.node_perf('nb_gflops', self.test_hw, 'GFlops',
+                              self.output_digest)
 
 
 class NodeBurnStreamCE(NodeBurnCE):
@@ -103,8 +116,8 @@ class NodeBurnStreamCE(NodeBurnCE):
 
     @performance_function('GB/s')
     def nb_gbps(self):
-        regex = rf'nid\d+:{self.test_hw}.*\s+(\d+\.\d+)\s+GB/s,'
-        return sn.min(sn.extractall(regex, self.stdout, 1, float))
+        return self.node_perf('nb_gbps', self.test_hw, 'GB/s',
+                              self.output_digest)
 
 
 @rfm.simple_test
@@ -3,11 +3,18 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 import os
+import pathlib
+import sys
 
 import reframe as rfm
 import reframe.utility.sanity as sn
 import uenv
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent.parent /
+                    'mixins'))
+
+from perf_references import PerfReferencesMixin  # noqa: E402
+
 
 ref_nb_gflops = {
     'a100': {'nb_gflops': (9746*2*0.85, -0.1, None, 'GFlops')},
@@ -19,7 +26,7 @@ ref_nb_gflops = {
 
 
 @rfm.simple_test
-class baremetal_cuda_node_burn(rfm.RegressionTest):
+class baremetal_cuda_node_burn(rfm.RegressionTest, PerfReferencesMixin):
     valid_systems = ['+nvgpu +remote']
     valid_prog_environs = ['builtin']
     num_gpus = variable(int, value=4)
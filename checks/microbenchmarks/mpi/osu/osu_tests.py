@@ -15,11 +15,13 @@ sys.path.append(
     str(pathlib.Path(__file__).parent.parent.parent.parent / 'mixins')
 )
 
+from cached_build import CachedBuildMixin
 from extra_launcher_options import ExtraLauncherOptionsMixin
 from container_engine import ContainerEngineCPEMixin
+from mirrored_download import MirroredDownloadMixin
 
 
-class fetch_osu_benchmarks(rfm.RunOnlyRegressionTest):
+class fetch_osu_benchmarks(rfm.RunOnlyRegressionTest, MirroredDownloadMixin):
     '''Fixture for fetching the OSU benchmarks.'''
 
     #: The version of the benchmarks to fetch.
@@ -30,7 +32,8 @@ class fetch_osu_benchmarks(rfm.RunOnlyRegressionTest):
 
     local = True
     osu_file_name = f'osu-micro-benchmarks-{version}.tar.gz'
-    executable = f'curl -LJO http://mvapich.cse.ohio-state.edu/download/mvapich/{osu_file_name}'  # noqa: E501
+    download_url = f'http://mvapich.cse.ohio-state.edu/download/mvapich/{osu_file_name}'  # noqa: E501
+    executable = f'curl -LJO {download_url}'
 
     @sanity_function
     def validate_download(self):
@@ -38,7 +41,7 @@ class fetch_osu_benchmarks(rfm.RunOnlyRegressionTest):
 
 
 class build_osu_benchmarks(rfm.CompileOnlyRegressionTest,
-                           ContainerEngineCPEMixin):
+                           ContainerEngineCPEMixin, CachedBuildMixin):
     '''Fixture for building the OSU benchmarks'''
 
     #: Build variant parameter.
@@ -122,6 +125,7 @@ class build_osu_benchmarks(rfm.CompileOnlyRegressionTest,
             f'tar xzf {tarball}',
             f'cd {self.build_prefix}'
         ]
+        self.build_cache_sources = [fullpath]
         if self.build_type != 'cpu':
             self.build_system.config_opts = [f'--enable-{self.build_type}']
 
@@ -14,11 +14,14 @@ sys.path.append(str(pathlib.Path(__file__).parent.parent.parent.parent / 'config
 
 from uenv import uarch                                       # noqa: E402
 from container_engine import ContainerEngineMixin            # noqa: E402
+from output_digest import OutputDigestMixin                  # noqa: E402
+from perf_references import PerfReferencesMixin              # noqa: E402
 from slurm_mpi_pmix import SlurmMpiPmixMixin                 # noqa: E402
 from uenv_slurm_mpi_options import UenvSlurmMpiOptionsMixin  # noqa: E402
 
 
-class XCCLTestsBase(rfm.RunOnlyRegressionTest):
+class XCCLTestsBase(rfm.RunOnlyRegressionTest, OutputDigestMixin,
+                    PerfReferencesMixin):
     valid_prog_environs = ['builtin']
     maintainers = ['amadonna', 'msimberg', 'VCUE', 'SSA']
     sourcesdir = None
@@ -35,6 +38,14 @@ class XCCLTestsBase(rfm.RunOnlyRegressionTest):
         'HWLOC_COMPONENTS': '-gl',
     }
 
+    # The debug output of NCCL and libfabric is only needed when the test
+    # fails, so the sanity and performance functions read a digest
+    digest_patterns = [
+        r'Out of bounds values',
+        r'NCCL INFO NET/OFI Selected [pP]rovider is',
+        r'Avg bus bandwidth',
+    ]
+
     reference_per_test = {
         'sendrecv': {
             'gh200': {
@@ -94,9 +105,11 @@ class XCCLTestsBase(rfm.RunOnlyRegressionTest):
     @sanity_function
     def assert_sanity(self):
         return sn.all([
-            sn.assert_found(r'Out of bounds values\s*:\s*0\s*OK', self.stdout),
+            sn.assert_found(r'Out of bounds values\s*:\s*0\s*OK',
+                            self.output_digest),
             sn.assert_found(
-                r'NCCL INFO NET/OFI Selected [pP]rovider is cxi', self.stdout
+                r'NCCL INFO NET/OFI Selected [pP]rovider is cxi',
+                self.output_digest
             )
         ])
 
@@ -115,7 +128,7 @@ class XCCLTestsBase(rfm.RunOnlyRegressionTest):
         self.perf_patterns = {
             'GB/s': sn.extractsingle(
                 r'Avg bus bandwidth\s*:\s*(?P<gbs>\S+)',
-                self.stdout, 'gbs', float)
+                self.output_digest, 'gbs', float)
         }
 
 
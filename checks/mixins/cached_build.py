@@ -0,0 +1,221 @@
+# Copyright Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import pathlib
+import sys
+import tarfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import reframe as rfm
+import reframe.core.runtime as rt
+import reframe.utility.osext as osext
+import reframe.utility.typecheck as typ
+from reframe.core.exceptions import SpawnedProcessError
+from reframe.core.logging import getlogger
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'config' /
+                    'utilities'))
+
+from build_cache import (BuildCache, default_cache_dir,        # noqa: E402
+                         default_max_size, file_digest, image_digest,
+                         make_key, tree_digest)
+from uenv import uarch                                          # noqa: E402
+
+# The builds are archived in the background, while the tests that use them
+# run, and waited for before their stage directory is cleaned up
+_archivers = ThreadPoolExecutor(max_workers=2,
+                                thread_name_prefix='build-cache')
+
+_caches = {}
+
+
+def _cache(directory):
+    if directory not in _caches:
+        _caches[directory] = BuildCache(directory)
+
+    return _caches[directory]
+
+
+def _store(cache, key, stagedir, files, exclude, metadata):
+    try:
+        size = cache.store(key, stagedir, files, exclude, metadata)
+        cache.record('store', key, metadata['test'], size=size)
+        cache.evict(default_max_size())
+    except (OSError, tarfile.TarError) as err:
+        getlogger().warning(
+            f'{metadata["test"]}: could not store the build in the cache: '
+            f'{err}'
+        )
+
+
+class CachedBuildMixin(rfm.RegressionTestPlugin):
+    '''Restore the build of a compile test from the build cache.
+
+    The build is looked up by the hash of its inputs: the build commands,
+    the source tarballs and source directory, the environment and its uenv
+    image or CPE container, the modules and the uarch of the partition. On a
+    hit, the cached files are extracted into the stage directory and the
+    build job does nothing; on a miss, the stage directory is archived in
+    the cache after a successful sanity check.
+
+    The cache is enabled by setting ``$CSCS_RFM_BUILD_CACHE`` to a directory
+    on a filesystem shared by the nodes (see
+    ``config/utilities/build_cache.py``). It is not used with FirecREST,
+    which stages the builds on the remote filesystem.
+    '''
+
+    #: Restore the build from the cache and store it on a miss.
+    #:
+    #: :default: ``True``
+    use_build_cache = variable(bool, value=True)
+
+    #: Glob patterns, relative to the stage directory, of the files to cache.
+    #:
+    #: :default: ``['*']``
+    build_cache_files = variable(typ.List[str], value=['*'])
+
+    #: Patterns of the file names not to cache; the files of the ReFrame job
+    #: are never cached.
+    #:
+    #: :default: ``['*.o']``
+    build_cache_exclude = variable(typ.List[str], value=['*.o'])
+
+    #: Source files of the build, e.g. the tarballs of the fetch fixtures,
+    #: whose content is part of the cache key.
+    #:
+    #: :default: ``[]``
+    build_cache_sources = variable(typ.List[str], value=[])
+
+    #: Whether the build can be restored in a different stage directory.
+    #: Builds that record their install prefix, e.g. with CMake or
+    #: ``configure --prefix``, are only restored in the same stage
+    #: directory.
+    #:
+    #: :default: ``False``
+    build_cache_relocatable = variable(bool, value=False)
+
+    #: The key of the build in the cache, if it is used.
+    #:
+    #: :default: ``None``
+    build_cache_key = variable(str, type(None), value=None)
+
+    def _build_cache_inputs(self):
+        environ = self.current_environ
+        partition = self.current_partition
+        stage_prefix = rt.runtime().stage_prefix
+
+        def normalize(text):
+            text = text.replace(self.stagedir, '$STAGEDIR')
+            return text.replace(stage_prefix, '$STAGE')
+
+        commands = [*self.prebuild_cmds,
+                    *self.build_system.emit_build_commands(environ),
+                    *self.postbuild_cmds]
+        if not self.sourcesdir:
+            sources = None
+        elif osext.is_url(self.sourcesdir):
+            # The commit of the repository that compile() will clone
+            url = self.sourcesdir
+            sources = osext.run_command(f'git ls-remote {url} HEAD',
+                                        check=True, timeout=60).stdout
+            sources = f'{url}@{sources.split()[0]}'
+        else:
+            sources = tree_digest(os.path.join(self.prefix, self.sourcesdir))
+
+        uenv = environ.resources.get('uenv', {}).get('file')
+        return {
+            'test': self.display_name,
+            'commands': [normalize(c) for c in commands],
+            'sourcesdir': sources,
+            'sources': {normalize(path): file_digest(path)
+                        for path in self.build_cache_sources},
+            'environ': [environ.name, environ.modules, environ.env_vars,
+                        environ.prepare_cmds, environ.resources],
+            'image': image_digest(uenv) if uenv else None,
+            'modules': self.modules,
+            'env_vars': self.env_vars,
+            'system': self.current_system.name,
+            'uarch': [uarch(partition), partition.processor.arch],
+            'stagedir': (None if self.build_cache_relocatable
+                         else self.stagedir)
+        }
+
+    # Run after the hooks of the test that set up its build
+    @run_before('compile', always_last=True)
+    def restore_build(self):
+        cache_dir = default_cache_dir()
+        if (not self.use_build_cache or not cache_dir or
+            self.is_dry_run() or
+            self.current_partition.scheduler.registered_name.startswith(
+                'firecrest')):
+            return
+
+        try:
+            key = make_key(self._build_cache_inputs())
+        except (OSError, SpawnedProcessError) as err:
+            getlogger().debug(f'{self.display_name}: not using the build '
+                              f'cache: {err}')
+            return
+
+        self.build_cache_key = key
+        self._build_start = time.time()
+        cache = _cache(cache_dir)
+        entry = cache.lookup(key)
+        if entry is None:
+            self._build_restored = False
+            cache.record('miss', key, self.display_name)
+            return
+
+        try:
+            cache.restore(key, self.stagedir)
+        except (OSError, tarfile.TarError) as err:
+            getlogger().warning(f'{self.display_name}: could not restore the '
+                                f'build from the cache: {err}')
+            self._build_restored = False
+            cache.record('miss', key, self.display_name)
+            return
+
+        # The build job is still submitted, so that the environment of the
+        # test is checked as before, but it does nothing
+        self._build_restored = True
+        self.sourcesdir = None
+        self.prebuild_cmds = []
+        self.postbuild_cmds = []
+        self.build_system = 'CustomBuild'
+        self.build_system.commands = ['true']
+        cache.record('hit', key, self.display_name,
+                     saved=entry.get('build_time'),
+                     restore_time=time.time() - self._build_start)
+        getlogger().verbose(
+            f'{self.display_name}: restored the build {key[:16]} from the '
+            f'cache'
+        )
+
+    @run_after('sanity')
+    def store_build(self):
+        if self.build_cache_key is None or self._build_restored:
+            return
+
+        metadata = {
+            'test': self.display_name,
+            'system': self.current_system.name,
+            'partition': self.current_partition.name,
+            'environ': self.current_environ.name,
+            'build_time': time.time() - self._build_start
+        }
+        self._build_archived = _archivers.submit(
+            _store, _cache(default_cache_dir()),
+            self.build_cache_key, self.stagedir,
+            list(self.build_cache_files), list(self.build_cache_exclude),
+            metadata
+        )
+
+    @run_before('cleanup')
+    def wait_build_stored(self):
+        archived = getattr(self, '_build_archived', None)
+        if archived is not None:
+            archived.result()
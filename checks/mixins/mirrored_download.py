@@ -0,0 +1,142 @@
+# Copyright Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import os
+import pathlib
+import sys
+import threading
+import urllib.parse
+
+import reframe as rfm
+from reframe.core.exceptions import PipelineError
+from reframe.core.logging import getlogger
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'config' /
+                    'utilities'))
+
+from source_mirror import (MirrorError, SourceMirror,          # noqa: E402
+                           default_mirror_dir, load_manifest, offline)
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def _prefetch(mirror, url):
+    try:
+        mirror.fetch(url)
+    except MirrorError as err:
+        getlogger().debug(f'could not prefetch {url}: {err}')
+
+
+def _mirror(directory):
+    with _mirrors_lock:
+        if directory in _mirrors:
+            return _mirrors[directory]
+
+        mirror = SourceMirror(directory, offline())
+        _mirrors[directory] = mirror
+
+    # Prefetch the sources of all the fixtures at the first fetch of the
+    # session; the threads do not hold up the exit of ReFrame, and their
+    # partial downloads are removed later
+    if not mirror.offline:
+        for url in load_manifest():
+            threading.Thread(target=_prefetch, args=(mirror, url),
+                             name='mirror-prefetch', daemon=True).start()
+
+    return mirror
+
+
+def fetch_from_mirror(test, url, filename=None, sha256=None, auth=None,
+                      resolver=None):
+    '''Fetch ``url`` into the stage directory of ``test`` from the source
+    mirror, downloading it into the mirror first if needed.
+
+    :arg filename: The name of the file in the stage directory; by default,
+        the last component of the URL.
+    :arg sha256: The pinned digest of the file; by default, the one of
+        ``config/utilities/mirror_sources.json``.
+    :arg auth: The prefix of the variables of the credentials, e.g.
+        ``CSCS_REGISTRY`` for ``$CSCS_REGISTRY_USERNAME`` and
+        ``$CSCS_REGISTRY_PASSWORD``.
+    :arg resolver: A function resolving ``url`` to the URL of the file,
+        e.g. of the latest release.
+    :returns: ``False`` if the mirror is not used, i.e. the test must
+        download the file itself.
+    '''
+    directory = default_mirror_dir()
+    if not directory:
+        if offline():
+            raise PipelineError('the offline mode requires a source mirror '
+                                '(CSCS_RFM_MIRROR)')
+
+        return False
+
+    if (test.is_dry_run() or
+        test.current_partition.scheduler.registered_name.startswith(
+            'firecrest')):
+        return False
+
+    mirror = _mirror(directory)
+    try:
+        if resolver:
+            url = mirror.resolve(url, resolver, auth)
+
+        filename = filename or os.path.basename(
+            urllib.parse.urlparse(url).path
+        )
+        entry = mirror.fetch(url, os.path.join(test.stagedir, filename),
+                             sha256, auth)
+    except MirrorError as err:
+        # The error of the mirror is appended to the message
+        raise PipelineError('could not fetch from the source mirror') from err
+
+    getlogger().debug(f'{test.display_name}: fetched {url} '
+                      f'(sha256 {entry["sha256"]}) from the source mirror')
+    return True
+
+
+class MirroredDownloadMixin(rfm.RegressionTestPlugin):
+    '''Fetch the file downloaded by a fixture from the source mirror.
+
+    If ``$CSCS_RFM_MIRROR`` is set, the file at ``download_url`` is fetched
+    into the stage directory from the mirror, where it is downloaded the
+    first time, and the job of the fixture does nothing. Otherwise, the
+    fixture downloads the file itself (see
+    ``config/utilities/source_mirror.py``).
+    '''
+
+    #: The URL of the downloaded file.
+    #:
+    #: :default: ``None``
+    download_url = variable(str, type(None), value=None)
+
+    #: The name of the downloaded file; by default, the last component of
+    #: the URL.
+    #:
+    #: :default: ``None``
+    download_file = variable(str, type(None), value=None)
+
+    #: The pinned sha256 digest of the file; by default, the one of
+    #: ``config/utilities/mirror_sources.json``.
+    #:
+    #: :default: ``None``
+    download_sha256 = variable(str, type(None), value=None)
+
+    #: The prefix of the variables of the credentials of the download, e.g.
+    #: ``CSCS_REGISTRY``.
+    #:
+    #: :default: ``None``
+    download_auth = variable(str, type(None), value=None)
+
+    # Run after the hooks of the test that set up its download
+    @run_before('run', always_last=True)
+    def fetch_download(self):
+        if self.download_url and fetch_from_mirror(
+            self, self.download_url, self.download_file,
+            self.download_sha256, self.download_auth
+        ):
+            self.executable = 'true'
+            self.executable_opts = []
@@ -0,0 +1,249 @@
+# Copyright Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import csv
+import json
+import os
+import re
+import statistics
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import reframe as rfm
+
+# Normal-consistent scale factor of the median absolute deviation
+MAD_SCALE = 1.4826
+
+
+class DeviceResult(NamedTuple):
+    '''The result of a device, i.e. a task, of a node'''
+
+    node: str
+    slot: int
+    value: float
+
+    #: Robust z-score against the fleet, if it is large enough
+    z: Optional[float] = None
+
+    slow_fleet: bool = False
+    slow_reference: bool = False
+
+
+def parse_results(text: str, hw: str, unit: str) -> List[DeviceResult]:
+    '''The results of the lines ``[RANK: ]NODE:HW ... VALUE UNIT,`` of the
+    output, in a single pass.
+
+    The devices of a node are numbered by the ranks of their tasks, if the
+    lines are labelled with them, e.g. by ``srun --label``, and otherwise in
+    the order of their lines.
+    '''
+    regex = re.compile(
+        rf'^\s*(?:(\d+):\s+)?.*?(nid\d+):{re.escape(hw)}\S*\s.*?'
+        rf'(\d+\.\d+)\s+{re.escape(unit)},', re.MULTILINE
+    )
+    rows = regex.findall(text)
+
+    # Number the devices of every node by rank, or by line
+    rows.sort(key=lambda r: (r[1], int(r[0]) if r[0] else 0))
+    results = []
+    previous, slot = None, 0
+    for _, node, value in rows:
+        slot = slot + 1 if node == previous else 0
+        previous = node
+        results.append(DeviceResult(node, slot, float(value)))
+
+    return results
+
+
+def fleet_spread(values: List[float],
+                 min_spread: float = 0.01) -> Tuple[float, float]:
+    '''The median and the robust standard deviation of the values, but at
+    least ``min_spread`` times the median'''
+    median = statistics.median(values)
+    mad = statistics.median(abs(v - median) for v in values)
+    return median, max(MAD_SCALE * mad, min_spread * abs(median))
+
+
+def classify(results: List[DeviceResult],
+             reference: Optional[tuple] = None,
+             z_threshold: float = 3.5, min_spread: float = 0.01,
+             min_fleet: int = 8) -> Tuple[List[DeviceResult], dict]:
+    '''Classify the devices that are slower than the fleet, i.e. whose
+    robust z-score is below ``-z_threshold``, or than the lower threshold
+    of the reference, a tuple ``(value, lower, upper[, unit])``.
+
+    The fleet is not used if it has fewer than ``min_fleet`` devices.
+    '''
+    values = [r.value for r in results]
+    fleet = None
+    if len(values) >= min_fleet:
+        median, sigma = fleet_spread(values, min_spread)
+        fleet = {'devices': len(values), 'median': median, 'sigma': sigma,
+                 'z_threshold': z_threshold}
+
+    threshold = None
+    if reference and reference[1] is not None:
+        threshold = reference[0] + reference[1] * abs(reference[0])
+
+    classified = []
+    for node, slot, value, *_ in results:
+        z = None
+        if fleet:
+            z = (value - fleet['median']) / fleet['sigma']
+
+        classified.append(DeviceResult(
+            node, slot, value, z, z is not None and z < -z_threshold,
+            threshold is not None and value < threshold
+        ))
+
+    return classified, {
+        'fleet': fleet,
+        'reference': (None if threshold is None else
+                      {'value': reference[0], 'lower': reference[1],
+                       'threshold': threshold})
+    }
+
+
+def slow_nodes(results: Iterable[DeviceResult],
+               expected: Dict[str, int]) -> List[dict]:
+    '''The nodes with slow devices or fewer results than ``expected``, by
+    node, ordered by their slowest device'''
+    devices = defaultdict(list)
+    for r in results:
+        devices[r.node].append(r)
+
+    nodes = []
+    for node in sorted(set(devices) | set(expected)):
+        reasons = []
+        if len(devices[node]) < expected.get(node, 0):
+            reasons.append('missing')
+
+        if any(r.slow_fleet for r in devices[node]):
+            reasons.append('fleet')
+
+        if any(r.slow_reference for r in devices[node]):
+            reasons.append('reference')
+
+        if not reasons:
+            continue
+
+        slowest = min(devices[node], key=lambda r: r.value, default=None)
+        nodes.append({
+            'node': node,
+            'reasons': reasons,
+            'value': slowest and slowest.value,
+            'z': slowest and slowest.z,
+            'devices': [{'slot': r.slot, 'value': r.value, 'z': r.z}
+                        for r in devices[node]
+                        if r.slow_fleet or r.slow_reference]
+        })
+
+    nodes.sort(key=lambda n: (n['value'] is not None,
+                              n['value'] or 0))
+    return nodes
+
+
+class NodePerfMixin(rfm.RegressionTestPlugin):
+    '''Classify the nodes of a test on the results of their devices.
+
+    The results of every device are extracted from the output into a table,
+    ``node_perf_file``, and compared with the fleet of the devices of the
+    job, by their robust z-score on the median and the median absolute
+    deviation, and with the reference of the performance variable. The
+    nodes with slow or missing results are written to ``slow_nodes_file``,
+    for the drain automation.
+    '''
+
+    #: Robust z-score below which a device is slower than the fleet.
+    #:
+    #: :default: ``3.5``
+    node_perf_z = variable(float, value=3.5)
+
+    #: Minimum robust standard deviation of the fleet, relative to its
+    #: median, so that the small deviations of a uniform fleet are not
+    #: outliers.
+    #:
+    #: :default: ``0.01``
+    node_perf_min_spread = variable(float, value=0.01)
+
+    #: Minimum number of devices to compare them with the fleet.
+    #:
+    #: :default: ``8``
+    node_perf_min_fleet = variable(int, value=8)
+
+    #: The table of the results of the devices, in CSV.
+    #:
+    #: :default: ``'node_perf.csv'``
+    node_perf_file = variable(str, value='node_perf.csv')
+
+    #: The nodes with slow or missing results, in JSON.
+    #:
+    #: :default: ``'slow_nodes.json'``
+    slow_nodes_file = variable(str, value='slow_nodes.json')
+
+    @run_after('init')
+    def keep_node_perf_files(self):
+        self.keep_files += [self.node_perf_file, self.slow_nodes_file]
+
+    @run_before('run')
+    def label_node_results(self):
+        # The ranks of the tasks number the devices of the nodes
+        if self.job.launcher.registered_name == 'srun':
+            self.job.launcher.options += ['--label']
+
+    def _reference_of(self, metric):
+        try:
+            return self.reference[f'{self.current_partition.fullname}:'
+                                  f'{metric}']
+        except KeyError:
+            return None
+
+    @deferrable
+    def node_perf(self, metric, hw, unit, output):
+        '''The result of the slowest device.
+
+        The nodes are classified when the performance is evaluated, once the
+        references are final, and before they fail the test.
+        '''
+        with open(os.path.join(self.stagedir, output),
+                  errors='replace') as fp:
+            results = parse_results(fp.read(), hw, unit)
+
+        results, stats = classify(results, self._reference_of(metric),
+                                  self.node_perf_z, self.node_perf_min_spread,
+                                  self.node_perf_min_fleet)
+        with open(os.path.join(self.stagedir, self.node_perf_file), 'w',
+                  newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['node', 'slot', metric, 'unit', 'z', 'slow'])
+            for r in results:
+                writer.writerow([
+                    r.node, r.slot, r.value, unit,
+                    '' if r.z is None else f'{r.z:.2f}',
+                    ','.join(n for n, s in (('fleet', r.slow_fleet),
+                                            ('reference', r.slow_reference))
+                             if s)
+                ])
+
+        expected = {node: self.num_tasks_per_node or 0
+                    for node in self.job.nodelist or []}
+        slow = slow_nodes(results, expected)
+        with open(os.path.join(self.stagedir, self.slow_nodes_file),
+                  'w') as fp:
+            json.dump({
+                'test': self.display_name,
+                'system': self.current_system.name,
+                'partition': self.current_partition.name,
+                'jobid': self.job.jobid,
+                'metric': metric,
+                'unit': unit,
+                'nodes_tested': len(set(expected) |
+                                    {r.node for r in results}),
+                **stats,
+                'nodes': [n['node'] for n in slow],
+                'slow_nodes': slow
+            }, fp, indent=2)
+
+        return min(r.value for r in results)
@@ -0,0 +1,79 @@
+# Copyright Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import shlex
+
+import reframe as rfm
+import reframe.utility.typecheck as typ
+
+# Copy the lines of the outputs (argv[3:]) matching any of the regular
+# expressions (argv[1]) to the digest file (argv[2])
+_DIGEST_FILTER = '''\
+import json, re, sys
+patterns = [re.compile(p) for p in json.loads(sys.argv[1])]
+with open(sys.argv[2], 'w') as digest:
+    for filename in sys.argv[3:]:
+        try:
+            with open(filename, errors='replace') as fp:
+                digest.writelines(
+                    l for l in fp if any(p.search(l) for p in patterns)
+                )
+        except FileNotFoundError:
+            pass
+'''
+
+
+class OutputDigestMixin(rfm.RegressionTestPlugin):
+    '''Extract the lines of the job output that the test needs into a digest
+    file at the end of the job.
+
+    The sanity and performance functions read :attr:`output_digest` instead
+    of ``self.stdout``. The digest is only made with the FirecREST
+    scheduler, which pulls only the digest of a successful job and leaves
+    the full output in the remote stage directory, so that verbose outputs
+    do not cross the network, unless the sanity or performance check fails.
+    With the other schedulers :attr:`output_digest` is ``self.stdout``.
+    '''
+
+    #: Regular expressions of the output lines needed by the sanity and
+    #: performance functions.
+    #:
+    #: Every line of the output that matches one of them is copied to the
+    #: digest. The digest is not made when the list is empty.
+    #:
+    #: :default: ``[]``
+    digest_patterns = variable(typ.List[str], value=[])
+
+    #: The digest file, relative to the stage directory.
+    #:
+    #: :default: ``'rfm_job.digest'``
+    digest_file = variable(str, value='rfm_job.digest')
+
+    def _uses_digest(self):
+        # Only the outputs of the FirecREST jobs cross the network
+        return bool(self.digest_patterns and
+                    hasattr(self.job, 'remote_outputs'))
+
+    @property
+    def output_digest(self):
+        '''The file the sanity and performance functions read'''
+        if self._uses_digest():
+            return self.digest_file
+
+        return self.stdout
+
+    @run_before('run')
+    def set_output_digest(self):
+        if not self._uses_digest():
+            return
+
+        outputs = [self.job.stdout, self.job.stderr]
+        self.postrun_cmds += [shlex.join([
+            'python3', '-c', _DIGEST_FILTER,
+            json.dumps(self.digest_patterns), self.digest_file, *outputs
+        ])]
+        self.job.remote_outputs = outputs
+        self.job.pull_files += [self.digest_file]
@@ -0,0 +1,52 @@
+# Copyright Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import pathlib
+import sys
+
+import reframe as rfm
+from reframe.core.logging import getlogger
+
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'config' /
+                    'utilities'))
+
+from reference_store import environ_version, lookup_references  # noqa: E402
+from uenv import uarch                                          # noqa: E402
+
+
+class PerfReferencesMixin(rfm.RegressionTestPlugin):
+    '''Take the performance references from the references calibrated on
+    the history of the test.
+
+    The references are looked up by system, uarch, test name and parameters
+    and uenv or CPE version (see ``config/utilities/reference_store.py``).
+    They replace the references set by the test, which are kept for the
+    performance variables without a calibrated reference.
+    '''
+
+    #: Look up the calibrated references.
+    #:
+    #: :default: ``True``
+    use_perf_references = variable(bool, value=True)
+
+    # Run after the hooks of the test that set its own references
+    @run_before('performance', always_last=True)
+    def set_perf_references(self):
+        if not self.use_perf_references:
+            return
+
+        partition = self.current_partition
+        found = lookup_references(
+            self.current_system.name, uarch(partition), self.display_name,
+            environ_version(self.current_environ)
+        )
+        for metric, ref in found.items():
+            self.reference[f'{partition.fullname}:{metric}'] = ref.reference
+
+        if found:
+            getlogger().debug(
+                f'{self.display_name}: using the calibrated references of '
+                f'{", ".join(sorted(found))}'
+            )
@@ -0,0 +1,32 @@
+# Copyright Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import reframe as rfm
+import reframe.utility.typecheck as typ
+
+
+class SelectivePullMixin(rfm.RegressionTestPlugin):
+    '''Declare the files that the FirecREST scheduler pulls right after the
+    job when it runs in the selective pull mode.
+
+    The ``keep_files`` of the test are always pulled. The declared files
+    that were left in the remote stage directory, e.g. the ones added after
+    the job is run, are fetched before the sanity check.
+    '''
+
+    #: Glob patterns of the files to pull, relative to the stage directory.
+    #:
+    #: :default: ``[]``
+    pull_files = variable(typ.List[str], value=[])
+
+    @run_before('run')
+    def set_pull_files(self):
+        if hasattr(self.job, 'pull_files'):
+            self.job.pull_files += [*self.keep_files, *self.pull_files]
+
+    @run_before('sanity')
+    def fetch_pull_files(self):
+        if hasattr(self.job, 'fetch_remote_files'):
+            self.job.fetch_remote_files([*self.keep_files, *self.pull_files])
@@ -13,11 +13,12 @@ import reframe.utility.osext as osext
 from reframe.core.exceptions import SanityError, ReframeError
 
 sys.path.append(str(pathlib.Path(__file__).parent.parent / 'mixins'))
+from cached_build import CachedBuildMixin
 from container_engine import ContainerEngineCPEMixin
 
 
 class CompileAffinityTool(rfm.CompileOnlyRegressionTest,
-                          ContainerEngineCPEMixin):
+                          ContainerEngineCPEMixin, CachedBuildMixin):
     valid_systems = [
         '*'
     ]
@@ -27,6 +28,7 @@ class CompileAffinityTool(rfm.CompileOnlyRegressionTest,
     env_vars = {'MPICH_GPU_SUPPORT_ENABLED': 0}
 
     sourcesdir = 'https://github.com/vkarak/affinity'
+    build_cache_relocatable = True
     tags = {'scs', 'craype'}
 
     @run_before('compile')
@@ -96,7 +98,7 @@ class AffinityTestBase(rfm.RunOnlyRegressionTest,
         scheduler = (
             self.affinity_tool.current_partition.scheduler.registered_name
         )
-        if scheduler != 'firecrest-slurm':
+        if not scheduler.startswith('firecrest-slurm'):
             remote_stagedir = self.affinity_tool.stagedir
         else:
             remote_stagedir = self.affinity_tool.build_job.remotedir
@@ -569,7 +571,7 @@ class OneTaskPerNumaNode(AffinityTestBase):
         scheduler = (
             self.affinity_tool.current_partition.scheduler.registered_name
         )
-        if scheduler != 'firecrest-slurm':
+        if not scheduler.startswith('firecrest-slurm'):
             remote_stagedir = self.affinity_tool.stagedir
         else:
             remote_stagedir = self.affinity_tool.build_job.remotedir
@@ -4,10 +4,15 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import os
+import pathlib
+import sys
 
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent / 'mixins'))
+from selective_pull import SelectivePullMixin  # noqa: E402
+
 
 @sn.deferrable
 def my_join(s, iterable):
@@ -15,7 +20,7 @@ def my_join(s, iterable):
 
 
 @rfm.simple_test
-class LoginEnvCheck(rfm.RunOnlyRegressionTest):
+class LoginEnvCheck(rfm.RunOnlyRegressionTest, SelectivePullMixin):
     variant = parameter(['rpm', 'modules', 'env'])
     valid_systems = []
     valid_prog_environs = ['builtin']
@@ -5,25 +5,32 @@
 
 import getpass
 import os
+import pathlib
+import sys
 
 import reframe as rfm
 import reframe.utility.sanity as sn
 
+sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
 
-class fetch_ior_benchmarks(rfm.RunOnlyRegressionTest):
+from cached_build import CachedBuildMixin  # noqa: E402
+from mirrored_download import MirroredDownloadMixin  # noqa: E402
+
+
+class fetch_ior_benchmarks(rfm.RunOnlyRegressionTest,
+                           MirroredDownloadMixin):
     descr = 'Fetch IOR benchmarks'
     version = variable(str, value='4.0.0')
+    download_url = f'https://github.com/hpc/ior/releases/download/{version}/ior-{version}.tar.gz'  # noqa: E501
     executable = 'wget'
-    executable_opts = [
-        f'https://github.com/hpc/ior/releases/download/{version}/ior-{version}.tar.gz'  # noqa: E501
-    ]
+    executable_opts = [download_url]
 
     @sanity_function
     def validate_download(self):
         return sn.assert_eq(self.job.exitcode, 0)
 
 
-class build_ior_benchmarks(rfm.CompileOnlyRegressionTest):
+class build_ior_benchmarks(rfm.CompileOnlyRegressionTest, CachedBuildMixin):
     descr = 'Build IOR benchmarks'
     build_system = 'Autotools'
     build_prefix = variable(str)
@@ -32,6 +39,9 @@ class build_ior_benchmarks(rfm.CompileOnlyRegressionTest):
     # Build on the remote system for consistency
     build_locally = False
 
+    # The binaries do not depend on the build directory
+    build_cache_relocatable = True
+
     @run_after('init')
     def load_cray_module(self):
         if self.current_system.name in ['eiger', 'pilatus']:
@@ -47,6 +57,7 @@ class build_ior_benchmarks(rfm.CompileOnlyRegressionTest):
             f'tar xzf {tarball}',
             f'cd {self.build_prefix}'
         ]
+        self.build_cache_sources = [fullpath]
 
     # FIXME this will not be needed in a ReFrame release including:
     # https://github.com/reframe-hpc/reframe/pull/3157
@@ -55,7 +55,7 @@ class NvidiaDeviceCountBase(CudaVisibleDevicesAllMixin,
     @run_before('run')
     def set_executable(self):
         scheduler = self.device_count_bin.current_partition.scheduler.registered_name
-        if scheduler != 'firecrest-slurm':
+        if not scheduler.startswith('firecrest-slurm'):
             remote_stagedir = self.device_count_bin.stagedir
         else:
             remote_stagedir = self.device_count_bin.build_job.remotedir
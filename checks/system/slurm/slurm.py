@@ -14,6 +14,7 @@ import reframe.utility.osext as osext
 import reframe.utility.sanity as sn
 
 sys.path.append(str(pathlib.Path(__file__).parent.parent.parent / 'mixins'))
+from perf_references import PerfReferencesMixin  # noqa: E402
 from uenv_slurm_mpi_options import UenvSlurmMpiOptionsMixin  # noqa: E402
 
 
@@ -323,7 +324,7 @@ def get_system_partitions():
 
 
 @rfm.simple_test
-class SlurmQueueStatusCheck(rfm.RunOnlyRegressionTest):
+class SlurmQueueStatusCheck(rfm.RunOnlyRegressionTest, PerfReferencesMixin):
     descr = 'check system queue status (# of nodes)'
     valid_systems = ['-remote']
     valid_prog_environs = ['builtin']
@@ -0,0 +1,91 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Startup time of the ReFrame configuration in ``config/cscs.py``
+
+Every run loads the configuration in a new Python interpreter, like a
+``reframe`` invocation: from all the system files as before the cache,
+from the system files matching the hostname without the cache, with an
+empty cache and with a valid cache entry. Pass ``--uenv`` to include the
+inspection of uenv images (this requires the ``uenv`` command).
+
+Usage: python3 benchmarks/config_startup.py [--runs=5]
+           [--hostname=daint-ln001] [--uenv=prgenv-gnu/25.11:v1]
+'''
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+CSCS_CONFIG = os.path.join(os.path.dirname(__file__), '..', 'cscs.py')
+
+# Load the configuration and print the time spent in it
+LOAD_CONFIG = '''\
+import socket
+import sys
+import time
+if sys.argv[2]:
+    socket.gethostname = lambda: sys.argv[2]
+
+import reframe.core.config as config
+
+start = time.perf_counter()
+site_config = config.load_config(sys.argv[1])
+site_config.select_subconfig()
+print(time.perf_counter() - start)
+'''
+
+
+def load_time(env: dict, hostname: str) -> float:
+    completed = subprocess.run(
+        [sys.executable, '-c', LOAD_CONFIG, CSCS_CONFIG, hostname],
+        stdout=subprocess.PIPE, env=env, universal_newlines=True, check=True
+    )
+    return float(completed.stdout)
+
+
+def timeit(env: dict, hostname: str, runs: int, cache_file=None) -> float:
+    times = []
+    for _ in range(runs):
+        if cache_file and os.path.exists(cache_file):
+            os.remove(cache_file)
+
+        times.append(load_time(env, hostname))
+
+    return statistics.median(times)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5,
+                        help='Number of runs of every case')
+    parser.add_argument('--hostname', default='',
+                        help='Hostname of the system to load '
+                             '(default: the current hostname)')
+    parser.add_argument('--uenv', help='Value of CSCS_RFM_UENV')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop('CSCS_RFM_UENV', None)
+    if args.uenv:
+        env['CSCS_RFM_UENV'] = args.uenv
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_file = os.path.join(tmpdir, 'site_config.json')
+        env['CSCS_RFM_CONFIG_CACHE'] = cache_file
+        uncached = {**env, 'CSCS_RFM_NO_CONFIG_CACHE': '1'}
+        full = timeit({**uncached, 'RFM_SYSTEM': 'any'}, args.hostname,
+                      args.runs)
+        uncached = timeit(uncached, args.hostname, args.runs)
+        miss = timeit(env, args.hostname, args.runs, cache_file)
+        hit = timeit(env, args.hostname, args.runs)
+
+    print(f'All systems:     {full:.4f} sec')
+    print(f'Matching system: {uncached:.4f} sec')
+    print(f'Cache miss:      {miss:.4f} sec')
+    print(f'Cache hit:       {hit:.4f} sec ({full / hit:.1f}x speedup)')
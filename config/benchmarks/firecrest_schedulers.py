@@ -0,0 +1,309 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Throughput of the blocking and asynchronous FirecREST schedulers
+
+Both schedulers run the same session against a local mock of the FirecREST
+service, which keeps the remote files in a temporary directory and adds a
+fixed latency to every request. The jobs finish ``--runtime`` seconds after
+their submission. With ``--arrays`` the schedulers also run the session with
+the jobs batched in job arrays.
+
+Usage: python3 benchmarks/firecrest_schedulers.py [--jobs=32]
+           [--latency=0.1] [--runtime=2] [--files=8]
+           [--api-version=1.15.0] [--arrays]
+'''
+
+import argparse
+import asyncio
+import io
+import os
+import re
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..',
+                                'utilities'))
+
+
+class MockFirecrestServer:
+    '''The subset of the FirecREST API used by the schedulers'''
+
+    def __init__(self, latency, runtime):
+        self.latency = latency
+        self.runtime = runtime
+        self.requests = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def parameters(self):
+        return {'utilities': [{'name': 'UTILITIES_MAX_FILE_SIZE',
+                               'value': '5'}]}
+
+    def mkdir(self, machine, target_path, p=None):
+        os.makedirs(target_path, exist_ok=True)
+
+    def simple_delete(self, machine, target_path):
+        if not os.path.lexists(target_path):
+            raise fc.HeaderException([])
+
+        if os.path.isdir(target_path) and not os.path.islink(target_path):
+            shutil.rmtree(target_path)
+        else:
+            os.remove(target_path)
+
+    def simple_upload(self, machine, source_path, target_path,
+                      filename=None):
+        if isinstance(source_path, io.IOBase):
+            with open(os.path.join(target_path, filename), 'wb') as fp:
+                fp.write(source_path.read())
+        else:
+            shutil.copy(source_path, os.path.join(
+                target_path, filename or os.path.basename(source_path)
+            ))
+
+    def simple_download(self, machine, source_path, target_path):
+        if not os.path.exists(source_path):
+            raise fc.FirecrestException([])
+
+        if isinstance(target_path, io.IOBase):
+            with open(source_path, 'rb') as fp:
+                target_path.write(fp.read())
+        else:
+            shutil.copy(source_path, target_path)
+
+    def list_files(self, machine, target_path, show_hidden=False):
+        files = []
+        for name in sorted(os.listdir(target_path)):
+            if name.startswith('.') and not show_hidden:
+                continue
+
+            path = os.path.join(target_path, name)
+            st = os.lstat(path)
+            files.append({
+                'name': name,
+                'type': 'd' if os.path.isdir(path) else '-',
+                'last_modified': str(st.st_mtime_ns),
+                'size': str(st.st_size),
+                'link_target': ''
+            })
+
+        return files
+
+    def chmod(self, machine, target_path, mode):
+        os.chmod(target_path, int(mode, 8))
+
+    def stat(self, machine, target_path, dereference=False):
+        return {'size': os.stat(target_path).st_size}
+
+    def mv(self, machine, source_path, target_path):
+        os.rename(source_path, target_path)
+
+    def extract(self, machine, source_path, target_path, extension='auto'):
+        with tarfile.open(source_path) as archive:
+            archive.extractall(target_path)
+
+    def compress(self, machine, source_path, target_path, dereference=False):
+        with tarfile.open(target_path, 'w:gz') as archive:
+            archive.add(source_path, arcname=os.path.basename(source_path))
+
+    def submit(self, machine, script_path=None, local_file=False,
+               script_remote_path=None):
+        script_path = script_remote_path or script_path
+        stagedir = os.path.dirname(script_path)
+        with open(script_path) as fp:
+            array = re.search(r'--array=0-(\d+)', fp.read())
+
+        # The tasks of a job array run in the task directories
+        num_tasks = int(array.group(1)) + 1 if array else 0
+        taskdirs = [os.path.join(stagedir, str(i)) for i in range(num_tasks)]
+        for taskdir in taskdirs or [stagedir]:
+            for ext in ('out', 'err'):
+                with open(os.path.join(taskdir, f'rfm_job.{ext}'), 'w') as fp:
+                    fp.write('Result: 1.0\n' if ext == 'out' else '')
+
+        with self._lock:
+            jobid = str(len(self._jobs) + 1)
+            self._jobs[jobid] = (time.monotonic(), num_tasks)
+
+        return {'jobid': jobid}
+
+    def poll(self, machine, jobs=None):
+        now = time.monotonic()
+        records = []
+        for jobid in jobs or []:
+            submit_time, num_tasks = self._jobs[jobid]
+            state = ('COMPLETED' if now - submit_time >= self.runtime
+                     else 'RUNNING')
+            for taskid in ([f'{jobid}_{i}' for i in range(num_tasks)] or
+                           [jobid]):
+                records.append({'jobid': taskid, 'state': state,
+                                'exit_code': '0:0',
+                                'nodelist': 'nid000001'})
+
+        return records
+
+    def cancel(self, machine, jobid):
+        pass
+
+
+class MockFirecrest:
+    '''Blocking client of the mock service'''
+
+    def __init__(self, server):
+        self._server = server
+
+    def __getattr__(self, name):
+        method = getattr(self._server, name)
+
+        def _request(*args, **kwargs):
+            self._server.requests += 1
+            time.sleep(self._server.latency)
+            return method(*args, **kwargs)
+
+        return _request
+
+
+class MockAsyncFirecrest(MockFirecrest):
+    '''Asynchronous client of the mock service'''
+
+    def __getattr__(self, name):
+        method = getattr(self._server, name)
+
+        async def _request(*args, **kwargs):
+            self._server.requests += 1
+            await asyncio.sleep(self._server.latency)
+            return method(*args, **kwargs)
+
+        return _request
+
+
+def init_runtime(prefix):
+    '''Initialize ReFrame with its generic configuration'''
+    os.environ['RFM_PREFIX'] = prefix
+    import reframe.core.config as config
+    import reframe.core.runtime as rt
+
+    site_config = config.load_config()
+    site_config.select_subconfig('generic')
+    rt.init_runtime(site_config)
+    return rt.runtime().stage_prefix
+
+
+def make_stagedirs(stage_prefix, num_jobs, num_files):
+    stagedirs = []
+    for i in range(num_jobs):
+        stagedir = os.path.join(stage_prefix, 'generic', 'default',
+                                'builtin', f'Test{i}')
+        os.makedirs(stagedir)
+        with open(os.path.join(stagedir, 'rfm_job.sh'), 'w') as fp:
+            fp.write('#!/bin/bash\necho "Result: 1.0"\n')
+
+        for j in range(num_files):
+            with open(os.path.join(stagedir, f'input{j}.txt'), 'w') as fp:
+                fp.write(f'{i} {j}\n' * 1000)
+
+        stagedirs.append(stagedir)
+
+    return stagedirs
+
+
+def run_session(scheduler, stagedirs, poll_interval=0.1):
+    '''Submit all the jobs and wait for them like the asynchronous execution
+    policy of ReFrame'''
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    jobs = []
+    for stagedir in stagedirs:
+        os.chdir(stagedir)
+        try:
+            job = scheduler.make_job(name='rfm_job',
+                                     script_filename='rfm_job.sh',
+                                     stdout='rfm_job.out',
+                                     stderr='rfm_job.err')
+            job.time_limit = 60
+            scheduler.submit(job)
+            jobs.append(job)
+        finally:
+            os.chdir(cwd)
+
+    while jobs:
+        scheduler.poll(*jobs)
+        for job in [j for j in jobs if scheduler.finished(j)]:
+            scheduler.wait(job)
+            jobs.remove(job)
+
+        if jobs:
+            time.sleep(poll_interval)
+
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=32,
+                        help='Number of jobs in the session')
+    parser.add_argument('--latency', type=float, default=0.1,
+                        help='Latency of every FirecREST request in seconds')
+    parser.add_argument('--runtime', type=float, default=2,
+                        help='Run time of every job in seconds')
+    parser.add_argument('--files', type=int, default=8,
+                        help='Number of input files of every job')
+    parser.add_argument('--api-version', default='1.15.0',
+                        help='FirecREST API version; the stage directories '
+                             'are transferred as archives after 1.15.0')
+    parser.add_argument('--arrays', action='store_true',
+                        help='Run also the sessions with job arrays')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='rfm_firecrest_bench_')
+    os.environ.update({
+        'FIRECREST_CLIENT_ID': 'mock',
+        'FIRECREST_CLIENT_SECRET': 'mock',
+        'AUTH_TOKEN_URL': 'mock',
+        'FIRECREST_URL': 'mock',
+        'FIRECREST_SYSTEM': 'mock',
+        'FIRECREST_API_VERSION': args.api_version,
+        'FIRECREST_NO_BLOBSTORE': '1',
+        # Measure the latency of the requests, not the rate budget
+        'FIRECREST_API_RATE': '1000',
+        'FIRECREST_API_BURST': '1000'
+    })
+    stage_prefix = init_runtime(workdir)
+
+    import firecrest as fc
+    import firecrest_slurm
+
+    server = MockFirecrestServer(args.latency, args.runtime)
+    fc.Firecrest = lambda **kwargs: MockFirecrest(server)
+    fc.AsyncFirecrest = lambda **kwargs: MockAsyncFirecrest(server)
+    fc.ClientCredentialsAuth = lambda *args: None
+
+    print(f'{args.jobs} jobs, {args.files} input files per job, '
+          f'{args.latency} s request latency, {args.runtime} s job run time, '
+          f'API {args.api_version}')
+    for arrays in ([False, True] if args.arrays else [False]):
+        os.environ['FIRECREST_JOB_ARRAYS'] = '1' if arrays else '0'
+        for name, scheduler_type in (
+            ('firecrest-slurm', firecrest_slurm.SlurmFirecrestJobScheduler),
+            ('firecrest-slurm-async',
+             firecrest_slurm.AsyncSlurmFirecrestJobScheduler)
+        ):
+            if arrays:
+                name += ' (arrays)'
+
+            os.environ['FIRECREST_BASEDIR'] = os.path.join(workdir, name)
+            shutil.rmtree(stage_prefix, ignore_errors=True)
+            stagedirs = make_stagedirs(stage_prefix, args.jobs, args.files)
+            server.requests = 0
+            elapsed = run_session(scheduler_type(), stagedirs)
+            print(f'{name:32} {elapsed:7.2f} s {args.jobs / elapsed:7.2f} '
+                  f'jobs/s {server.requests:6d} requests')
+
+    shutil.rmtree(workdir)
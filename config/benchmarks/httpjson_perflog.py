@@ -0,0 +1,192 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Throughput of the httpjson and httpjson_batched perflog handlers
+
+The handlers send the perflog records formatted by ``_format_httpjson`` of
+``config/common.py`` to a local HTTP server that adds a fixed latency to
+every request. The time spent in the handlers is the time that the ReFrame
+pipeline is blocked. In the outage case the server answers with 503 until
+the records are emitted; the batched handler spools them and a second
+handler, as in the next ReFrame run, replays them once the server is back.
+
+Usage: python3 benchmarks/httpjson_perflog.py [--records=2000]
+           [--latency=0.02] [--batch-size=100]
+'''
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..',
+                                'utilities'))
+
+COMMON_CONFIG = os.path.join(os.path.dirname(__file__), '..', 'common.py')
+
+
+class PerflogServer(http.server.ThreadingHTTPServer):
+    '''Count the JSON and NDJSON records posted to it'''
+
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(('127.0.0.1', 0), PerflogRequestHandler)
+        self.latency = latency
+        self.available = True
+        self.records = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/rfm'
+
+
+class PerflogRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        time.sleep(self.server.latency)
+        if not self.server.available:
+            self.send_response(503)
+            self.end_headers()
+            return
+
+        if self.headers['Content-type'] == 'application/x-ndjson':
+            records = [json.loads(line) for line in body.splitlines()]
+        else:
+            records = json.loads(body)
+            if not isinstance(records, list):
+                records = [records]
+
+        with self.server.lock:
+            self.server.records += len(records)
+            self.server.requests += 1
+
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_records(count):
+    '''Records with the attributes of the ReFrame performance records'''
+    records = []
+    for i in range(count):
+        record = logging.LogRecord('reframe', logging.INFO, __file__, 0,
+                                   'sent by reframe', None, None)
+        record.__dict__.update({
+            'check_name': f'Test{i % 50}', 'check_system': 'daint',
+            'check_partition': 'normal', 'check_environ': 'gnu',
+            'check_jobid': 1000 + i, 'check_num_tasks': 4,
+            'check_tags': {'production', 'maintenance'},
+            'check_perf_var': 'bw', 'check_perf_value': 100.0 + i % 10,
+            'check_perf_ref': 100.0, 'check_perf_lower_thres': -0.1,
+            'check_perf_upper_thres': None, 'check_perf_unit': 'GB/s',
+            'check_perfvalues': {}
+        })
+        records.append(record)
+
+    return records
+
+
+def emit_all(handler, records):
+    '''Emit the records and return the time spent in the handler and the
+    number of records that were rejected'''
+    from reframe.core.exceptions import LoggingError
+
+    lost = 0
+    start = time.perf_counter()
+    for record in records:
+        try:
+            handler.emit(record)
+        except LoggingError:
+            lost += 1
+
+    return time.perf_counter() - start, lost
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=2000,
+                        help='Number of perflog records')
+    parser.add_argument('--latency', type=float, default=0.02,
+                        help='Latency of every request in seconds')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Records per request of the batched handler')
+    args = parser.parse_args()
+
+    from reframe.core.logging import HTTPJSONHandler
+    from reframe.utility import import_module_from_file
+    import httpjson_batched
+
+    common = import_module_from_file(COMMON_CONFIG)
+    options = {'extras': {'facility': 'reframe'},
+               'ignore_keys': ['check_perfvalues'],
+               'json_formatter': common._format_httpjson}
+    server = PerflogServer(args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f'{args.records} records, {args.latency} s request latency')
+
+    handler = HTTPJSONHandler(server.url, **options)
+    blocked, lost = emit_all(handler, make_records(args.records))
+    print(f'httpjson          blocked {blocked:7.3f} s, '
+          f'delivered {server.records:6d} records in '
+          f'{server.requests:5d} requests '
+          f'({server.records / blocked:8.0f} records/s)')
+
+    with tempfile.TemporaryDirectory() as spool_dir:
+        for payload in ('ndjson', 'json'):
+            server.records = server.requests = 0
+            handler = httpjson_batched.BatchedHTTPJSONHandler(
+                server.url, batch_size=args.batch_size, flush_interval=1,
+                payload=payload, spool_dir=spool_dir, **options
+            )
+            start = time.perf_counter()
+            blocked, _ = emit_all(handler, make_records(args.records))
+            handler.close()
+            elapsed = time.perf_counter() - start
+            print(f'batched ({payload:6}) blocked {blocked:7.3f} s, '
+                  f'delivered {server.records:6d} records in '
+                  f'{server.requests:5d} requests '
+                  f'({server.records / elapsed:8.0f} records/s)')
+
+        print('Outage')
+        server.available = False
+        server.records = server.requests = 0
+        handler = HTTPJSONHandler(server.url, **options)
+        blocked, lost = emit_all(handler, make_records(args.records))
+        print(f'httpjson          blocked {blocked:7.3f} s, '
+              f'lost {lost:6d} records')
+
+        # Avoid waiting for the backoff of the retries
+        handler = httpjson_batched.BatchedHTTPJSONHandler(
+            server.url, batch_size=args.batch_size, flush_interval=1,
+            spool_dir=spool_dir, backoff_intervals=[0.1], **options
+        )
+        blocked, _ = emit_all(handler, make_records(args.records))
+        handler.close()
+        print(f'batched           blocked {blocked:7.3f} s, '
+              f'spooled {handler.spooled:6d} records')
+
+        server.available = True
+        start = time.perf_counter()
+        handler = httpjson_batched.BatchedHTTPJSONHandler(
+            server.url, batch_size=args.batch_size, spool_dir=spool_dir,
+            **options
+        )
+        handler.flush()
+        elapsed = time.perf_counter() - start
+        handler.close()
+        print(f'next run          replayed {server.records:6d} records in '
+              f'{elapsed:.3f} s')
+
+    server.shutdown()
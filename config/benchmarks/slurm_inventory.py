@@ -0,0 +1,105 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Benchmark of the Slurm inventory against a synthetic ``scontrol`` dump
+
+Usage: python3 benchmarks/slurm_inventory.py [--nodes=10000]
+'''
+
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from utilities.slurm_inventory import SlurmInventory  # noqa: E402
+
+NODE_TYPES = [
+    (('gpu', 'gh200', 'group{g}'), 'normal,debug', 'gpu:4(S:0-3)'),
+    (('mc', 'zen2', 'group{g}'), 'normal', '(null)'),
+    (('gpu', 'a100', 'group{g}'), 'a100', 'gpu:a100:4(S:0-1)'),
+    (('mc', 'bigmem', 'group{g}'), 'bigmem', '(null)'),
+]
+
+
+def synthetic_dump(num_nodes: int) -> str:
+    lines = []
+    for i in range(num_nodes):
+        feats, parts, gres = NODE_TYPES[i % len(NODE_TYPES)]
+        feats = ','.join(feats).format(g=i // 512)
+        lines.append(
+            f'NodeName=nid{i:06d} Arch=aarch64 CoresPerSocket=72 '
+            f'CPUAlloc=0 CPUEfctv=288 CPUTot=288 CPULoad=0.05 '
+            f'AvailableFeatures={feats} ActiveFeatures={feats} '
+            f'Gres={gres} NodeAddr=nid{i:06d} NodeHostName=nid{i:06d} '
+            f'Version=23.02.7 OS=Linux 5.14.21 #1 SMP RealMemory=858000 '
+            f'AllocMem=0 FreeMem=840000 Sockets=4 Boards=1 State=IDLE '
+            f'ThreadsPerCore=1 TmpDisk=0 Weight=1 Owner=N/A '
+            f'MCS_label=N/A Partitions={parts} BootTime=None '
+            f'SlurmdStartTime=None CfgTRES=cpu=288 AllocTRES= '
+            f'CapWatts=n/a CurrentWatts=0 AveWatts=0 Reason=none'
+        )
+
+    return '\n'.join(lines)
+
+
+def legacy_queries(nodes_info: str, node_types: list):
+    '''The regex scans done by SlurmContext before the inventory
+
+    The cost of running ``scontrol`` for every query is not included.
+    '''
+    raw = set(re.findall(r'ActiveFeatures=([^ ]+) .*? Partitions=([^ ]+)',
+                         nodes_info))
+    for feats in node_types:
+        pattern = re.compile(f'ActiveFeatures=.*{".*,.*".join(feats)}.*')
+        matched = '\n'.join(line for line in nodes_info.splitlines()
+                            if pattern.search(line))
+        re.findall(r'Gres=([\w,:()]+)', matched)
+        set(re.findall(r'Partitions=([\w,:()]+)', matched))
+
+    return raw
+
+
+def inventory_queries(nodes_info: str, node_types: list):
+    inventory = SlurmInventory.from_text(nodes_info)
+    raw = inventory.node_types()
+    for feats in node_types:
+        nodes = inventory.nodes_with_features(feats)
+        {n.gres for n in nodes}
+        {n.partitions for n in nodes}
+
+    return raw
+
+
+def timeit(func, *args, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=10000,
+                        help='Number of nodes in the synthetic dump')
+    args = parser.parse_args()
+
+    nodes_info = synthetic_dump(args.nodes)
+    # One devices and one partition query per node type, as done by
+    # SlurmContext when no features are excluded
+    node_types = [feats for feats, _ in
+                  SlurmInventory.from_text(nodes_info).node_types()]
+    print(f'Synthetic dump: {args.nodes} nodes, {len(node_types)} node '
+          f'types, {len(nodes_info) / 1e6:.1f} MB')
+    t_legacy = timeit(legacy_queries, nodes_info, node_types)
+    t_inventory = timeit(inventory_queries, nodes_info, node_types)
+    print(f'regex over the text dump: {t_legacy:.3f} s')
+    print(f'structured inventory:     {t_inventory:.3f} s')
+    print(f'speedup: {t_legacy / t_inventory:.1f}x')
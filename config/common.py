@@ -92,7 +92,10 @@ site_configuration = {
                     'append': True
                 },
                 {
-                    'type': 'httpjson',
+                    # The records are sent in bulk from a background thread
+                    # and spooled to disk while the server is unreachable
+                    # (see utilities/httpjson_batched.py)
+                    'type': 'httpjson_batched',
                     # We are setting this from the environment
                     # to avoid polluting the logs from tests in the
                     # login nodes
@@ -109,7 +112,9 @@ site_configuration = {
                     },
                     # 'debug': True,
                     "json_formatter": _format_httpjson,
-                    'ignore_keys': ['check_perfvalues']
+                    'ignore_keys': ['check_perfvalues'],
+                    'batch_size': 100,
+                    'flush_interval': 5
                 }
             ]
         }
@@ -14,8 +14,12 @@ base_dir = os.path.dirname(os.path.abspath(__file__))
 utilities_path = os.path.join(base_dir, 'utilities')
 sys.path.append(utilities_path)
 
+import site_config
 import uenv
 
+# Registers the 'httpjson_batched' perflog handler of common.py
+import httpjson_batched  # noqa: F401
+
 
 def is_var_true(var):
     if var is None:
@@ -24,6 +28,74 @@ def is_var_true(var):
     return var.lower() in ['true', 'yes', '1']
 
 
+def build_site_configuration(config_files):
+    '''Assemble the configuration from the given config files'''
+    system_configs = [
+        import_module_from_file(f).site_configuration for f in config_files
+    ]
+
+    # Build the configuration dictionary from all the systems/*.py config files
+    site_configuration = {}
+    for c in system_configs:
+        for key, val in c.items():
+            site_configuration.setdefault(key, [])
+            site_configuration[key] += val
+
+    # Set the systems.partitions.sched_options.max_sacct_failures to a higher value
+    # than the default of 3 for all partitions.
+    for system in site_configuration['systems']:
+        for partition in system['partitions']:
+            sched_options = partition.get('sched_options', {})
+            if 'max_sacct_failures' not in sched_options:
+                sched_options['max_sacct_failures'] = 100
+            partition['sched_options'] = sched_options
+
+    return site_configuration
+
+
+def add_uenv_environments(site_configuration):
+    '''Add the environments of the uenv images of CSCS_RFM_UENV
+
+    They are not cached with the rest of the configuration, since the
+    images may change under the same label; their metadata is cached by the
+    image path, size and modification time instead.
+    '''
+    uenv_environs = uenv.UENV
+
+    # If a system partition has the 'uenv' feature, replace the environment'
+    # names valid for that system with the ones from uenv
+    if site_configuration and uenv_environs:
+        site_configuration['environments'] += uenv_environs
+        for system in site_configuration['systems']:
+            valid_system_uenv_names = [
+                u['name'] for u in uenv_environs
+                if (system['name'] in u['target_systems'] or
+                    u['target_systems'] == ['*'])
+            ]
+            for partition in system['partitions']:
+                if partition.get('features', None) and ('uenv' in partition['features']):
+                    # Add the uenvs in the relevant partitions
+                    partition['environs'] += valid_system_uenv_names
+
+                    # Add the corresponding resources for uenv
+                    resources = partition.get('resources', [])
+                    resources.append(
+                        {
+                            'name': 'uenv',
+                            'options': ['--uenv={uenv}']
+                        }
+                    )
+                    resources.append(
+                        {
+                            'name': 'uenv_views',
+                            'options': ['--view={views}']
+                        }
+                    )
+                    partition['resources'] = resources
+
+    return site_configuration
+
+
 systems_path = 'systems'
 
 system_conf_files = glob.glob(
@@ -33,56 +105,13 @@ config_files = [
     os.path.join(os.path.dirname(__file__), 'common.py')
 ]
 # Filter out the links
-config_files += [s for s in system_conf_files if not os.path.islink(s)]
-system_configs = [
-    import_module_from_file(f).site_configuration for f in config_files
-]
+system_conf_files = [s for s in system_conf_files if not os.path.islink(s)]
 
-# Build the configuration dictionary from all the systems/*.py config files
-site_configuration = {}
-for c in system_configs:
-    for key, val in c.items():
-        site_configuration.setdefault(key, [])
-        site_configuration[key] += val
-
-# Set the systems.partitions.sched_options.max_sacct_failures to a higher value
-# than the default of 3 for all partitions.
-for system in site_configuration['systems']:
-    for partition in system['partitions']:
-        sched_options = partition.get('sched_options', {})
-        if 'max_sacct_failures' not in sched_options:
-            sched_options['max_sacct_failures'] = 100
-        partition['sched_options'] = sched_options
-
-uenv_environs = uenv.UENV
-
-# If a system partition has the 'uenv' feature, replace the environment'
-# names valid for that system with the ones from uenv
-if site_configuration and uenv_environs:
-    site_configuration['environments'] += uenv_environs
-    for system in site_configuration['systems']:
-        valid_system_uenv_names = [
-            u['name'] for u in uenv_environs
-            if (system['name'] in u['target_systems'] or
-                u['target_systems'] == ['*'])
-        ]
-        for partition in system['partitions']:
-            if partition.get('features', None) and ('uenv' in partition['features']):
-                # Add the uenvs in the relevant partitions
-                partition['environs'] += valid_system_uenv_names
-
-                # Add the corresponding resources for uenv
-                resources = partition.get('resources', [])
-                resources.append(
-                    {
-                        'name': 'uenv',
-                        'options': ['--uenv={uenv}']
-                    }
-                )
-                resources.append(
-                    {
-                        'name': 'uenv_views',
-                        'options': ['--view={views}']
-                    }
-                )
-                partition['resources'] = resources
+# Only the system files that may match the current host are imported and the
+# assembled configuration is reused from the cache across invocations
+site_configuration = site_config.load_site_configuration(
+    config_files, system_conf_files, build_site_configuration,
+    depends=[os.path.abspath(__file__),
+             os.path.join(utilities_path, 'site_config.py')],
+    extend=add_uenv_environments
+)
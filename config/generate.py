@@ -4,27 +4,36 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import argparse
-import autopep8
 import os
-from jinja2 import Environment, FileSystemLoader
 from utilities.config import SystemConfig
-from utilities.io import getlogger, set_logger_level
+from utilities.io import (getlogger, print_profile, record_imports,
+                          set_logger_level)
+from utilities.job_util import MAX_DETECTION_JOBS
 
 JINJA2_TEMPLATE = 'reframe_config_template.j2'
 
 
 def main(user_input, containers_search, devices_search, reservs,
-         exclude_feat, access_opt, tmp_dir):
+         exclude_feat, access_opt, tmp_dir, use_cache, refresh_cache,
+         cache_ttl, max_jobs, profile=False):
 
+    record_imports()
     # Initialize system configuration
     system_info = SystemConfig()
     # Build the configuration with the right options
     system_info.build_config(
         user_input=user_input, detect_containers=containers_search,
         detect_devices=devices_search, exclude_feats=exclude_feats,
-        reservs=reservs, access_opt=access_opt, tmp_dir=tmp_dir
+        reservs=reservs, access_opt=access_opt, tmp_dir=tmp_dir,
+        use_cache=use_cache, refresh_cache=refresh_cache, cache_ttl=cache_ttl,
+        max_jobs=max_jobs
     )
 
+    # The rendering modules are only needed at the end, do not delay the
+    # first prompt by importing them at startup
+    import autopep8
+    from jinja2 import Environment, FileSystemLoader
+
     # Set up Jinja2 environment and load the template
     template_loader = FileSystemLoader(searchpath='.')
     env = Environment(loader=template_loader,
@@ -49,6 +58,8 @@ def main(user_input, containers_search, devices_search, reservs,
         f'\nThe following configuration files was created:\n'
         f'PYTHON: {system_info.systemname}_config.py', color=False
     )
+    if profile:
+        print_profile()
 
 
 if __name__ == '__main__':
@@ -88,7 +99,32 @@ if __name__ == '__main__':
         '--access', action='store',
         help='Compulsory options for accesing remote nodes with sbatch'
     )
-    # Define the '--access' flag
+    # Define the '--no-cache' flag
+    parser.add_argument(
+        '--no-cache', action='store_true',
+        help='Do not use the cache of the remote detection results'
+    )
+    # Define the '--refresh-cache' flag
+    parser.add_argument(
+        '--refresh-cache', action='store_true',
+        help='Ignore the cached remote detection results and update them'
+    )
+    # Define the '--cache-ttl' flag
+    parser.add_argument(
+        '--cache-ttl', action='store', type=float,
+        help='Lifetime (in hours) of the cached remote detection results'
+    )
+    # Define the '--max-jobs' flag
+    parser.add_argument(
+        '--max-jobs', action='store', type=int, default=MAX_DETECTION_JOBS,
+        help='Maximum number of remote detection jobs queued at once'
+    )
+    # Define the '--profile' flag
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Print the time spent in each of the detection stages'
+    )
+    # Define the '-v' flag
     parser.add_argument(
         '-v', action='store_true',
         help='Set the verbosity to debug. Only effective if combined with --auto.'
@@ -134,4 +170,6 @@ if __name__ == '__main__':
     set_logger_level(args.v or user_input)
 
     main(user_input, containers_search, devices_search,
-         reservs, exclude_feats, access_opt, tmp_dir)
+         reservs, exclude_feats, access_opt, tmp_dir,
+         not args.no_cache, args.refresh_cache, args.cache_ttl,
+         args.max_jobs, args.profile)
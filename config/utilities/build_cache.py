@@ -0,0 +1,428 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Cache of the build artifacts of the compile fixtures across runs
+
+The cache is a directory on a shared filesystem, ``$CSCS_RFM_BUILD_CACHE``,
+that holds a compressed archive of the stage directory of every cached
+build, named after the hash of its inputs, and its metadata. The least
+recently used archives are evicted when the cache exceeds
+``$CSCS_RFM_BUILD_CACHE_SIZE`` (default 200G). The hits and misses are
+recorded in a journal:
+
+    python3 config/utilities/build_cache.py report --since 30d
+    python3 config/utilities/build_cache.py list
+    python3 config/utilities/build_cache.py evict --max-size 100G
+
+The builds are cached and restored by the tests with ``CachedBuildMixin``
+(see ``checks/mixins/cached_build.py``).
+'''
+
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import pathlib
+import re
+import tarfile
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+CACHE_VERSION = 1
+MAX_SIZE = '200G'
+
+# The entries used recently are not evicted, since they may still be being
+# restored
+_EVICTION_GRACE = 3600
+
+# Archives left behind by interrupted runs
+_PENDING_TTL = 24 * 3600
+
+_CHUNK_SIZE = 1 << 20
+
+# Bytes of the squashfs superblock, which holds the creation time and the
+# location of the tables of the image
+_SQUASHFS_SUPERBLOCK = 96
+
+_SIZE = re.compile(r'(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?$', re.IGNORECASE)
+_SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+_RELATIVE_TIME = re.compile(r'(\d+(?:\.\d+)?)([smhdw])$')
+_TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# Files of ReFrame's build job, which the restored build must not replace
+_JOB_FILES = 'rfm_*'
+
+
+def parse_size(value: str) -> int:
+    '''Parse a size such as ``200G`` or ``512MiB`` into bytes'''
+    match = _SIZE.match(value.strip())
+    if not match:
+        raise ValueError(f'invalid size: {value!r}')
+
+    return int(float(match[1]) * _SIZE_UNITS[match[2].upper()])
+
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return f'{size:.1f} {unit}'
+
+        size /= 1024
+
+    return f'{size:.1f} TiB'
+
+
+def default_cache_dir() -> Optional[str]:
+    return os.getenv('CSCS_RFM_BUILD_CACHE') or None
+
+
+def default_max_size() -> int:
+    return parse_size(os.getenv('CSCS_RFM_BUILD_CACHE_SIZE') or MAX_SIZE)
+
+
+def make_key(inputs: dict) -> str:
+    '''The key of a build from its inputs'''
+    data = json.dumps([CACHE_VERSION, inputs], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(_CHUNK_SIZE), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def tree_digest(path: str) -> str:
+    '''Digest of the names and the contents of the files of a directory'''
+    h = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            filepath = os.path.join(dirpath, filename)
+            h.update(os.path.relpath(filepath, path).encode())
+            if os.path.isfile(filepath):
+                h.update(file_digest(filepath).encode())
+
+    return h.hexdigest()
+
+
+_image_digests = {}
+
+
+def image_digest(path: str) -> str:
+    '''Identity of a squashfs image from its superblock and size, without
+    reading the whole image'''
+    st = os.stat(path)
+    cache_key = (path, st.st_size, st.st_mtime_ns)
+    digest = _image_digests.get(cache_key)
+    if digest is None:
+        with open(path, 'rb') as fp:
+            superblock = fp.read(_SQUASHFS_SUPERBLOCK)
+
+        digest = hashlib.sha256(
+            superblock + str(st.st_size).encode()
+        ).hexdigest()
+        _image_digests[cache_key] = digest
+
+    return digest
+
+
+class BuildCache:
+    '''A directory of build archives and their metadata'''
+
+    def __init__(self, directory: str):
+        self._dir = directory
+        self._journal_lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return self._dir
+
+    def _archive(self, key: str) -> str:
+        return os.path.join(self._dir, f'{key}.tar.gz')
+
+    def _metadata(self, key: str) -> str:
+        return os.path.join(self._dir, f'{key}.json')
+
+    def lookup(self, key: str) -> Optional[dict]:
+        '''The metadata of a cached build, which is marked as used'''
+        try:
+            with open(self._metadata(key)) as fp:
+                metadata = json.load(fp)
+
+            os.utime(self._archive(key))
+        except (OSError, ValueError):
+            return None
+
+        if metadata.get('version') != CACHE_VERSION:
+            return None
+
+        return metadata
+
+    def restore(self, key: str, stagedir: str):
+        '''Extract the archive of a build into the stage directory'''
+        with tarfile.open(self._archive(key), 'r:gz') as tar:
+            # Extraction filters are only available since Python 3.12
+            if hasattr(tarfile, 'tar_filter'):
+                tar.extractall(stagedir, filter='tar')
+            else:
+                tar.extractall(stagedir)
+
+    def store(self, key: str, stagedir: str, files: Iterable[str],
+              exclude: Iterable[str], metadata: dict) -> int:
+        '''Archive the files of the stage directory matching the glob
+        patterns ``files`` and return the size of the archive'''
+        exclude = [_JOB_FILES, *exclude]
+
+        def skip(tarinfo):
+            name = os.path.basename(tarinfo.name)
+            if any(fnmatch.fnmatch(name, p) for p in exclude):
+                return None
+
+            return tarinfo
+
+        os.makedirs(self._dir, exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=self._dir, prefix=f'.{key}.',
+                                        suffix='.tmp')
+        try:
+            stage = pathlib.Path(stagedir)
+            with os.fdopen(fd, 'wb') as fp, \
+                 tarfile.open(fileobj=fp, mode='w:gz',
+                              compresslevel=1) as tar:
+                added = set()
+                for pattern in files:
+                    for path in sorted(stage.glob(pattern)):
+                        name = str(path.relative_to(stage))
+                        if name not in added:
+                            added.add(name)
+                            tar.add(path, arcname=name, filter=skip)
+
+            size = os.path.getsize(tmp_file)
+            metadata = dict(metadata, version=CACHE_VERSION, key=key,
+                            size=size, created=time.time())
+            fd, tmp_metadata = tempfile.mkstemp(dir=self._dir,
+                                                prefix=f'.{key}.',
+                                                suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump(metadata, fp, indent=2)
+
+            # The cache is shared, but mkstemp() creates private files
+            umask = os.umask(0)
+            os.umask(umask)
+            for path in (tmp_file, tmp_metadata):
+                os.chmod(path, 0o666 & ~umask)
+
+            # A concurrent lookup only sees complete entries
+            os.replace(tmp_file, self._archive(key))
+            os.replace(tmp_metadata, self._metadata(key))
+        except BaseException:
+            for path in (tmp_file, locals().get('tmp_metadata')):
+                if path:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+            raise
+
+        return size
+
+    def entries(self) -> List[dict]:
+        '''The metadata of the cached builds, with the time they were last
+        used, most recently used first'''
+        entries = []
+        try:
+            filenames = os.listdir(self._dir)
+        except FileNotFoundError:
+            return []
+
+        for filename in filenames:
+            if not filename.endswith('.tar.gz'):
+                continue
+
+            key = filename[:-7]
+            try:
+                st = os.stat(self._archive(key))
+                with open(self._metadata(key)) as fp:
+                    metadata = json.load(fp)
+            except (OSError, ValueError):
+                metadata = {'key': key}
+                try:
+                    st = os.stat(self._archive(key))
+                except OSError:
+                    continue
+
+            metadata.update(size=st.st_size, last_used=st.st_mtime)
+            entries.append(metadata)
+
+        entries.sort(key=lambda e: e['last_used'], reverse=True)
+        return entries
+
+    def evict(self, max_size: int) -> List[dict]:
+        '''Remove the least recently used builds until the cache fits in
+        ``max_size`` bytes'''
+        now = time.time()
+        try:
+            for filename in os.listdir(self._dir):
+                path = os.path.join(self._dir, filename)
+                if filename.endswith('.tmp') and \
+                   now - os.path.getmtime(path) > _PENDING_TTL:
+                    os.remove(path)
+        except OSError:
+            pass
+
+        entries = self.entries()
+        total = sum(e['size'] for e in entries)
+        evicted = []
+        for entry in reversed(entries):
+            if total <= max_size:
+                break
+
+            if now - entry['last_used'] < _EVICTION_GRACE:
+                continue
+
+            for path in (self._metadata(entry['key']),
+                         self._archive(entry['key'])):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+            total -= entry['size']
+            evicted.append(entry)
+            self.record('evict', entry['key'], entry.get('test'),
+                        size=entry['size'])
+
+        return evicted
+
+    def record(self, event: str, key: str, test: Optional[str], **fields):
+        '''Append an event to the journal of the cache'''
+        line = json.dumps(dict(time=time.time(), event=event, key=key,
+                               test=test, **fields)) + '\n'
+        try:
+            os.makedirs(self._dir, exist_ok=True)
+            with self._journal_lock, \
+                 open(os.path.join(self._dir, 'journal.jsonl'), 'a') as fp:
+                fp.write(line)
+        except OSError:
+            pass
+
+    def journal(self, since: Optional[float] = None) -> Iterable[dict]:
+        try:
+            with open(os.path.join(self._dir, 'journal.jsonl')) as fp:
+                for line in fp:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    if since is None or event['time'] >= since:
+                        yield event
+        except FileNotFoundError:
+            return
+
+    def report(self, since: Optional[float] = None) -> Dict[str, dict]:
+        '''The hits, misses, stored and evicted bytes and build time saved
+        per test'''
+        stats = defaultdict(lambda: {'hit': 0, 'miss': 0, 'store': 0,
+                                     'evict': 0, 'saved': 0.0,
+                                     'stored': 0})
+        for event in self.journal(since):
+            test = stats[event.get('test') or event['key']]
+            test[event['event']] = test.get(event['event'], 0) + 1
+            if event['event'] == 'hit':
+                test['saved'] += event.get('saved') or 0
+            elif event['event'] == 'store':
+                test['stored'] += event.get('size') or 0
+
+        return dict(stats)
+
+
+def _parse_time(value: str) -> float:
+    match = _RELATIVE_TIME.match(value)
+    if match:
+        return time.time() - float(match[1]) * _TIME_UNITS[match[2]]
+
+    from datetime import datetime
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Report on and manage the build cache of the compile '
+                    'fixtures'
+    )
+    parser.add_argument('--cache', default=default_cache_dir(),
+                        help='The cache directory (default: '
+                             '$CSCS_RFM_BUILD_CACHE)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    report = commands.add_parser('report',
+                                 help='Print the hits and misses per test')
+    report.add_argument('--since', type=_parse_time,
+                        help='Start of the report: an ISO date or a time '
+                             'relative to now, e.g. 30d')
+    commands.add_parser('list', help='List the cached builds')
+    evict = commands.add_parser('evict',
+                                help='Evict the least recently used builds')
+    evict.add_argument('--max-size', type=parse_size,
+                       default=default_max_size(),
+                       help='Maximum size of the cache (default: '
+                            '$CSCS_RFM_BUILD_CACHE_SIZE or '
+                            f'{MAX_SIZE})')
+    args = parser.parse_args(argv)
+    if not args.cache:
+        parser.error('no --cache given and CSCS_RFM_BUILD_CACHE is not set')
+
+    cache = BuildCache(args.cache)
+    if args.command == 'report':
+        stats = cache.report(args.since)
+        print(f'{"test":60s} {"hits":>5s} {"misses":>6s} {"rate":>6s} '
+              f'{"saved":>9s} {"stored":>10s}')
+        totals = defaultdict(float)
+        for test, s in sorted(stats.items()):
+            lookups = s['hit'] + s['miss']
+            if not lookups:
+                continue
+
+            for field in ('hit', 'miss', 'saved', 'stored'):
+                totals[field] += s[field]
+
+            print(f'{test[:60]:60s} {s["hit"]:5d} {s["miss"]:6d} '
+                  f'{s["hit"] / lookups:6.0%} {s["saved"] / 60:7.1f} m '
+                  f'{format_size(s["stored"]):>10s}')
+
+        lookups = totals['hit'] + totals['miss']
+        if lookups:
+            print(f'{"total":60s} {totals["hit"]:5.0f} {totals["miss"]:6.0f} '
+                  f'{totals["hit"] / lookups:6.0%} '
+                  f'{totals["saved"] / 60:7.1f} m '
+                  f'{format_size(totals["stored"]):>10s}')
+
+        entries = cache.entries()
+        print(f'{len(entries)} builds, '
+              f'{format_size(sum(e["size"] for e in entries))} of '
+              f'{format_size(default_max_size())}')
+    elif args.command == 'list':
+        for e in cache.entries():
+            last_used = time.strftime('%Y-%m-%dT%H:%M:%S',
+                                      time.localtime(e['last_used']))
+            print(f'{e["key"][:16]} {last_used} {format_size(e["size"]):>10s} '
+                  f'{e.get("build_time", 0) / 60:6.1f} m  {e.get("test")}')
+    else:
+        evicted = cache.evict(args.max_size)
+        print(f'Evicted {len(evicted)} builds '
+              f'({format_size(sum(e["size"] for e in evicted))})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from typing import Union
+from utilities.io import getlogger
+
+# Default lifetime of the cached detection results (in hours)
+CACHE_TTL = 7 * 24
+CACHE_VERSION = 1
+
+
+def _default_cache_file() -> str:
+    cache_home = os.getenv('XDG_CACHE_HOME',
+                           os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'reframe', 'config_detection.json')
+
+
+class DetectionCache:
+    '''Persistent cache for the results of the remote detection jobs
+
+    The entries are keyed by the node type (ActiveFeatures), the partition
+    used to access it, the access options and a hash of the detection
+    script, so any change in the cluster or in the detection itself
+    triggers a new job submission.
+    '''
+
+    def __init__(self, namespace: str = '',
+                 cache_file: Union[str, None] = None,
+                 ttl: float = CACHE_TTL, refresh: bool = False):
+        self._namespace = namespace
+        self._file = cache_file or _default_cache_file()
+        self._ttl = ttl * 3600
+        self._refresh = refresh
+        self._modified = False
+        self.hits = 0
+        self.misses = 0
+        self._entries = self._load()
+
+    @property
+    def filename(self):
+        return self._file
+
+    def _load(self) -> dict:
+        try:
+            with open(self._file, 'r') as fp:
+                cache = json.load(fp)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            getlogger().warning(
+                f'Ignoring invalid detection cache {self._file}: {e}')
+            return {}
+
+        if cache.get('version') != CACHE_VERSION:
+            return {}
+
+        return cache.get('entries', {})
+
+    def make_key(self, node_feats: tuple, partition: Union[str, None],
+                 access_options: list, script: str) -> str:
+        '''Build the key of the cache entry of a node type'''
+        script_hash = hashlib.sha256(script.encode()).hexdigest()
+        key = json.dumps([self._namespace, sorted(node_feats),
+                          partition or '', list(access_options),
+                          script_hash])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Union[dict, None]:
+        '''Return the cached detection results or None if not valid'''
+        entry = self._entries.get(key)
+        if self._refresh or not entry or \
+           time.time() - entry['timestamp'] > self._ttl:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def put(self, key: str, container_platforms: list, devices: dict,
+            access_options: list):
+        '''Store the parsed results of a detection job'''
+        self._entries[key] = {
+            'timestamp': time.time(),
+            'container_platforms': container_platforms,
+            'devices': devices,
+            'access': list(access_options)
+        }
+        self._modified = True
+
+    def _purge_expired(self):
+        now = time.time()
+        self._entries = {
+            k: v for k, v in self._entries.items()
+            if now - v['timestamp'] <= self._ttl
+        }
+
+    def save(self):
+        '''Write the cache to disk atomically'''
+        if not self._modified:
+            return
+
+        self._purge_expired()
+        cache_dir = os.path.dirname(self._file)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({'version': CACHE_VERSION,
+                           'entries': self._entries}, fp, indent=2)
+
+            os.replace(tmp_file, self._file)
+        except OSError as e:
+            getlogger().warning(
+                f'Detection cache could not be written to {self._file}: {e}')
+            return
+
+        self._modified = False
+        getlogger().debug(
+            f'Detection cache saved in {self._file} '
+            f'({self.hits} hits, {self.misses} misses)')
@@ -7,10 +7,13 @@ import asyncio
 import os
 import re
 import socket
+from concurrent.futures import ThreadPoolExecutor
 from typing import Union
-from utilities.io import (getlogger, request_modules,
+from utilities.cache import DetectionCache
+from utilities.io import (getlogger, profile_stage, request_modules,
                           user_descr, user_selection)
-from utilities.job_util import Launcher, Scheduler, SlurmContext
+from utilities.job_util import (MAX_DETECTION_JOBS, Launcher, Scheduler,
+                                SlurmContext)
 from utilities.modules import ModulesSystem, modules_impl
 
 
@@ -79,21 +82,33 @@ class SystemConfig:
             self._hostnames.append(hostname.group(0))
             getlogger().info(f'Hostname is {hostname.group(0)}')
 
+    @staticmethod
+    def _validate_modules_system(modules_system: type) -> Union[ModulesSystem,
+                                                                None]:
+        try:
+            modules_system = modules_system()
+        except Exception:
+            return None
+
+        return modules_system if modules_system.found else None
+
     def find_modules_system(self) -> Union[ModulesSystem, None]:
         '''Detect the modules system and return it'''
-        for mod in modules_impl:
-            modules_system = modules_impl[mod]
-            if modules_system().found:
-                self._modules_system = modules_system().name
+        # Validate all the implementations concurrently and keep the first
+        # one found in the order of preference of modules_impl
+        with ThreadPoolExecutor(max_workers=len(modules_impl)) as executor:
+            candidates = list(executor.map(self._validate_modules_system,
+                                           modules_impl.values()))
+
+        for modules_system in candidates:
+            if modules_system:
+                self._modules_system = modules_system.name
                 getlogger().info(
                     f'Found a sane {self._modules_system} '
                     'installation in the system')
-                break
+                return modules_system
 
-        if self._modules_system:
-            return modules_system()
-        else:
-            return None
+        return None
 
     def _get_resourcesdir(self):
         '''Ask about a possible resources dir'''
@@ -110,7 +125,10 @@ class SystemConfig:
 
     def find_scheduler(self, user_input: bool, detect_containers: bool,
                        detect_devices: bool, wait: bool, access_opt: list,
-                       tmp_dir: Union[str, None]) -> Union[SlurmContext, None]:
+                       tmp_dir: Union[str, None],
+                       cache: Union[DetectionCache, None] = None,
+                       max_jobs: int = MAX_DETECTION_JOBS
+                       ) -> Union[SlurmContext, None]:
         '''Detect the remote scheduler'''
         scheduler = Scheduler()
         scheduler.detect_scheduler(user_input)
@@ -121,7 +139,8 @@ class SystemConfig:
                                 detect_containers=detect_containers,
                                 detect_devices=detect_devices,
                                 access_opt=access_opt,
-                                wait=wait, tmp_dir=tmp_dir)
+                                wait=wait, tmp_dir=tmp_dir,
+                                cache=cache, max_jobs=max_jobs)
         else:
             return None
 
@@ -136,14 +155,19 @@ class SystemConfig:
                      detect_devices: bool = True,
                      wait: bool = True, exclude_feats: list = [],
                      reservs: list = [], access_opt: list = [],
-                     tmp_dir: Union[str, None] = None):
+                     tmp_dir: Union[str, None] = None,
+                     use_cache: bool = True, refresh_cache: bool = False,
+                     cache_ttl: Union[float, None] = None,
+                     max_jobs: int = MAX_DETECTION_JOBS):
         '''Build the configuration with all the information'''
         # System name
         self.find_systemname()
         # Hostname
-        self.find_hostname()
+        with profile_stage('hostname'):
+            self.find_hostname()
         # Modules system
-        modules_system = self.find_modules_system()
+        with profile_stage('modules system'):
+            modules_system = self.find_modules_system()
         # TODO: not available for spack yet
         if modules_system and user_input:
             getlogger().debug('You can require some modules to be loaded '
@@ -152,16 +176,28 @@ class SystemConfig:
 
         if user_input:
             self._get_resourcesdir()
+        # Cache of the remote detection results
+        cache = None
+        if use_cache:
+            cache_opts = {'namespace': self.systemname,
+                          'refresh': refresh_cache}
+            if cache_ttl is not None:
+                cache_opts['ttl'] = cache_ttl
+
+            cache = DetectionCache(**cache_opts)
+
         # Scheduler
-        self._slurm_schd = self.find_scheduler(
-            user_input,
-            detect_containers=detect_containers,
-            detect_devices=detect_devices,
-            access_opt=access_opt,
-            wait=wait, tmp_dir=tmp_dir
-        )
+        with profile_stage('scheduler'):
+            self._slurm_schd = self.find_scheduler(
+                user_input,
+                detect_containers=detect_containers,
+                detect_devices=detect_devices,
+                access_opt=access_opt,
+                wait=wait, tmp_dir=tmp_dir, cache=cache, max_jobs=max_jobs
+            )
         # Launcher
-        self.find_launcher(user_input)
+        with profile_stage('launcher'):
+            self.find_launcher(user_input)
         # Partition detection only available with Slurm
         if self._slurm_schd:
             # Search node types
@@ -3,16 +3,29 @@
 #
 # SPDX-License-Identifier: BSD-3-Clause
 
-import functools
+import asyncio
+import atexit
+import fnmatch
+import hashlib
 import hostlist
+import io
 import itertools
+import json
 import logging
 import os
 import re
+import requests
+import shlex
 import shutil
 import stat
 import sys
+import tarfile
+import tempfile
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime
 from packaging.version import Version
 
 import reframe.core.runtime as rt
@@ -22,12 +35,39 @@ from reframe.core.schedulers.slurm import (SlurmJobScheduler,
                                            slurm_state_completed,
                                            _SlurmNode)
 from reframe.core.exceptions import JobSchedulerError
-import reframe.utility.osext as osext
+from reframe.utility import seconds_to_hms
 
 if sys.version_info >= (3, 7):
     import firecrest as fc
 
-_run_strict = functools.partial(osext.run_command, check=True)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Requests that are expected to fail are silenced only in their own thread,
+# through a filter on the loggers of all the modules of the client
+_quiet = threading.local()
+
+
+def _is_loud(record):
+    return not getattr(_quiet, 'active', False)
+
+
+for _name in [n for n in logging.Logger.manager.loggerDict
+              if n.split('.')[0] == 'firecrest']:
+    logging.getLogger(_name).addFilter(_is_loud)
+
+
+@contextmanager
+def _quiet_firecrest():
+    '''Silence the logs of the FirecREST client in the current thread'''
+    previous = getattr(_quiet, 'active', False)
+    _quiet.active = True
+    try:
+        yield
+    finally:
+        _quiet.active = previous
 
 
 def join_and_normalize(*args):
@@ -36,6 +76,686 @@ def join_and_normalize(*args):
     return normalized_path
 
 
+def _is_var_true(var):
+    return os.environ.get(var, '').lower() in ['true', 'yes', '1']
+
+
+def _parse_mtime(last_modified):
+    '''The timestamp of the modification time of a remote file listing'''
+    return datetime.fromisoformat(last_modified).timestamp()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+class _SpoolingWriter(io.RawIOBase):
+    '''Write-only stream that is kept in memory up to ``max_size`` bytes
+    and is spilled to ``path`` afterwards.'''
+
+    def __init__(self, max_size, path):
+        self._max_size = max_size
+        self._path = path
+        self._file = io.BytesIO()
+        self.spilled = False
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if not self.spilled and self._file.tell() + len(data) > self._max_size:
+            spill_file = open(self._path, 'wb')
+            spill_file.write(self._file.getbuffer())
+            self._file = spill_file
+            self.spilled = True
+
+        return self._file.write(data)
+
+    def size(self):
+        return self._file.tell()
+
+    def getvalue(self):
+        return self._file.getvalue()
+
+    def close(self):
+        if self.spilled:
+            self._file.close()
+
+        super().close()
+
+
+# Blobs used less than a day ago are neither evicted nor marked as used
+# again, and the uploads of blobs left behind for longer are removed
+_BLOB_MIN_AGE = 86400
+
+# Maximum number of requests to pull a stage directory around its large
+# files, beyond which they are pulled in its archive
+_MAX_SPLIT_REQUESTS = 32
+
+# Suffixes of the archives pushed to the remote stage directories
+_ARCHIVE_SUFFIXES = {'gzip': '.tar.gz', 'zstd': '.tar.zst'}
+
+
+@contextmanager
+def _tar_writer(fileobj, compression):
+    '''Open a streaming tar archive compressed with zstd (multithreaded)
+    or gzip'''
+    if compression == 'zstd':
+        compressor = zstandard.ZstdCompressor(threads=-1)
+        with compressor.stream_writer(fileobj, closefd=False) as zfp:
+            with tarfile.open(fileobj=zfp, mode='w|') as archive:
+                yield archive
+    else:
+        with tarfile.open(fileobj=fileobj, mode='w|gz') as archive:
+            yield archive
+
+
+class _StageManifest:
+    '''Content manifest of a remote stage directory.
+
+    It maps the path of every file relative to the stage directory to its
+    size, modification time and sha256 digest. A copy of the manifest is
+    kept in the remote stage directory, so that only the files that changed
+    since the last push need to be uploaded. It is written after the files,
+    so the remote files modified after it were changed in place.
+    '''
+
+    FILENAME = '.rfm_push_manifest.json'
+
+    def __init__(self, files=None, dirs=None):
+        self.files = files or {}
+        self.dirs = set(dirs or [])
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        return cls(data['files'], data['dirs'])
+
+    def to_json(self):
+        return json.dumps({'files': self.files, 'dirs': sorted(self.dirs)})
+
+    def add(self, relpath, st, sha256=None):
+        self.files[relpath] = {
+            'size': st.st_size,
+            'mtime': st.st_mtime_ns,
+            'sha256': sha256
+        }
+
+    def discard(self, relpath):
+        self.files.pop(relpath, None)
+
+    def copy(self):
+        return _StageManifest(dict(self.files), self.dirs)
+
+
+def _is_throttled(error):
+    '''Whether FirecREST asks to retry the request later'''
+    status = error.responses[-1].status_code if error.responses else 0
+    return status == 429 or status >= 500
+
+
+def _retry_after(error):
+    retry_after = error.responses[-1].headers.get('Retry-After')
+    return float(retry_after) if retry_after else None
+
+
+def _group_poll_records(results):
+    '''Group the poll records by job id'''
+    records = {}
+    for r in results:
+        # Take into account both job arrays and heterogeneous jobs
+        jobid = re.split(r'_|\+', r['jobid'])[0]
+        records.setdefault(jobid, []).append(r)
+
+    return records
+
+
+def _pending_tasks(jobid):
+    '''Return the task ids of the record of the pending tasks of a job
+    array, e.g. ``1234_[2-5,7%4]``'''
+    spec = jobid.partition('_[')[2].rstrip(']').split('%')[0]
+    tasks = set()
+    for part in spec.split(','):
+        first, _, last = part.partition('-')
+        tasks.update(range(int(first), int(last or first) + 1))
+
+    return tasks
+
+
+def _task_records(jobid, task, records):
+    '''Return the poll records of one task of a job array
+
+    Slurm reports the tasks that have not started together in one record.
+    '''
+    task_records = [r for r in records if r['jobid'] == jobid]
+    if task_records:
+        return task_records
+
+    for r in records:
+        if '_[' in r['jobid'] and task in _pending_tasks(r['jobid']):
+            return [r]
+
+    return []
+
+
+class _TokenBucket:
+    '''Token bucket limiting the rate of the FirecREST API requests.'''
+
+    def __init__(self, rate, burst):
+        self._rate = rate
+        self._burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst,
+                           self._tokens + (now - self._last) * self._rate)
+        self._last = now
+
+    def try_acquire(self):
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+
+            return False
+
+    def delay(self):
+        '''Time until the next token is available'''
+        with self._lock:
+            self._refill()
+            return max(0, (1 - self._tokens) / self._rate)
+
+    def acquire(self):
+        while not self.try_acquire():
+            time.sleep(self.delay())
+
+
+class _PollCoordinator:
+    '''Single point of polling for all the jobs of the scheduler.
+
+    The test jobs and the helper compress/extract jobs are polled together
+    with one ``client.poll`` call, whose results are cached and shared by
+    all the callers. The requests are subject to a token bucket budget and
+    to a global backoff when FirecREST answers with 429 or 5xx.
+    '''
+
+    def __init__(self, client, system_name, log, rate=2.0, burst=5,
+                 max_age=1.0, max_backoff=60):
+        self._client = client
+        self._system_name = system_name
+        self._log = log
+        self._bucket = _TokenBucket(rate, burst)
+        self._max_age = max_age
+        self._max_backoff = max_backoff
+        self._outstanding = set()
+        self._records = {}
+        self._timestamps = {}
+        self._backoff = 0
+        self._backoff_until = 0
+        self._polling = False
+        self._cond = threading.Condition()
+
+    def register(self, *jobids):
+        with self._cond:
+            self._outstanding.update(jobids)
+
+    def unregister(self, *jobids):
+        with self._cond:
+            self._outstanding.difference_update(jobids)
+            for jobid in jobids:
+                self._records.pop(jobid, None)
+                self._timestamps.pop(jobid, None)
+
+    def backoff(self, delay=None):
+        '''Pause all the API requests for ``delay`` seconds or, if not
+        given, for an exponentially increasing amount of time.'''
+        with self._cond:
+            if delay is None:
+                delay = min(max(2 * self._backoff, 1), self._max_backoff)
+                self._backoff = delay
+
+            self._backoff_until = max(self._backoff_until,
+                                      time.monotonic() + delay)
+
+    def reserve(self):
+        '''Take an API request from the budget and return 0, or return the
+        time to wait before trying again'''
+        wait_time = self._backoff_until - time.monotonic()
+        if wait_time > 0:
+            return wait_time
+
+        if self._bucket.try_acquire():
+            return 0
+
+        return self._bucket.delay()
+
+    def throttle(self):
+        '''Block until an API request is allowed'''
+        wait_time = self.reserve()
+        while wait_time:
+            time.sleep(wait_time)
+            wait_time = self.reserve()
+
+    def _is_fresh(self, jobids):
+        now = time.monotonic()
+        return all(now - self._timestamps.get(j, -self._max_age - 1) <=
+                   self._max_age for j in jobids)
+
+    def _refresh(self, block):
+        with self._cond:
+            if self._polling:
+                # Another thread is polling, use its results
+                self._cond.wait()
+                return
+
+            if not block and (time.monotonic() < self._backoff_until or
+                              not self._bucket.try_acquire()):
+                return
+
+            self._polling = True
+            jobids = sorted(self._outstanding)
+
+        try:
+            if block:
+                self.throttle()
+
+            try:
+                results = self._client.poll(self._system_name, jobids)
+            except fc.FirecrestException as e:
+                if not _is_throttled(e):
+                    raise
+
+                self.backoff(_retry_after(e))
+                self._log(f'FirecREST answered with '
+                          f'{e.responses[-1].status_code}, backing off the '
+                          f'polling')
+                return
+
+            self._backoff = 0
+            records = _group_poll_records(results)
+            now = time.monotonic()
+            with self._cond:
+                for jobid in jobids:
+                    if jobid in records:
+                        self._records[jobid] = records[jobid]
+
+                    self._timestamps[jobid] = now
+        finally:
+            with self._cond:
+                self._polling = False
+                self._cond.notify_all()
+
+    def records(self, jobids, block=False):
+        '''Return the poll records of the jobs
+
+        If the cached records are older than the maximum age, all the
+        outstanding jobs are polled again. In non-blocking mode the cached
+        records are returned if the budget does not allow a new request.
+        '''
+        self.register(*jobids)
+        if not self._is_fresh(jobids):
+            self._refresh(block)
+
+        with self._cond:
+            return {j: self._records[j] for j in jobids
+                    if j in self._records}
+
+    def wait(self, jobid, unknown_timeout=120):
+        '''Wait for a job to complete and return its poll records
+
+        An empty list is returned if the job does not show up in the poll
+        results within ``unknown_timeout`` seconds.
+        '''
+        try:
+            intervals = itertools.cycle([1, 2, 3])
+            start = time.monotonic()
+            while True:
+                records = self.records([jobid], block=True).get(jobid)
+                if records and slurm_state_completed(
+                    ','.join(r['state'] for r in records)
+                ):
+                    return records
+
+                if (not records and
+                        time.monotonic() - start > unknown_timeout):
+                    return []
+
+                time.sleep(next(intervals))
+        finally:
+            self.unregister(jobid)
+
+
+class _TransferEngine:
+    '''Concurrent downloads from the remote system.
+
+    The files up to the maximum size of the utilities are downloaded with
+    ``simple_download``, the rest through the object storage. Failed
+    transfers are retried and the external downloads are resumed from the
+    partially downloaded file, without staging the file again in the
+    object storage.
+    '''
+
+    def __init__(self, client, system_name, log, max_simple_size,
+                 max_workers=4, retries=3):
+        self._client = client
+        self._system_name = system_name
+        self._log = log
+        self._max_simple_size = max_simple_size
+        self._max_workers = max(max_workers, 1)
+        self._retries = retries
+
+    def _retry(self, remote_path, transfer):
+        '''Call ``transfer`` until it succeeds and return the elapsed
+        time'''
+        start = time.monotonic()
+        for attempt in itertools.count():
+            try:
+                transfer()
+            except (fc.FirecrestException, requests.RequestException,
+                    tarfile.TarError, OSError) as e:
+                if attempt >= self._retries:
+                    raise JobSchedulerError(
+                        f'could not download {remote_path}'
+                    ) from e
+
+                t = min(2 ** attempt, 30)
+                self._log(f'Download of {remote_path} failed ({e}), will '
+                          f'retry after {t} sec')
+                time.sleep(t)
+                continue
+
+            return time.monotonic() - start
+
+    def _record(self, remote_path, nbytes, elapsed):
+        rate = nbytes / elapsed / 1e6 if elapsed > 0 else 0
+        self._log(f'Downloaded {remote_path} ({nbytes} bytes in '
+                  f'{elapsed:.2f} sec, {rate:.2f} MB/s)')
+        return nbytes
+
+    def _object_storage_link(self, remote_path, part_path):
+        down_obj = self._client.external_download(self._system_name,
+                                                  remote_path)
+        link = getattr(down_obj, 'object_storage_link', None)
+        if link is None:
+            # The client cannot expose the link, download it in one go
+            down_obj.finish_download(part_path)
+
+        return link
+
+    def _external_download(self, remote_path, local_path, size, link):
+        part_path = f'{local_path}.part'
+        if link.get('url') is None:
+            link['url'] = self._object_storage_link(remote_path, part_path)
+            if link['url'] is None:
+                os.replace(part_path, local_path)
+                return
+
+        offset = (os.path.getsize(part_path)
+                  if os.path.exists(part_path) else 0)
+        headers = {'Range': f'bytes={offset}-'} if offset else {}
+        with requests.get(link['url'], headers=headers, stream=True,
+                          timeout=60) as response:
+            if response.status_code in (403, 404):
+                # The link has expired, stage the file again
+                link['url'] = None
+
+            response.raise_for_status()
+            if response.status_code != 206:
+                offset = 0
+
+            with open(part_path, 'ab' if offset else 'wb') as fp:
+                for chunk in response.iter_content(1 << 20):
+                    fp.write(chunk)
+
+        if os.path.getsize(part_path) < size:
+            raise OSError(f'incomplete download of {remote_path}')
+
+        os.replace(part_path, local_path)
+
+    def _download(self, remote_path, local_path, size):
+        # Only the transfers of this pull are resumed, the partial file of a
+        # previous one may not match the current remote file
+        try:
+            os.remove(f'{local_path}.part')
+        except FileNotFoundError:
+            pass
+
+        link = {}
+
+        def _transfer():
+            if size <= self._max_simple_size:
+                self._client.simple_download(self._system_name,
+                                             remote_path, local_path)
+            else:
+                self._external_download(remote_path, local_path, size, link)
+
+        if size > self._max_simple_size:
+            self._log(f'File {remote_path} is {size} bytes, so it may take '
+                      f'some time...')
+
+        elapsed = self._retry(remote_path, _transfer)
+        return self._record(remote_path, os.path.getsize(local_path),
+                            elapsed)
+
+    def read(self, remote_path, size, consume):
+        '''Download a small file with ``simple_download`` and pass its
+        contents to ``consume`` as a file object, without writing it to
+        disk'''
+
+        # simple_download holds the whole response in memory anyway, the
+        # file is only limited by the maximum size of the utilities
+        def _transfer():
+            buffer = io.BytesIO()
+            self._client.simple_download(self._system_name, remote_path,
+                                         buffer)
+            buffer.seek(0)
+            consume(buffer)
+
+        return self._record(remote_path, size,
+                            self._retry(remote_path, _transfer))
+
+    def download(self, transfers, on_complete=None):
+        '''Download the ``(remote_path, local_path, size)`` transfers
+
+        ``on_complete`` is called with every transfer that completes; if any
+        of them failed, the exception is raised once all the others have
+        finished. The number of downloaded bytes is returned.
+        '''
+        nbytes, error = 0, None
+        with ThreadPoolExecutor(max_workers=self._max_workers) as pool:
+            futures = {pool.submit(self._download, *t): t for t in transfers}
+            for future in as_completed(futures):
+                try:
+                    nbytes += future.result()
+                except JobSchedulerError as e:
+                    error = error or e
+                    continue
+
+                if on_complete:
+                    on_complete(futures[future])
+
+        if error:
+            raise error
+
+        return nbytes
+
+
+class _MetadataCache:
+    '''Session cache of the node, partition and reservation descriptions
+
+    The entries expire after ``ttl`` seconds and, if a file is given, they
+    are persisted so that they can be reused by the following sessions.
+    The objects built from an entry, e.g. the node index, are kept as long
+    as the entry is valid.
+    '''
+
+    VERSION = 1
+
+    def __init__(self, ttl, filename=None):
+        self._ttl = ttl
+        self._file = filename
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self._built = {}
+
+    def _load(self):
+        if not self._file:
+            return {}
+
+        try:
+            with open(self._file) as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+        if data.get('version') != self.VERSION:
+            return {}
+
+        return data.get('entries', {})
+
+    def _save(self):
+        if not self._file:
+            return
+
+        cache_dir = os.path.dirname(os.path.abspath(self._file))
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({'version': self.VERSION,
+                           'entries': self._entries}, fp)
+
+            os.replace(tmp_file, self._file)
+        except OSError:
+            # The cache is only an optimization
+            pass
+
+    def get(self, key, fetch, build=None, ttl=None):
+        '''Return the cached value of ``key``, or the object built from
+        it, calling ``fetch`` if it is missing or older than ``ttl``, which
+        is at most the TTL of the cache'''
+        if ttl is None:
+            ttl = self._ttl
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] <= min(ttl, self._ttl):
+                if build is None:
+                    return entry[1]
+
+                built = self._built.get(key)
+                if built and built[0] == entry[0]:
+                    return built[1]
+            else:
+                entry = None
+
+        if entry is None:
+            entry = [time.time(), fetch()]
+            with self._lock:
+                self._entries = {
+                    k: v for k, v in self._entries.items()
+                    if entry[0] - v[0] <= self._ttl
+                }
+                self._entries[key] = entry
+                self._save()
+
+        if build is None:
+            return entry[1]
+
+        obj = build(entry[1])
+        with self._lock:
+            self._built[key] = (entry[0], obj)
+
+        return obj
+
+
+class _NodeIndex:
+    '''Nodes of a FirecREST node listing indexed by name.
+
+    The nodes share the interned strings and the sets of their partitions,
+    features and states, so filtering them by partition or feature only
+    compares a handful of distinct sets.
+    '''
+
+    def __init__(self, descriptions):
+        shared = {}
+        self.by_name = {}
+        for descr in descriptions:
+            node = _FirecrestSlurmNode(descr, shared)
+            self.by_name[node.name] = node
+
+    @property
+    def nodes(self):
+        return set(self.by_name.values())
+
+    def lookup(self, names):
+        '''Return the nodes with the given names or None if any of them is
+        not in the index'''
+        try:
+            return {self.by_name[n] for n in names}
+        except KeyError:
+            return None
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+# Options of the job scripts that are set by the job array itself
+_ARRAY_OWN_OPTIONS = {'-J', '--job-name', '-o', '--output', '-e', '--error',
+                      '-t', '--time'}
+
+
+class _JobArray:
+    '''Compatible jobs that are submitted together as the tasks of one
+    Slurm job array.
+
+    The stage directories of the jobs are pushed as the task directories of
+    one bundle, the array is polled with a single job id and its results
+    are pulled at once and split back into the local stage directories.
+    It has the attributes of a job that are needed to push, submit and
+    pull the bundle.
+    '''
+
+    script_filename = 'rfm_array.sh'
+
+    def __init__(self, directives, name, localdir, remotedir):
+        # The shared ``#SBATCH`` lines, which identify the compatible jobs
+        self.directives = directives
+        self.name = name
+        self.members = []
+        self.created = time.monotonic()
+        self._localdir = localdir
+        self._remotedir = remotedir
+        self._jobid = None
+        self._submit_time = None
+
+        # Shared by the members until the array is submitted
+        self.submission = Future()
+        self.pull_lock = threading.Lock()
+        self.pulled = False
+
+    @property
+    def jobid(self):
+        return self._jobid
+
+    @property
+    def completed(self):
+        return all(slurm_state_completed(m.state) for m in self.members)
+
+
 class _SlurmFirecrestJob(sched.Job):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -44,6 +764,30 @@ class _SlurmFirecrestJob(sched.Job):
         self._remotedir = None
         self._localdir = None
 
+        # Patterns of the files that are pulled right after the job in the
+        # selective pull mode, besides the job script and its output
+        self.pull_files = []
+
+        # Outputs of a successful job that stay in the remote stage
+        # directory, e.g. when the test reads a digest of them instead
+        self.remote_outputs = []
+
+        # The transfers of the files left in the remote stage directory by
+        # the selective pull, by their path in the stage directory
+        self._remote_files = {}
+
+        # Whether the job was waited for and its results pulled
+        self._waited = False
+
+        # Futures of the submission and of the pull of the results in the
+        # asynchronous scheduler
+        self._submission = None
+        self._pull = None
+
+        # The job array of a batched job and its task id in it
+        self._array = None
+        self._array_task = None
+
         # The compacted nodelist as reported by Slurm. This must be updated
         # in every poll as Slurm may be slow in reporting the exact nodelist
         self._nodespec = None
@@ -61,6 +805,48 @@ class _SlurmFirecrestJob(sched.Job):
     def remotedir(self):
         return self._remotedir
 
+    @property
+    def _poll_id(self):
+        return self._array.jobid if self._array else self.jobid
+
+    def _submission_pending(self):
+        # Jobs submitted in the background or batched in a job array get
+        # their job id after ``submit`` returns
+        return self._jobid is None and self._submission is not None
+
+    def wait(self):
+        if self._waited:
+            # ReFrame waits for the job again only to reap it when the test
+            # fails, e.g. in its sanity or performance check, so fetch the
+            # full outputs that were left remotely for the inspection
+            self.fetch_remote_files(self.remote_outputs)
+            return
+
+        if not self._submission_pending():
+            super().wait()
+        else:
+            self.scheduler.wait(self)
+            self.finished()
+
+        self._waited = True
+
+    def fetch_remote_files(self, patterns=None):
+        '''Download the files left in the remote stage directory that match
+        any of the glob ``patterns``, or all of them'''
+        self.scheduler.fetch_remote_files(self, patterns)
+
+    def cancel(self):
+        if not self._submission_pending():
+            return super().cancel()
+
+        return self.scheduler.cancel(self)
+
+    def finished(self):
+        if not self._submission_pending():
+            return super().finished()
+
+        return self.scheduler.finished(self)
+
     @property
     def nodelist(self):
         # Generate the nodelist only after the job is finished
@@ -102,10 +888,13 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
         )
 
         # Setup the client for the specific account
+        self._firecrest_url = firecrest_url
+        self._authorization = fc.ClientCredentialsAuth(client_id,
+                                                       client_secret,
+                                                       token_uri)
         self.client = fc.Firecrest(
             firecrest_url=firecrest_url,
-            authorization=fc.ClientCredentialsAuth(client_id, client_secret,
-                                                   token_uri)
+            authorization=self._authorization
         )
 
         params = self.client.parameters()
@@ -114,28 +903,502 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                 self._max_file_size_utilities = float(p['value'])*1000000
                 break
 
-        self._local_filetimestamps = {}
         self._remote_filetimestamps = {}
         self._cleaned_remotedirs = set()
 
+        # Manifests of the remote stage directories and cache of the local
+        # file digests, keyed by path and validated by size and mtime
+        self._manifests = {}
+        self._digests = {}
+
+        # The manifests, the prepared remote stage directories, the blob
+        # store and the upload statistics are shared by the concurrent
+        # pushes and pulls of the asynchronous scheduler
+        self._state_lock = threading.Lock()
+        self._blobs_lock = threading.Lock()
+
+        # Content-addressed store of the files shared across the remote
+        # stage directories; files smaller than the minimum size are
+        # uploaded directly
+        self._blobs_dir = os.path.join(self._remotedir_prefix, '.rfm_blobs')
+        self._blobs = None
+        self._use_blobs = not _is_var_true('FIRECREST_NO_BLOBSTORE')
+        self._blob_min_size = int(
+            os.environ.get('FIRECREST_BLOBSTORE_MIN_SIZE', 1 << 20)
+        )
+
+        # The blobs unused for FIRECREST_BLOBSTORE_MAX_AGE days are evicted,
+        # as well as the least recently used ones beyond
+        # FIRECREST_BLOBSTORE_MAX_SIZE bytes
+        self._blob_max_age = 86400 * float(
+            os.environ.get('FIRECREST_BLOBSTORE_MAX_AGE', 30)
+        )
+        self._blob_max_size = int(
+            os.environ.get('FIRECREST_BLOBSTORE_MAX_SIZE', 100 << 30)
+        )
+        self._blobs_now = None
+        self._blob_markers = set()
+        self._upload_stats = {'bytes': 0, 'blobs': 0, 'dedup_bytes': 0}
+        atexit.register(self._log_upload_stats)
+
+        # All the job polling goes through the coordinator, which batches
+        # the requests and keeps them within the API rate budget
+        self._coordinator = _PollCoordinator(
+            self.client, self._system_name, self.log,
+            rate=float(os.environ.get('FIRECREST_API_RATE', 2)),
+            burst=int(os.environ.get('FIRECREST_API_BURST', 5))
+        )
+
+        # In the selective pull mode only the job output and the declared
+        # files are pulled
+        self._selective_pull = _is_var_true('FIRECREST_SELECTIVE_PULL')
+        self._pull_files = [
+            p for p in os.environ.get('FIRECREST_PULL_FILES', '').split(',')
+            if p
+        ]
+
+        # Node, partition and reservation descriptions are reused for
+        # FIRECREST_METADATA_TTL seconds, but the node listings, which hold
+        # the node states used by the flexible allocation, only for
+        # FIRECREST_NODE_STATE_TTL seconds
+        self._metadata = _MetadataCache(
+            float(os.environ.get('FIRECREST_METADATA_TTL', 60)),
+            os.environ.get('FIRECREST_METADATA_CACHE')
+        )
+        self._node_state_ttl = float(
+            os.environ.get('FIRECREST_NODE_STATE_TTL', 5)
+        )
+
+        # Compression of the archives pushed to the remote system; zstd
+        # requires the zstandard package locally and zstd support in the
+        # remote extraction
+        self._archive_compression = os.environ.get(
+            'FIRECREST_ARCHIVE_COMPRESSION', 'gzip'
+        )
+        if self._archive_compression not in _ARCHIVE_SUFFIXES:
+            raise JobSchedulerError(
+                f'unknown archive compression '
+                f'{self._archive_compression!r}: valid values are '
+                f'{", ".join(_ARCHIVE_SUFFIXES)}'
+            )
+
+        if self._archive_compression == 'zstd' and zstandard is None:
+            self.log('zstandard is not available, the stage directories '
+                     'will be compressed with gzip')
+            self._archive_compression = 'gzip'
+
+        # The files larger than this size are downloaded concurrently
+        # instead of being part of the remote archive of the stage directory
+        self._large_file_size = int(
+            os.environ.get('FIRECREST_LARGE_FILE_SIZE',
+                           self._max_file_size_utilities)
+        )
+        self._transfers = _TransferEngine(
+            self.client, self._system_name, self.log,
+            self._max_file_size_utilities,
+            max_workers=int(os.environ.get('FIRECREST_MAX_TRANSFERS', 4)),
+            retries=int(os.environ.get('FIRECREST_TRANSFER_RETRIES', 3))
+        )
+
+        # Short jobs with the same resources are batched for up to
+        # FIRECREST_ARRAY_WINDOW seconds and submitted as one job array
+        self._job_arrays = _is_var_true('FIRECREST_JOB_ARRAYS')
+        self._array_size = int(os.environ.get('FIRECREST_ARRAY_SIZE', 32))
+        self._array_window = float(
+            os.environ.get('FIRECREST_ARRAY_WINDOW', 5)
+        )
+        self._array_max_time = float(
+            os.environ.get('FIRECREST_ARRAY_MAX_TIME', 600)
+        )
+        self._pending_arrays = {}
+        self._arrays_lock = threading.Lock()
+        self._array_names = itertools.count()
+
     def make_job(self, *args, **kwargs):
         return _SlurmFirecrestJob(*args, **kwargs)
 
+    def _digest(self, path, st):
+        key = (st.st_size, st.st_mtime_ns)
+        cached = self._digests.get(path)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        sha256 = _file_sha256(path)
+        self._digests[path] = (key, sha256)
+        return sha256
+
+    def _is_uploaded(self, manifest, relpath, path, st):
+        entry = manifest.files.get(relpath)
+        if entry is None or entry['size'] != st.st_size:
+            return False
+
+        if entry['mtime'] == st.st_mtime_ns:
+            return True
+
+        return (entry['sha256'] is not None and
+                entry['sha256'] == self._digest(path, st))
+
+    def _stage_delta(self, job):
+        '''Return the directories and files that are not yet in the remote
+        stage directory, together with the manifest of the directory after
+        they are pushed.'''
+
+        with self._state_lock:
+            manifest = self._manifests.setdefault(job._remotedir,
+                                                  _StageManifest()).copy()
+
+        new_dirs, changed_files = [], []
+        local_files = set()
+        for dirpath, dirnames, filenames in os.walk(job._localdir):
+            reldir = os.path.relpath(dirpath, job._localdir)
+            for d in dirnames:
+                reld = os.path.normpath(os.path.join(reldir, d))
+                if reld not in manifest.dirs:
+                    new_dirs.append(reld)
+                    manifest.dirs.add(reld)
+
+            for f in filenames:
+                relpath = os.path.normpath(os.path.join(reldir, f))
+                if relpath == _StageManifest.FILENAME:
+                    continue
+
+                local_files.add(relpath)
+                path = os.path.join(dirpath, f)
+                st = os.stat(path)
+                if not self._is_uploaded(manifest, relpath, path, st):
+                    changed_files.append(relpath)
+                    manifest.add(relpath, st, self._digest(path, st))
+
+        for relpath in set(manifest.files) - local_files:
+            manifest.discard(relpath)
+
+        return new_dirs, changed_files, manifest
+
+    def _record_pulled(self, job, local_paths):
+        '''Record the downloaded files as already present remotely'''
+        with self._state_lock:
+            manifest = self._manifests.setdefault(job._remotedir,
+                                                  _StageManifest())
+
+        for path in local_paths:
+            relpath = os.path.normpath(os.path.relpath(path, job._localdir))
+            st = os.stat(path)
+            entry = manifest.files.get(relpath)
+            if entry and entry['size'] == st.st_size:
+                if entry['mtime'] == st.st_mtime_ns:
+                    # Unchanged since it was pushed
+                    continue
+
+                if entry['sha256']:
+                    # Keep track of the contents of the pushed files, so
+                    # that they are not uploaded again in later sessions
+                    manifest.add(relpath, st, self._digest(path, st))
+                    continue
+
+            manifest.add(relpath, st)
+
+    def _fetch_remote_manifest(self, job):
+        try:
+            buffer = io.BytesIO()
+            with _quiet_firecrest():
+                self.client.simple_download(
+                    self._system_name,
+                    os.path.join(job._remotedir, _StageManifest.FILENAME),
+                    buffer
+                )
+
+            return _StageManifest.from_json(buffer.getvalue().decode())
+        except (fc.FirecrestException, ValueError, KeyError):
+            return None
+
+    def _is_intact(self, entry, modtime, size, link_target, pushed):
+        '''Whether a remote file is still the one that was pushed, i.e. it
+        was not modified in place afterwards, e.g. by the job'''
+        if link_target:
+            # The blob may have been evicted since
+            return (self._use_blobs and entry['sha256'] is not None and
+                    link_target == self._blob_path(entry['sha256']) and
+                    entry['sha256'] in self._known_blobs())
+
+        # The manifest is written last when pushing, so the files modified
+        # later were changed remotely
+        return size == entry['size'] and modtime <= pushed
+
+    def _prune_remote_stagedir(self, job, manifest):
+        '''Remove from the remote stage directory everything that is not
+        part of the local one or whose contents have changed, locally or
+        remotely.'''
+
+        pushed = None
+        for dirpath, dirnames, files in self._firecrest_walk(job._remotedir,
+                                                             True):
+            reldir = os.path.relpath(dirpath, job._remotedir)
+            if pushed is None:
+                # The stage directory itself comes first
+                pushed = next((modtime for (f, modtime, _, _) in files
+                               if f == _StageManifest.FILENAME), '')
+
+            for d in list(dirnames):
+                reld = os.path.normpath(os.path.join(reldir, d))
+                if not os.path.isdir(os.path.join(job._localdir, reld)):
+                    self.client.simple_delete(self._system_name,
+                                              join_and_normalize(dirpath, d))
+                    dirnames.remove(d)
+                    manifest.dirs.discard(reld)
+
+            for (f, modtime, fsize, link_target) in files:
+                relpath = os.path.normpath(os.path.join(reldir, f))
+                if relpath == _StageManifest.FILENAME:
+                    continue
+
+                path = os.path.join(job._localdir, relpath)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    st = None
+
+                if (st is None or
+                    not self._is_uploaded(manifest, relpath, path, st) or
+                    not self._is_intact(manifest.files[relpath], modtime,
+                                        fsize, link_target, pushed)):
+                    self.client.simple_delete(self._system_name,
+                                              join_and_normalize(dirpath, f))
+                    manifest.discard(relpath)
+
+    def _firecrest_walk(self, directory, show_hidden=False):
+        contents = self.client.list_files(self._system_name, directory,
+                                          show_hidden=show_hidden)
+        dirs = []
+        nondirs = []
+        for item in contents:
+            if item['type'] == 'd':
+                dirs.append(item['name'])
+            else:
+                nondirs.append((item['name'],
+                                item['last_modified'],
+                                int(item['size']),
+                                item.get('link_target', '')))
+
+        yield directory, dirs, nondirs
+
+        for item in dirs:
+            yield from self._firecrest_walk(f'{directory}/{item}',
+                                            show_hidden)
+
+    def _prepare_remote_stagedir(self, job):
+        '''Reuse the remote stage directory of a previous session if its
+        manifest is available, otherwise start from a clean one.'''
+
+        manifest = self._fetch_remote_manifest(job)
+        if manifest is not None:
+            self.log(f'Found the manifest of {job._remotedir}, only the '
+                     f'modified files will be uploaded')
+            self._prune_remote_stagedir(job, manifest)
+            with self._state_lock:
+                self._manifests[job._remotedir] = manifest
+
+            return
+
+        try:
+            with _quiet_firecrest():
+                self.client.simple_delete(self._system_name, job._remotedir)
+        except fc.HeaderException:
+            # The delete request will raise an exception if it doesn't
+            # exist, but it can be ignored
+            pass
+
+        with self._state_lock:
+            self._manifests[job._remotedir] = _StageManifest()
+
+    def _log_upload_stats(self):
+        stats = self._upload_stats
+        self.log(f'Uploaded {stats["bytes"]} bytes in this session '
+                 f'({stats["blobs"]} new blobs, {stats["dedup_bytes"]} '
+                 f'bytes deduplicated by the blob store)')
+
+    def _known_blobs(self):
+        '''The blobs of the store, by digest, with the time of their last
+        use and their size'''
+        with self._blobs_lock:
+            if self._blobs is None:
+                self.client.mkdir(self._system_name, self._blobs_dir, p=True)
+
+                # The ages of the blobs are measured on the remote clock
+                self._touch_blob_marker('.rfm_now')
+                blobs, uploads, used = {}, {}, {}
+                for f in self.client.list_files(self._system_name,
+                                                self._blobs_dir,
+                                                show_hidden=True):
+                    mtime = _parse_mtime(f['last_modified'])
+                    if f['name'] == '.rfm_now':
+                        self._blobs_now = mtime
+                    elif f['name'].startswith('.upload-'):
+                        uploads[f['name']] = mtime
+                    elif f['name'].startswith('.used-'):
+                        used[f['name'][len('.used-'):]] = mtime
+                    elif not f['name'].startswith('.'):
+                        blobs[f['name']] = (mtime, int(f['size']))
+
+                for name, mtime in uploads.items():
+                    # Interrupted uploads
+                    if self._blobs_now - mtime > _BLOB_MIN_AGE:
+                        self.client.simple_delete(
+                            self._system_name,
+                            os.path.join(self._blobs_dir, name)
+                        )
+
+                self._blobs = {
+                    sha256: (max(mtime, used.get(sha256, mtime)), size)
+                    for sha256, (mtime, size) in blobs.items()
+                }
+                self._blob_markers = set(used)
+                self._evict_blobs()
+
+        return self._blobs
+
+    def _evict_blobs(self):
+        '''Remove the blobs unused for longer than the maximum age and the
+        least recently used ones beyond the maximum size of the store'''
+        total = sum(size for _, size in self._blobs.values())
+        evicted, evicted_bytes = 0, 0
+        for sha256, (mtime, size) in sorted(self._blobs.items(),
+                                            key=lambda b: b[1][0]):
+            age = self._blobs_now - mtime
+            if (age > self._blob_max_age or
+                    (total > self._blob_max_size and age > _BLOB_MIN_AGE)):
+                self.client.simple_delete(self._system_name,
+                                          self._blob_path(sha256))
+                if sha256 in self._blob_markers:
+                    self.client.simple_delete(
+                        self._system_name,
+                        os.path.join(self._blobs_dir, f'.used-{sha256}')
+                    )
+
+                del self._blobs[sha256]
+                total -= size
+                evicted += 1
+                evicted_bytes += size
+
+        if evicted:
+            self.log(f'Evicted {evicted} blobs ({evicted_bytes} bytes) from '
+                     f'the blob store, {total} bytes remain')
+
+    def _blob_path(self, sha256):
+        return os.path.join(self._blobs_dir, sha256)
+
+    def _touch_blob_marker(self, name):
+        '''(Re)write an empty marker file in the blob store, whose
+        modification time is the current time of the remote clock'''
+        self.client.simple_upload(self._system_name, io.BytesIO(b''),
+                                  self._blobs_dir, name)
+
+    def _wait_external_upload(self, up_obj):
+        up_obj.finish_upload()
+        sleep_time = itertools.cycle([1, 5, 10])
+        while up_obj.in_progress:
+            t = next(sleep_time)
+            self.log(f'Upload is not yet in the filesystem, will sleep '
+                     f'for {t} sec')
+            time.sleep(t)
+
+    def _store_blob(self, path, sha256, size):
+        '''Upload a file to the blob store unless it is already there'''
+        blobs = self._known_blobs()
+        with self._state_lock:
+            known = sha256 in blobs
+            if known:
+                self._upload_stats['dedup_bytes'] += size
+                stale = self._blobs_now - blobs[sha256][0] > _BLOB_MIN_AGE
+                blobs[sha256] = (self._blobs_now, size)
+
+        if known:
+            if stale:
+                # Record the use of the blob for the eviction; the blob
+                # itself is read-only
+                self._touch_blob_marker(f'.used-{sha256}')
+                with self._state_lock:
+                    self._blob_markers.add(sha256)
+
+            return
+
+        # The blob is uploaded under a temporary name and moved in place
+        # once complete, so that an interrupted upload is never taken for
+        # the blob
+        self.log(f'Uploading {path} to the blob store')
+        upload_name = (f'.upload-{sha256}-{os.getpid()}-'
+                       f'{threading.get_ident()}')
+        upload_path = os.path.join(self._blobs_dir, upload_name)
+        if size <= self._max_file_size_utilities:
+            self.client.simple_upload(self._system_name, path,
+                                      self._blobs_dir, upload_name)
+            uploaded_path = upload_path
+        else:
+            # External uploads keep the name of the local file, so upload
+            # it in a private directory
+            self.client.mkdir(self._system_name, upload_path, p=True)
+            self._wait_external_upload(
+                self.client.external_upload(self._system_name, path,
+                                            upload_path)
+            )
+            uploaded_path = os.path.join(upload_path, os.path.basename(path))
+
+        try:
+            uploaded_size = int(
+                self.client.stat(self._system_name, uploaded_path)['size']
+            )
+            if uploaded_size != size:
+                raise JobSchedulerError(
+                    f'incomplete upload of {path} to the blob store '
+                    f'({uploaded_size} of {size} bytes)'
+                )
+
+            # Blobs are shared by many stage directories, make sure that no
+            # job modifies them through the links
+            self.client.chmod(self._system_name, uploaded_path, '444')
+            self.client.mv(self._system_name, uploaded_path,
+                           self._blob_path(sha256))
+        except BaseException:
+            self.client.simple_delete(self._system_name, upload_path)
+            raise
+
+        if uploaded_path != upload_path:
+            self.client.simple_delete(self._system_name, upload_path)
+
+        with self._state_lock:
+            self._blobs[sha256] = (self._blobs_now, size)
+            self._upload_stats['bytes'] += size
+            self._upload_stats['blobs'] += 1
+
+    def _split_blobs(self, job, manifest, changed_files):
+        '''Store the large files in the blob store and return the files
+        that have to be uploaded to the stage directory and the ones to
+        be linked from the blob store.'''
+        if not self._use_blobs:
+            return changed_files, []
+
+        uploads, links = [], []
+        for relpath in changed_files:
+            entry = manifest.files[relpath]
+            if entry['size'] < self._blob_min_size:
+                uploads.append(relpath)
+                continue
+
+            self._store_blob(os.path.join(job._localdir, relpath),
+                             entry['sha256'], entry['size'])
+            links.append(relpath)
+
+        return uploads, links
+
     def _push_compressed_artefacts(self, job):
         def _extract(archive_path, dir_path):
-            intervals = itertools.cycle([1, 2, 3])
             try:
-                original_level = logging.getLogger().level
-                logging.getLogger().setLevel(100)
-                self.client.extract(
-                    self._system_name,
-                    archive_path,
-                    dir_path
-                )
+                with _quiet_firecrest():
+                    self.client.extract(
+                        self._system_name,
+                        archive_path,
+                        dir_path
+                    )
             except fc.FirecrestException as e:
-                # Revert the global logger level back to its original
-                # state
-                logging.getLogger().setLevel(original_level)
                 timeout_str = 'Command has finished with timeout signal'
                 # This command has a timeout so it may fail
                 if (
@@ -152,23 +1415,9 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                     archive_path,
                     dir_path
                 )
-                jobid = extract_job['jobid']
-                active_jobs = self.client.poll(
-                    self._system_name,
-                    [jobid]
-                )
+                jobid = str(extract_job['jobid'])
                 self.log(f'Extract job ID {jobid})')
-                while (
-                    active_jobs and
-                    not slurm_state_completed(active_jobs[0]['state'])
-                ):
-                    self.log(f"Extract job (jobid={jobid}) with state: "
-                             f"{active_jobs[0]['state']}")
-                    time.sleep(next(intervals))
-                    active_jobs = self.client.poll_active(
-                        self._system_name,
-                        [jobid]
-                    )
+                active_jobs = self._coordinator.wait(jobid)
 
                 if (
                     active_jobs and
@@ -187,51 +1436,75 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                     raise JobSchedulerError(
                         f'extract job has failed: {err_output}'
                     )
-            finally:
-                # Always revert the global logger level back to its original
-                # state
-                logging.getLogger().setLevel(original_level)
-
-        # Compress locally the files
-        self.log('Compressing local stage directory')
-        local_path = shutil.make_archive(
-            base_name='stage_dir_archive_push',
-            format='gztar',
-            root_dir='.',
-            base_dir='.',
+
+        new_dirs, changed_files, manifest = self._stage_delta(job)
+        if not new_dirs and not changed_files:
+            self.log('Remote stage directory is up to date')
+            with self._state_lock:
+                self._manifests[job._remotedir] = manifest
+
+            return
+
+        changed_files, links = self._split_blobs(job, manifest,
+                                                 changed_files)
+
+        # Compress the modified files and the links to the blob store; the
+        # archive is kept in memory unless it is too big for a simple upload
+        self.log(f'Compressing {len(changed_files)} modified files of the '
+                 f'local stage directory')
+        archive_name = (
+            f'stage_dir_archive_push'
+            f'{_ARCHIVE_SUFFIXES[self._archive_compression]}'
         )
+        tmpdir = tempfile.mkdtemp(prefix='rfm_firecrest_')
+        local_path = os.path.join(tmpdir, archive_name)
+        buffer = _SpoolingWriter(self._max_file_size_utilities, local_path)
+        with _tar_writer(buffer, self._archive_compression) as archive:
+            for reld in new_dirs:
+                archive.add(os.path.join(job._localdir, reld), arcname=reld,
+                            recursive=False)
+
+            for relpath in changed_files:
+                archive.add(os.path.join(job._localdir, relpath),
+                            arcname=relpath, recursive=False)
+
+            for relpath in links:
+                info = tarfile.TarInfo(relpath)
+                info.type = tarfile.SYMTYPE
+                info.linkname = self._blob_path(
+                    manifest.files[relpath]['sha256']
+                )
+                info.mtime = time.time()
+                archive.addfile(info)
 
         # Upload
         remote_path = job._remotedir
-        f_size = os.path.getsize(local_path)
-        remote_file_path = os.path.join(
-            remote_path,
-            os.path.basename(local_path)
-        )
-        if f_size <= self._max_file_size_utilities:
+        f_size = buffer.size()
+        remote_file_path = os.path.join(remote_path, archive_name)
+        if not buffer.spilled:
             self.client.simple_upload(
                 self._system_name,
-                local_path,
-                remote_path
+                io.BytesIO(buffer.getvalue()),
+                remote_path,
+                archive_name
             )
+            buffer.close()
         else:
+            buffer.close()
             self.log(
                 f'Archive file is {f_size} bytes, so it may take some time...'
             )
-            up_obj = self.client.external_upload(
-                self._system_name,
-                local_path,
-                remote_path
-            )
-            up_obj.finish_upload()
-            sleep_time = itertools.cycle([1, 5, 10])
-            while up_obj.in_progress:
-                t = next(sleep_time)
-                self.log(
-                    f'Archive is not yet in the filesystem, will sleep '
-                    f'for {t} sec'
+            self._wait_external_upload(
+                self.client.external_upload(
+                    self._system_name,
+                    local_path,
+                    remote_path
                 )
-                time.sleep(t)
+            )
+
+        shutil.rmtree(tmpdir)
+        with self._state_lock:
+            self._upload_stats['bytes'] += f_size
 
         # Extract stagedir
         self.log(f'Extracting {remote_file_path} to {remote_path}')
@@ -240,11 +1513,23 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
             remote_path
         )
 
-        # Remove the archives
-        self.log('Removing local and remote archives')
-        os.remove(local_path)
+        # Remove the remote archive
+        self.log('Removing the remote archive')
         self.client.simple_delete(self._system_name, remote_file_path)
 
+        # The manifest is uploaded last, so that its modification time on
+        # the remote clock tells the files changed after the push
+        self.client.simple_upload(
+            self._system_name,
+            io.BytesIO(manifest.to_json().encode()),
+            remote_path,
+            _StageManifest.FILENAME
+        )
+        with self._state_lock:
+            self._manifests[job._remotedir] = manifest
+
+        self._log_upload_stats()
+
     def _push_artefacts(self, job):
         def _setup_permissions(local_file_path, remote_file_path):
             permissions = oct(os.lstat(local_file_path)[stat.ST_MODE])[-3:]
@@ -256,6 +1541,9 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
 
         def _upload(local_path, remote_path):
             f_size = os.path.getsize(local_path)
+            with self._state_lock:
+                self._upload_stats['bytes'] += f_size
+
             remote_file_path = os.path.join(
                 remote_path,
                 os.path.basename(local_path)
@@ -282,31 +1570,51 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                 # on the remote filesystem
                 return (up_obj, local_path, remote_file_path)
 
-        for dirpath, dirnames, filenames in os.walk('.'):
-            for d in dirnames:
-                new_dir = join_and_normalize(job._remotedir, dirpath, d)
-                self.log(f'Creating remote directory {new_dir}')
-                self.client.mkdir(self._system_name, new_dir, p=True)
+        new_dirs, changed_files, manifest = self._stage_delta(job)
+        for d in new_dirs:
+            new_dir = join_and_normalize(job._remotedir, d)
+            self.log(f'Creating remote directory {new_dir}')
+            self.client.mkdir(self._system_name, new_dir, p=True)
+
+        changed_files, links = self._split_blobs(job, manifest,
+                                                 changed_files)
+        with self._state_lock:
+            previous = self._manifests[job._remotedir]
 
+        for relpath in links:
+            link_path = join_and_normalize(job._remotedir, relpath)
+            if relpath in previous.files:
+                self.client.simple_delete(self._system_name, link_path)
+
+            self.log(f'Linking {link_path} to the blob store')
+            self.client.symlink(
+                self._system_name,
+                self._blob_path(manifest.files[relpath]['sha256']),
+                link_path
+            )
+
+        files_by_dir = {}
+        for relpath in changed_files:
+            files_by_dir.setdefault(os.path.dirname(relpath), []).append(
+                os.path.basename(relpath)
+            )
+
+        for reldir, filenames in files_by_dir.items():
             async_uploads = []
-            remote_dir_path = join_and_normalize(job._remotedir, dirpath)
+            remote_dir_path = join_and_normalize(job._remotedir, reldir)
             for f in filenames:
                 local_norm_path = join_and_normalize(
-                    job._localdir, dirpath, f
+                    job._localdir, reldir, f
                 )
-                modtime = os.path.getmtime(local_norm_path)
-                last_modtime = self._local_filetimestamps.get(local_norm_path)
-                if (last_modtime != modtime):
-                    self._local_filetimestamps[local_norm_path] = modtime
-                    self.log(
-                        f'Uploading file {f} in {remote_dir_path}'
-                    )
-                    up = _upload(
-                        local_norm_path,
-                        remote_dir_path
-                    )
-                    if up:
-                        async_uploads.append(up)
+                self.log(
+                    f'Uploading file {f} in {remote_dir_path}'
+                )
+                up = _upload(
+                    local_norm_path,
+                    remote_dir_path
+                )
+                if up:
+                    async_uploads.append(up)
 
             sleep_time = itertools.cycle([1, 5, 10])
             while async_uploads:
@@ -347,19 +1655,97 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                     f['last_modified']
                 )
 
-    def _pull_compressed_artefacts(self, job):
+        if new_dirs or changed_files or links:
+            self.client.simple_upload(
+                self._system_name,
+                io.BytesIO(manifest.to_json().encode()),
+                job._remotedir,
+                _StageManifest.FILENAME
+            )
+        else:
+            self.log('Remote stage directory is up to date')
+
+        with self._state_lock:
+            self._manifests[job._remotedir] = manifest
+
+        self._log_upload_stats()
+
+    def _download(self, transfers, on_complete=None):
+        start = time.monotonic()
+        nbytes = self._transfers.download(transfers, on_complete)
+        elapsed = time.monotonic() - start
+        if nbytes:
+            self.log(f'Downloaded {nbytes} bytes in {elapsed:.2f} sec '
+                     f'({nbytes / elapsed / 1e6:.2f} MB/s)')
+
+    def _pull_plan(self, job):
+        '''Split the remote stage directory around its large files, which
+        FirecREST cannot leave out of an archive.
+
+        Return the subdirectories to compress, which hold no large file,
+        and the ``(relpath, size)`` of the files to download on their own:
+        the large files and the other files of the directories that contain
+        them. None is returned if there is no large file or if the split
+        takes too many requests.
+        '''
+        tree = {}
+        for dirpath, dirnames, files in self._firecrest_walk(job._remotedir,
+                                                             True):
+            reldir = os.path.normpath(os.path.relpath(dirpath,
+                                                      job._remotedir))
+            tree[reldir] = (dirnames, files)
+
+        # The directories on the path to a large file
+        split_dirs = set()
+        for reldir, (_, files) in tree.items():
+            if any(not link_target and fsize > self._large_file_size
+                   for (_, _, fsize, link_target) in files):
+                while reldir not in split_dirs:
+                    split_dirs.add(reldir)
+                    reldir = os.path.dirname(reldir) or '.'
+
+        if not split_dirs:
+            return None
+
+        archives, files = [], []
+        for reldir in sorted(split_dirs):
+            dirnames, dir_files = tree[reldir]
+            archives += [os.path.normpath(os.path.join(reldir, d))
+                         for d in dirnames
+                         if os.path.normpath(os.path.join(reldir, d))
+                         not in split_dirs]
+            for (f, _, fsize, link_target) in dir_files:
+                relpath = os.path.normpath(os.path.join(reldir, f))
+                if (relpath == _StageManifest.FILENAME or
+                        link_target.startswith(self._blobs_dir)):
+                    # Only meaningful remotely or already pulled
+                    continue
+
+                if link_target:
+                    # Only the archives keep the links
+                    return None
+
+                files.append((relpath, fsize))
+
+        # Compressing, downloading and removing an archive takes a few
+        # requests
+        num_small = sum(1 for _, fsize in files
+                        if fsize <= self._large_file_size)
+        if 4 * len(archives) + num_small > _MAX_SPLIT_REQUESTS:
+            return None
+
+        return archives, files
+
+    def _pull_compressed_artefacts(self, job, split_large=True):
         def _compress(dir_path, archive_path):
-            intervals = itertools.cycle([1, 2, 3])
             try:
-                original_level = logging.getLogger().level
-                logging.getLogger().setLevel(100)
-                self.client.compress(
-                    self._system_name,
-                    dir_path,
-                    archive_path
-                )
+                with _quiet_firecrest():
+                    self.client.compress(
+                        self._system_name,
+                        dir_path,
+                        archive_path
+                    )
             except fc.FirecrestException as e:
-                logging.getLogger().setLevel(original_level)
                 timeout_str = 'Command has finished with timeout signal'
                 # This command has a timeout so it may fail
                 if (
@@ -376,21 +1762,9 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                     dir_path,
                     archive_path
                 )
-                jobid = compression_job['jobid']
-                active_jobs = self.client.poll(
-                    self._system_name,
-                    [jobid]
-                )
+                jobid = str(compression_job['jobid'])
                 self.log(f'Compression job ID: {jobid}')
-                while (
-                    active_jobs and
-                    not slurm_state_completed(active_jobs[0]['state'])
-                ):
-                    time.sleep(next(intervals))
-                    active_jobs = self.client.poll_active(
-                        self._system_name,
-                        [jobid]
-                    )
+                active_jobs = self._coordinator.wait(jobid)
 
                 if (
                     active_jobs and
@@ -409,133 +1783,107 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                     raise JobSchedulerError(
                         'compression job has failed: {err_output}'
                     )
-            finally:
-                # Always revert the global logger level back to its original
-                # state
-                logging.getLogger().setLevel(original_level)
 
-        def _download(remote_path, local_path, f_size):
-            if f_size <= self._max_file_size_utilities:
-                self.client.simple_download(
-                    self._system_name,
-                    remote_path,
-                    local_path
+        # The stage directory is compressed as a whole or, if it holds large
+        # files, as its subdirectories without them; the large files and
+        # the files next to them are downloaded concurrently with the
+        # archives
+        plan = self._pull_plan(job) if split_large else None
+        archives, files = plan or (['.'], [])
+        for reldir in {os.path.dirname(relpath) for relpath, _ in files}:
+            os.makedirs(os.path.join(job._localdir, reldir), exist_ok=True)
+
+        transfers = [(os.path.join(job._remotedir, relpath),
+                      os.path.join(job._localdir, relpath), size)
+                     for relpath, size in files]
+
+        def _extract(fileobj, local_path):
+            # The links to the blob store point to pushed files, which are
+            # already in the local stage directory
+            with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+                for member in archive:
+                    if not (member.issym() and
+                            member.linkname.startswith(self._blobs_dir)):
+                        archive.extract(member, local_path)
+
+        def _pull_archive(i, reldir):
+            # The archive holds the directory itself
+            self.log(f'Compressing remote directory {reldir} of the stage '
+                     f'directory')
+            remote_achive_path = os.path.join(
+                self._remotedir_prefix,
+                f'stage_dir_archive_pull_{job.jobid}_{i}.tar.gz'
+            )
+            _compress(
+                os.path.normpath(os.path.join(job._remotedir, reldir)),
+                remote_achive_path
+            )
+            local_path = os.path.dirname(
+                os.path.normpath(os.path.join(job._localdir, reldir))
+            )
+            file_size = self.client.stat(
+                self._system_name,
+                remote_achive_path
+            )['size']
+            if file_size <= self._max_file_size_utilities:
+                # Extract the archive from memory
+                self.log(f'Extracting {remote_achive_path} to {local_path}')
+                self._transfers.read(
+                    remote_achive_path, file_size,
+                    lambda fileobj: _extract(fileobj, local_path)
                 )
             else:
-                self.log(
-                    f'File {remote_path} is {f_size} bytes, so it may take '
-                    f'some time...'
-                )
-                up_obj = self.client.external_download(
-                    self._system_name,
-                    remote_path
+                tmpdir = tempfile.mkdtemp(prefix='rfm_firecrest_')
+                local_archive_path = os.path.join(
+                    tmpdir,
+                    os.path.basename(remote_achive_path)
                 )
-                up_obj.finish_download(local_path)
-                return up_obj
-
-        # Compress remote files
-        self.log('Compressing remote stage directory')
-        remote_achive_path = os.path.join(
-            self._remotedir_prefix,
-            'stage_dir_archive_pull.tar.gz'
-        )
-        _compress(
-            job._remotedir,
-            remote_achive_path
-        )
+                self._download([(remote_achive_path, local_archive_path,
+                                 file_size)])
+                self.log(f'Extracting {local_archive_path} to {local_path}')
+                with open(local_archive_path, 'rb') as fp:
+                    _extract(fp, local_path)
 
-        # Download the remote directory
-        file_size = self.client.stat(
-            self._system_name,
-            remote_achive_path
-        )['size']
-        local_archive_path = os.path.join(
-            os.path.dirname(job._localdir),
-            'stage_dir_archive_pull.tar.gz'
-        )
-        self.log(f'Downloading file {remote_achive_path} in {job._localdir}')
-        _download(
-            remote_achive_path,
-            local_archive_path,
-            file_size
-        )
+                shutil.rmtree(tmpdir)
 
-        # Extract the files locally
-        self.log(f'Extracting {local_archive_path} to {job._localdir}')
-        cmd = (
-            f'tar -xzf {local_archive_path} -C '
-            f'{os.path.dirname(job._localdir)}'
-        )
-        _run_strict(cmd)
+            # Remove the remote archive
+            self.log('Removing the remote archive')
+            self.client.simple_delete(self._system_name, remote_achive_path)
 
-        # Remove the remote and local archives
-        self.log('Removing local and remote archives')
-        os.remove(local_archive_path)
-        self.client.simple_delete(self._system_name, remote_achive_path)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            file_downloads = pool.submit(self._download, transfers)
+            for i, reldir in enumerate(archives):
+                _pull_archive(i, reldir)
 
-    def _pull_artefacts(self, job):
-        def firecrest_walk(directory):
-            contents = self.client.list_files(self._system_name, directory)
-
-            dirs = []
-            nondirs = []
+            file_downloads.result()
 
-            for item in contents:
-                if item['type'] == 'd':
-                    dirs.append(item['name'])
-                else:
-                    nondirs.append((item['name'],
-                                    item['last_modified'],
-                                    int(item['size'])))
+        # The push manifest is only meaningful in the remote stage directory
+        local_manifest = os.path.join(job._localdir, _StageManifest.FILENAME)
+        if os.path.exists(local_manifest):
+            os.remove(local_manifest)
 
-            yield directory, dirs, nondirs
-
-            for item in dirs:
-                item_path = f'{directory}/{item}'
-                yield from firecrest_walk(item_path)
-
-        def _download(remote_path, local_path, f_size):
-            if f_size <= self._max_file_size_utilities:
-                self.client.simple_download(
-                    self._system_name,
-                    remote_path,
-                    local_path
-                )
-            else:
-                self.log(
-                    f'File {f} is {f_size} bytes, so it may take some time...'
-                )
-                up_obj = self.client.external_download(
-                    self._system_name,
-                    remote_path
-                )
-                up_obj.finish_download(local_path)
+        self._record_pulled(job, [
+            os.path.join(dirpath, f)
+            for dirpath, _, filenames in os.walk(job._localdir)
+            for f in filenames
+        ])
 
+    def _pull_artefacts(self, job):
         if job.name == 'rfm-detect-job':
             # We only need the topo.json file and the job's
-            # output and error files
-            for file_name in ('rfm-detect-job.out',
-                              'rfm-detect-job.err',
-                              'topo.json'):
-
-                remote_file_path = os.path.join(
-                    job._remotedir,
-                    file_name
-                )
-                local_file_path = os.path.join(
-                    job._localdir,
-                    file_name
-                )
-                self.log(f'Downloading file {file_name} in {job._localdir}')
-                _download(
-                    remote_file_path,
-                    local_file_path,
-                    0  # these files shoult be small enough for simple_download
-                )
-
+            # output and error files; these files should be small enough
+            # for simple_download
+            self._download([
+                (os.path.join(job._remotedir, file_name),
+                 os.path.join(job._localdir, file_name), 0)
+                for file_name in ('rfm-detect-job.out',
+                                  'rfm-detect-job.err',
+                                  'topo.json')
+            ])
             return
 
-        for dirpath, dirnames, files in firecrest_walk(job._remotedir):
+        pulled, transfers, timestamps = [], [], {}
+        for dirpath, dirnames, files in self._firecrest_walk(job._remotedir):
             local_dirpath = join_and_normalize(
                 job._localdir,
                 os.path.relpath(
@@ -549,22 +1897,165 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                 if not os.path.exists(new_dir):
                     os.makedirs(new_dir)
 
-            for (f, modtime, fsize) in files:
+            for (f, modtime, fsize, link_target) in files:
+                if link_target.startswith(self._blobs_dir):
+                    # Links to the blob store point to pushed files, which
+                    # are already in the local stage directory
+                    continue
+
                 norm_path = join_and_normalize(dirpath, f)
                 local_file_path = join_and_normalize(local_dirpath, f)
                 if self._remote_filetimestamps.get(norm_path) != modtime:
-                    self.log(f'Downloading file {f} in {local_dirpath}')
-                    self._remote_filetimestamps[norm_path] = modtime
-                    _download(
-                        norm_path,
-                        local_file_path,
-                        fsize
+                    transfers.append((norm_path, local_file_path, fsize))
+                    timestamps[norm_path] = modtime
+                    pulled.append(local_file_path)
+                elif os.path.exists(local_file_path):
+                    # Unchanged since it was pushed or pulled; the files
+                    # missing locally are skipped as well
+                    pulled.append(local_file_path)
+
+        def _mark_downloaded(transfer):
+            # Only the completed transfers are skipped in the next pull
+            self._remote_filetimestamps[transfer[0]] = timestamps[transfer[0]]
+
+        self.log(f'Downloading {len(transfers)} files in {job._localdir}')
+        self._download(transfers, _mark_downloaded)
+
+        self._record_pulled(job, pulled)
+
+    def _remote_outputs(self, job):
+        '''The outputs of the job that are not pulled right after it'''
+        if not job.remote_outputs or job.is_array:
+            return set()
+
+        if job.state != 'COMPLETED' or job.exitcode != 0:
+            self.log(f'Job {job.jobid} failed, pulling all its outputs')
+            return set()
+
+        return {
+            os.path.relpath(os.path.join(job._localdir, f), job._localdir)
+            for f in job.remote_outputs
+        }
+
+    def _pull_selected_artefacts(self, job, remote_outputs=()):
+        if self._selective_pull:
+            patterns = [
+                os.path.relpath(os.path.join(job._localdir, f),
+                                job._localdir)
+                for f in (job.script_filename, job.stdout, job.stderr)
+            ]
+            patterns += job.pull_files
+            patterns += self._pull_files
+        else:
+            patterns = ['*']
+
+        transfers = []
+        remote_files = {}
+        for dirpath, dirnames, files in self._firecrest_walk(job._remotedir):
+            reldir = os.path.relpath(dirpath, job._remotedir)
+            for d in dirnames:
+                os.makedirs(join_and_normalize(job._localdir, reldir, d),
+                            exist_ok=True)
+
+            for (f, _, fsize, link_target) in files:
+                if link_target.startswith(self._blobs_dir):
+                    # Links to the blob store point to pushed files, which
+                    # are already in the local stage directory
+                    continue
+
+                relpath = os.path.normpath(os.path.join(reldir, f))
+                transfer = (join_and_normalize(dirpath, f),
+                            os.path.join(job._localdir, relpath), fsize)
+                if relpath in remote_outputs:
+                    # Leave a note in place of the output, so that it can
+                    # still be copied to the output directory of the test
+                    with open(transfer[1], 'w') as fp:
+                        fp.write(f'The full output is kept in '
+                                 f'{self._system_name}:{transfer[0]}\n')
+
+                if (relpath not in remote_outputs and
+                        any(fnmatch.fnmatch(relpath, p) for p in patterns)):
+                    transfers.append(transfer)
+                else:
+                    remote_files[relpath] = transfer
+
+        self.log(f'Downloading {len(transfers)} selected files in '
+                 f'{job._localdir}')
+        self._download(transfers)
+        self._record_pulled(job, [t[1] for t in transfers])
+        job._remote_files = remote_files
+
+    def fetch_remote_files(self, job, patterns=None):
+        '''Download the files of the job that the selective pull left in
+        the remote stage directory and match any of ``patterns``, or all of
+        them'''
+        if patterns is not None:
+            patterns = [
+                os.path.relpath(os.path.join(job._localdir, p),
+                                job._localdir)
+                for p in patterns
+            ]
+
+        selected = [
+            relpath for relpath in job._remote_files
+            if patterns is None or
+            any(fnmatch.fnmatch(relpath, p) for p in patterns)
+        ]
+        if not selected:
+            return
+
+        transfers = [job._remote_files[relpath] for relpath in selected]
+        self.log(f'Downloading {len(transfers)} remote files in '
+                 f'{job._localdir}')
+        self._download(transfers)
+        self._record_pulled(job, [t[1] for t in transfers])
+        for relpath in selected:
+            del job._remote_files[relpath]
+
+    def _pull(self, job):
+        remote_outputs = self._remote_outputs(job)
+        if ((self._selective_pull or remote_outputs) and
+                job.name != 'rfm-detect-job'):
+            self._pull_selected_artefacts(job, remote_outputs)
+        elif self._firecrest_api_version <= Version('1.15.0'):
+            self._pull_artefacts(job)
+        elif job._array is not None:
+            self._pull_array(job._array)
+        else:
+            self._pull_compressed_artefacts(job)
+
+    def _pull_array(self, array):
+        '''Pull the results of all the tasks of a job array at once and
+        move them to the local stage directories of the jobs'''
+        with array.pull_lock:
+            if array.pulled:
+                return
+
+            # The outputs are usually small, so the bundle is compressed
+            # without looking for large files, which costs one request per
+            # directory
+            self._pull_compressed_artefacts(array, split_large=False)
+            for job in array.members:
+                if self._remote_outputs(job):
+                    # Pulled selectively on its own
+                    continue
+
+                taskdir = os.path.join(array._localdir, str(job._array_task))
+                for dirpath, dirnames, filenames in os.walk(taskdir):
+                    local_dirpath = os.path.join(
+                        job._localdir, os.path.relpath(dirpath, taskdir)
                     )
+                    os.makedirs(local_dirpath, exist_ok=True)
+                    links = [d for d in dirnames
+                             if os.path.islink(os.path.join(dirpath, d))]
+                    for f in filenames + links:
+                        os.replace(os.path.join(dirpath, f),
+                                   os.path.join(local_dirpath, f))
 
-                new_modtime = os.path.getmtime(local_file_path)
-                self._local_filetimestamps[local_file_path] = new_modtime
+            shutil.rmtree(array._localdir, ignore_errors=True)
+            array.pulled = True
 
-    def submit(self, job):
+    def _set_stagedirs(self, job):
         job._localdir = os.getcwd()
         if job.name == 'rfm-detect-job':
             job._remotedir = os.path.join(
@@ -577,22 +2068,20 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
                 os.path.relpath(os.getcwd(), job._stage_prefix)
             )
 
-        if job._remotedir not in self._cleaned_remotedirs:
-            # Create clean stage directory in the remote system
+    def _push(self, job):
+        with self._state_lock:
+            prepare = job._remotedir not in self._cleaned_remotedirs
+            self._cleaned_remotedirs.add(job._remotedir)
+
+        if prepare:
+            # Reuse or clean the stage directory in the remote system
             try:
-                original_level = logging.getLogger().level
-                logging.getLogger().setLevel(100)
-                self.client.simple_delete(self._system_name, job._remotedir)
-            except fc.HeaderException:
-                # The delete request will raise an exception if it doesn't
-                # exist, but it can be ignored
-                pass
-            finally:
-                # Always revert the global logger level back to its original
-                # state
-                logging.getLogger().setLevel(original_level)
+                self._prepare_remote_stagedir(job)
+            except BaseException:
+                with self._state_lock:
+                    self._cleaned_remotedirs.discard(job._remotedir)
 
-            self._cleaned_remotedirs.add(job._remotedir)
+                raise
 
         self.client.mkdir(self._system_name, job._remotedir, p=True)
         self.log(f'Creating remote directory {job._remotedir} in '
@@ -603,110 +2092,314 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
         else:
             self._push_compressed_artefacts(job)
 
+    def _submission_args(self, job):
+        '''Positional and keyword arguments of ``client.submit``'''
+        script_path = os.path.join(job._remotedir, job.script_filename)
+        if Version(fc.__version__) >= Version('2.1.0'):
+            return [self._system_name], {'script_remote_path': script_path}
+
+        return [self._system_name, script_path], {'local_file': False}
+
+    def _resubmit_error(self, error):
+        '''Return the error of a failed submission that allows to resubmit
+        the job or None'''
+        if not self._resubmit_on_errors:
+            return None
+
+        stderr = error.responses[-1].json().get('error', '')
+        error_match = re.search(
+            rf'({"|".join(self._resubmit_on_errors)})', stderr
+        )
+        return error_match.group(1) if error_match else None
+
+    def _array_key(self, job):
+        '''Return the directives that a job shares with the jobs that can
+        be batched with it in a job array or None if it cannot be batched'''
+        # The task directories are pushed and pulled as one archive, which
+        # needs the compressed transfers
+        batchable = (self._job_arrays and
+                     self._firecrest_api_version > Version('1.15.0') and
+                     job.name != 'rfm-detect-job' and not job.is_array and
+                     job.time_limit and
+                     job.time_limit <= self._array_max_time)
+        if not batchable:
+            return None
+
+        directives = []
+        with open(os.path.join(job._localdir, job.script_filename)) as fp:
+            for line in fp:
+                line = line.strip()
+                if not line or line.startswith('#!'):
+                    continue
+
+                if not line.startswith('#'):
+                    break
+
+                if line.startswith('#SBATCH '):
+                    option = line.split()[1].split('=')[0]
+                    if option not in _ARRAY_OWN_OPTIONS:
+                        directives.append(line)
+                elif re.match(r'#\w', line):
+                    # Directives of other tools stay with their job
+                    return None
+
+        return tuple(directives)
+
+    def _batch(self, job):
+        '''Add the job to the pending job array of its compatible jobs and
+        return True, or return False if it must be submitted on its own'''
+        key = self._array_key(job)
+        if key is None:
+            return False
+
+        with self._arrays_lock:
+            array = self._pending_arrays.get(key)
+            if array is None:
+                name = (f'rfm-array-{time.strftime("%Y%m%dT%H%M%S")}-'
+                        f'{os.getpid()}-{next(self._array_names)}')
+                array = _JobArray(
+                    key, name,
+                    os.path.join(job._stage_prefix, '.rfm_arrays', name),
+                    os.path.join(self._remotedir_prefix, '.rfm_arrays', name)
+                )
+                self._pending_arrays[key] = array
+
+            array.members.append(job)
+
+        job._array = array
+        job._submission = array.submission
+        job._submit_time = time.time()
+        self.log(f'Job {job.name} is batched in the job array {array.name}')
+        return True
+
+    def _unbatch(self, job):
+        '''Remove a job that is not submitted yet from its job array'''
+        with self._arrays_lock:
+            array = job._array
+            pending = array and self._pending_arrays.get(array.directives)
+            if pending is None or pending is not array:
+                return False
+
+            array.members.remove(job)
+            if not array.members:
+                del self._pending_arrays[array.directives]
+
+        job._array = None
+        job._submission = None
+        return True
+
+    def _stage_array(self, array):
+        '''Assemble the local stage directories of the jobs as the task
+        directories of the job array, together with its job script'''
+        os.makedirs(array._localdir)
+        time_limit = max(job.time_limit for job in array.members)
+        script = [
+            '#!/bin/bash',
+            f'#SBATCH --job-name="{array.name}"',
+            f'#SBATCH --array=0-{len(array.members) - 1}',
+            f'#SBATCH --output={array._remotedir}/rfm_array_%a.out',
+            f'#SBATCH --error={array._remotedir}/rfm_array_%a.err',
+            '#SBATCH --time=%d:%d:%d' % seconds_to_hms(time_limit),
+            *array.directives,
+            '',
+            'case "$SLURM_ARRAY_TASK_ID" in'
+        ]
+        for i, job in enumerate(array.members):
+            # Hard links avoid copying the stage directories
+            shutil.copytree(
+                job._localdir, os.path.join(array._localdir, str(i)),
+                symlinks=True, copy_function=_link_or_copy,
+                ignore=shutil.ignore_patterns(_StageManifest.FILENAME)
+            )
+            job._array_task = i
+            job._remotedir = os.path.join(array._remotedir, str(i))
+
+            # Every task keeps the time limit of its job
+            script.append(
+                f'    {i}) cd {shlex.quote(job._remotedir)} && '
+                f'timeout {int(job.time_limit)} '
+                f'bash {shlex.quote(job.script_filename)} '
+                f'>{shlex.quote(job.stdout)} 2>{shlex.quote(job.stderr)} ;;'
+            )
+
+        script.append('esac')
+        with open(os.path.join(array._localdir, array.script_filename),
+                  'w') as fp:
+            fp.write('\n'.join(script) + '\n')
+
+        # The bundle is new, there is nothing to reuse remotely
+        with self._state_lock:
+            self._cleaned_remotedirs.add(array._remotedir)
+            self._manifests[array._remotedir] = _StageManifest()
+
+    def _submit_batch(self, array):
+        if len(array.members) == 1:
+            # A job array is not worth it for a single job
+            array.members[0]._array = None
+            self._submit_job(array.members[0])
+            return
+
+        self.log(f'Submitting {len(array.members)} jobs as the job array '
+                 f'{array.name}')
+        try:
+            self._stage_array(array)
+            self._submit_job(array)
+        finally:
+            # Only the remote bundle is needed from now on
+            shutil.rmtree(array._localdir, ignore_errors=True)
+
+    def _array_submitted(self, array):
+        for job in array.members:
+            if job._array is not None:
+                job._jobid = f'{array.jobid}_{job._array_task}'
+                job._submit_time = array._submit_time
+
+        array.submission.set_result(array.jobid)
+
+    def _flush_array(self, array):
+        try:
+            self._submit_batch(array)
+        except Exception as e:
+            # The error is raised for the jobs of the array
+            array.submission.set_exception(e)
+        else:
+            self._array_submitted(array)
+            if array.members[0]._array is None:
+                self._coordinator.register(array.members[0].jobid)
+            else:
+                self._coordinator.register(array.jobid)
+
+    def _flush_arrays(self, job=None):
+        '''Submit the pending job arrays that are full or whose batching
+        window has expired, as well as the job array of ``job``'''
+        now = time.monotonic()
+        with self._arrays_lock:
+            ready = [
+                array for array in self._pending_arrays.values()
+                if ((job is not None and array is job._array) or
+                    len(array.members) >= self._array_size or
+                    now - array.created >= self._array_window)
+            ]
+            for array in ready:
+                del self._pending_arrays[array.directives]
+
+        for array in ready:
+            self._flush_array(array)
+
+    def submit(self, job):
+        self._set_stagedirs(job)
+        if not self._batch(job):
+            self._submit_job(job)
+            self._coordinator.register(job._jobid)
+
+        self._flush_arrays()
+
+    def _submit_job(self, job):
+        self._push(job)
+        args, kwargs = self._submission_args(job)
         intervals = itertools.cycle([1, 2, 3])
         while True:
             try:
                 # Make request for submission
-                if Version(fc.__version__) >= Version('2.1.0'):
-                    submission_result = self.client.submit(
-                        self._system_name,
-                        script_remote_path=os.path.join(
-                            job._remotedir, job.script_filename
-                        )
-                    )
-                else:
-                    submission_result = self.client.submit(
-                        self._system_name,
-                        os.path.join(job._remotedir, job.script_filename),
-                        local_file=False
-                    )
-
+                self._coordinator.throttle()
+                submission_result = self.client.submit(*args, **kwargs)
                 break
             except fc.FirecrestException as e:
-                stderr = e.responses[-1].json().get('error', '')
-                error_match = re.search(
-                    rf'({"|".join(self._resubmit_on_errors)})', stderr
-                )
-                if not self._resubmit_on_errors or not error_match:
+                error = self._resubmit_error(e)
+                if not error:
                     raise
 
                 t = next(intervals)
                 self.log(
                     f'encountered a job submission error: '
-                    f'{error_match.group(1)}: will resubmit after {t}s'
+                    f'{error}: will resubmit after {t}s'
                 )
-                time.sleep(t)
+                # Let the other API requests back off as well
+                self._coordinator.backoff(t)
 
         job._jobid = str(submission_result['jobid'])
         job._submit_time = time.time()
 
-    def allnodes(self):
-        if self._firecrest_api_version <= Version('1.16.0'):
-            raise NotImplementedError('firecrest slurm backend does not '
-                                      'support node listing')
-
-        nodes = set()
+    def _node_descriptions(self, nodespec=None):
         try:
-            node_descriptions = self.client.nodes(self._system_name)
+            node_descriptions = self.client.nodes(
+                self._system_name, [nodespec] if nodespec else None
+            )
         except fc.FirecrestException as e:
             raise JobSchedulerError(
                 'could not retrieve node information') from e
 
-        for node_descr in node_descriptions:
-            nodes.add(_FirecrestSlurmNode(node_descr))
+        # Keep only the attributes of the node records
+        return [{k: d[k] for k in _FirecrestSlurmNode.ATTRIBUTES}
+                for d in node_descriptions]
 
-        return nodes
+    def _node_index(self):
+        return self._metadata.get(
+            f'{self._system_name}:nodes', self._node_descriptions, _NodeIndex,
+            ttl=self._node_state_ttl
+        )
+
+    def allnodes(self):
+        if self._firecrest_api_version <= Version('1.16.0'):
+            raise NotImplementedError('firecrest slurm backend does not '
+                                      'support node listing')
+
+        return self._node_index().nodes
 
     def _get_nodes_by_name(self, nodespec):
-        nodes = set()
-        try:
-            node_descriptions = self.client.nodes(
-                self._system_name, [nodespec]
+        if self._firecrest_api_version > Version('1.16.0'):
+            nodes = self._node_index().lookup(
+                hostlist.expand_hostlist(nodespec)
             )
-        except fc.FirecrestException as e:
-            raise JobSchedulerError(
-                'could not retrieve node information') from e
+            if nodes is not None:
+                return nodes
 
-        for node_descr in node_descriptions:
-            nodes.add(_FirecrestSlurmNode(node_descr))
+        return self._metadata.get(
+            f'{self._system_name}:nodes:{nodespec}',
+            lambda: self._node_descriptions(nodespec),
+            _NodeIndex,
+            ttl=self._node_state_ttl
+        ).nodes
 
-        return nodes
-
-    def _get_default_partition(self):
+    def _partition_descriptions(self):
         try:
             part_descriptions = self.client.partitions(self._system_name)
         except fc.FirecrestException as e:
             raise JobSchedulerError('could not extract the partitions') from e
 
+        return [{k: p[k] for k in ('PartitionName', 'Default')}
+                for p in part_descriptions]
+
+    def _get_default_partition(self):
+        part_descriptions = self._metadata.get(
+            f'{self._system_name}:partitions', self._partition_descriptions
+        )
         for part in part_descriptions:
             if part['Default'] == 'YES':
                 return part['PartitionName']
 
         return None
 
-    def _get_reservation_nodes(self, reservation):
+    def _get_reservation_nodespec(self, reservation):
         try:
-            res_descr = self.client.reservations(
+            return self.client.reservations(
                 self._system_name, [reservation]
-            )[0]
+            )[0]['Nodes']
         except (fc.FirecrestException, IndexError) as e:
             raise JobSchedulerError(f"could not extract the node names for "
                                     f"reservation '{reservation}'") from e
 
+    def _get_reservation_nodes(self, reservation):
+        nodespec = self._metadata.get(
+            f'{self._system_name}:reservations:{reservation}',
+            lambda: self._get_reservation_nodespec(reservation)
+        )
         try:
-            node_descriptions = self.client.nodes(
-                self._system_name, [res_descr['Nodes']]
-            )
-        except fc.FirecrestException as e:
+            return self._get_nodes_by_name(nodespec)
+        except JobSchedulerError as e:
             raise JobSchedulerError(f"could not extract the node for "
                                     f"reservation '{reservation}'") from e
 
-        nodes = set()
-        for node_descr in node_descriptions:
-            nodes.add(_FirecrestSlurmNode(node_descr))
-
-        return nodes
-
     def poll(self, *jobs):
         '''Update the status of the jobs.'''
 
@@ -717,71 +2410,283 @@ class SlurmFirecrestJobScheduler(SlurmJobScheduler):
         if not jobs:
             return
 
-        poll_results = self.client.poll(
-            self._system_name, [job.jobid for job in jobs]
+        self._flush_arrays()
+        jobs = [job for job in jobs if job._poll_id is not None]
+        if not jobs:
+            return
+
+        # The cached records are used if the API budget does not allow a
+        # new request
+        job_info = self._coordinator.records(
+            sorted({job._poll_id for job in jobs})
         )
-        job_info = {}
-        for r in poll_results:
-            # Take into account both job arrays and heterogeneous jobs
-            jobid = re.split(r'_|\+', r['jobid'])[0]
-            job_info.setdefault(jobid, []).append(r)
+        self._coordinator.unregister(*self._apply_records(jobs, job_info))
 
+    def _apply_records(self, jobs, records):
+        '''Update the jobs from their poll records and return the job ids
+        that are completed'''
+        completed, arrays = [], []
         for job in jobs:
-            try:
-                jobarr_info = job_info[job.jobid]
-            except KeyError:
+            if job._array is not None:
+                if job._array not in arrays:
+                    arrays.append(job._array)
+            elif job.jobid in records:
+                self._update_state(job, records[job.jobid])
+                if slurm_state_completed(job.state):
+                    completed.append(job.jobid)
+
+        # All the tasks are updated together, since the results of the
+        # array are pulled once they are all completed
+        for array in arrays:
+            if array.jobid not in records:
                 continue
 
-            # Join the states with ',' in case of job arrays|heterogeneous
-            # jobs
-            job._state = ','.join(m['state'] for m in jobarr_info)
+            for job in array.members:
+                task_records = _task_records(job.jobid, job._array_task,
+                                             records[array.jobid])
+                if task_records:
+                    self._update_state(job, task_records)
 
-            self._cancel_if_pending_too_long(job)
-            if slurm_state_completed(job.state):
-                # Since Slurm exitcodes are positive take the maximum one
-                job._exitcode = max(
-                    int(m['exit_code'].split(":")[0]) for m in jobarr_info
-                )
+            if array.completed:
+                completed.append(array.jobid)
 
-            # Use ',' to join nodes to be consistent with Slurm syntax
-            job._nodespec = ','.join(m['nodelist'] for m in jobarr_info)
+        return completed
+
+    def _update_state(self, job, jobarr_info):
+        '''Update the job from its poll records'''
+
+        # Join the states with ',' in case of job arrays|heterogeneous
+        # jobs
+        job._state = ','.join(m['state'] for m in jobarr_info)
+
+        self._cancel_if_pending_too_long(job)
+        if slurm_state_completed(job.state):
+            # Since Slurm exitcodes are positive take the maximum one
+            job._exitcode = max(
+                int(m['exit_code'].split(":")[0]) for m in jobarr_info
+            )
+
+        # Use ',' to join nodes to be consistent with Slurm syntax
+        job._nodespec = ','.join(m['nodelist'] for m in jobarr_info)
+
+    def finished(self, job):
+        if job._submission is not None and job._submission.done():
+            if job._submission.exception():
+                raise JobSchedulerError(
+                    'could not submit the job'
+                ) from job._submission.exception()
+
+        if job._array is not None and not job._array.completed:
+            return False
+
+        return super().finished(job)
 
     def wait(self, job):
+        self._flush_arrays(job)
         if self.finished(job):
             if job.is_array:
                 self._merge_files(job)
 
-            if self._firecrest_api_version <= Version('1.15.0'):
-                self._pull_artefacts(job)
-            else:
-                self._pull_compressed_artefacts(job)
-
+            self._pull(job)
             return
 
+        # The coordinator polls all the outstanding jobs together
+        self._coordinator.register(job._poll_id)
         intervals = itertools.cycle([1, 2, 3])
         while not self.finished(job):
+            self._coordinator.records([job._poll_id], block=True)
             self.poll(job)
-            time.sleep(next(intervals))
+            if not self.finished(job):
+                time.sleep(next(intervals))
+
+        self._pull(job)
+        if job.is_array:
+            self._merge_files(job)
+
+    def cancel(self, job):
+        if not self._unbatch(job):
+            self.client.cancel(self._system_name, job.jobid)
+
+        job._is_cancelling = True
 
-        if self._firecrest_api_version <= Version('1.15.0'):
-            self._pull_artefacts(job)
-        else:
-            self._pull_compressed_artefacts(job)
 
+@register_scheduler('firecrest-slurm-async')
+class AsyncSlurmFirecrestJobScheduler(SlurmFirecrestJobScheduler):
+    '''FirecREST scheduler driving all the in-flight jobs concurrently.
+
+    The submissions and the polls go through the asynchronous FirecREST
+    client in one event loop running in a background thread, so ``submit``
+    returns as soon as the job is scheduled for submission. The stage
+    directories are pushed and pulled by a pool of worker threads, so the
+    transfers of all the jobs overlap, and the results of a job are pulled
+    as soon as it is found completed.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.async_client = fc.AsyncFirecrest(
+            firecrest_url=self._firecrest_url,
+            authorization=self._authorization
+        )
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        self._workers = ThreadPoolExecutor(
+            max_workers=int(os.environ.get('FIRECREST_MAX_STAGING', 8))
+        )
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _throttle(self):
+        wait_time = self._coordinator.reserve()
+        while wait_time:
+            await asyncio.sleep(wait_time)
+            wait_time = self._coordinator.reserve()
+
+    async def _submit(self, job):
+        await self._loop.run_in_executor(self._workers, self._push, job)
+        args, kwargs = self._submission_args(job)
+        intervals = itertools.cycle([1, 2, 3])
+        while True:
+            try:
+                await self._throttle()
+                submission_result = await self.async_client.submit(*args,
+                                                                   **kwargs)
+                break
+            except fc.FirecrestException as e:
+                error = self._resubmit_error(e)
+                if not error:
+                    raise
+
+                t = next(intervals)
+                self.log(
+                    f'encountered a job submission error: '
+                    f'{error}: will resubmit after {t}s'
+                )
+                self._coordinator.backoff(t)
+
+        job._jobid = str(submission_result['jobid'])
+        job._submit_time = time.time()
+
+    def submit(self, job):
+        # The stage directory must be taken before returning, as ReFrame
+        # submits the jobs from their stage directory
+        self._set_stagedirs(job)
+        if not self._batch(job):
+            job._submit_time = time.time()
+            job._submission = self._run(self._submit(job))
+
+        self._flush_arrays()
+
+    def _flush_array(self, array):
+        def _submitted(future):
+            if future.exception() is not None:
+                array.submission.set_exception(future.exception())
+            else:
+                self._array_submitted(array)
+
+        # Job arrays are few, they are submitted by the worker threads
+        self._workers.submit(self._submit_batch, array).add_done_callback(
+            _submitted
+        )
+
+    def _is_submitted(self, job):
+        return (job._submission is not None and job._submission.done() and
+                job._submission.exception() is None)
+
+    async def _poll(self, jobs):
+        await self._throttle()
+        try:
+            results = await self.async_client.poll(
+                self._system_name, sorted({job._poll_id for job in jobs})
+            )
+        except fc.FirecrestException as e:
+            if not _is_throttled(e):
+                raise
+
+            self._coordinator.backoff(_retry_after(e))
+            return
+
+        self._apply_records(jobs, _group_poll_records(results))
+
+    def _completed(self, job):
+        return (slurm_state_completed(job.state) and
+                (job._array is None or job._array.completed))
+
+    def poll(self, *jobs):
+        self._flush_arrays()
+        jobs = [job for job in jobs
+                if job is not None and self._is_submitted(job)]
+        if not jobs:
+            return
+
+        self._run(self._poll(jobs)).result()
+        for job in jobs:
+            if self._completed(job):
+                self._start_pull(job)
+
+    def _pull_results(self, job):
+        self._pull(job)
         if job.is_array:
             self._merge_files(job)
 
+    def _start_pull(self, job):
+        if job._pull is None:
+            job._pull = self._workers.submit(self._pull_results, job)
+
+    def finished(self, job):
+        if not super().finished(job):
+            return False
+
+        self._start_pull(job)
+        if not job._pull.done():
+            return False
+
+        # Raise the errors of the pull, if any
+        job._pull.result()
+        return True
+
+    def wait(self, job):
+        self._flush_arrays(job)
+        job._submission.result()
+        intervals = itertools.cycle([1, 2, 3])
+        self.poll(job)
+        while not self._completed(job):
+            time.sleep(next(intervals))
+            self.poll(job)
+
+        self._start_pull(job)
+        job._pull.result()
+
     def cancel(self, job):
-        self.client.cancel(job.system_name, job.jobid)
+        if self._unbatch(job):
+            job._is_cancelling = True
+            return
+
+        if job._submission.exception() is None:
+            self._run(
+                self.async_client.cancel(self._system_name, job.jobid)
+            ).result()
+
         job._is_cancelling = True
 
 
 class _FirecrestSlurmNode(_SlurmNode):
     '''Class representing a Slurm node.'''
 
-    def __init__(self, node_descr):
-        self._name = node_descr['NodeName']
-        self._partitions = set(node_descr['Partitions'])
-        self._active_features = set(node_descr['ActiveFeatures'])
-        self._states = set(node_descr['State'])
+    # The attributes of the FirecREST node descriptions that are used
+    ATTRIBUTES = ('NodeName', 'Partitions', 'ActiveFeatures', 'State')
+
+    def __init__(self, node_descr, shared=None):
+        def _shared_set(values):
+            values = frozenset(sys.intern(v) for v in values)
+            return shared.setdefault(values, values)
+
+        if shared is None:
+            shared = {}
+
+        self._name = sys.intern(node_descr['NodeName'])
+        self._partitions = _shared_set(node_descr['Partitions'])
+        self._active_features = _shared_set(node_descr['ActiveFeatures'])
+        self._states = _shared_set(node_descr['State'])
         self._descr = node_descr
@@ -0,0 +1,441 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''The ``httpjson_batched`` perflog handler
+
+It accepts the options of the ``httpjson`` handler, but the formatted
+records are only queued by the ReFrame pipeline. A background thread sends
+them in bulk, retrying with backoff, and spools the batches that cannot be
+sent to disk. The spool is replayed when the server is reachable again,
+including by the following ReFrame runs. The batches that the server
+rejects with a client error (4xx other than 408 and 429) are never retried;
+they are moved to the ``rejected`` subdirectory of the spool instead.
+
+Additional options:
+
+- ``batch_size``: maximum number of records per request (default 100)
+- ``flush_interval``: maximum time in seconds that a record waits in the
+  queue (default 5)
+- ``payload``: ``ndjson`` to send the records one per line or ``json``
+  to send them as a JSON array (default ``ndjson``)
+- ``request_timeout``: timeout of every request in seconds (default 10)
+- ``spool_dir``: directory of the unsent batches (default
+  ``$XDG_CACHE_HOME/reframe/httpjson_spool``)
+'''
+
+import hashlib
+import os
+import queue
+import socket
+import tempfile
+import threading
+import time
+import urllib.parse
+from typing import List, Optional
+
+import requests
+
+from reframe.core.exceptions import ConfigError
+from reframe.core.logging import (HTTPJSONHandler, getlogger,
+                                  register_log_handler)
+
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 5
+REQUEST_TIMEOUT = 10
+
+# Time to wait for the queued records to be sent when ReFrame exits
+_CLOSE_TIMEOUT = 30
+
+_CONTENT_TYPES = {'ndjson': 'application/x-ndjson',
+                  'json': 'application/json'}
+
+# Transient errors of the server
+_RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+# The records of the batches rejected by the server, which are not replayed
+_REJECTED_DIR = 'rejected'
+
+
+def _default_spool_dir() -> str:
+    cache_home = os.getenv('XDG_CACHE_HOME',
+                           os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'reframe', 'httpjson_spool')
+
+
+def _pid_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+class _RejectedBatch(Exception):
+    '''The server refused a batch, e.g. for malformed records, so sending
+    it again would fail as well'''
+
+
+class _Flush:
+    '''Marker in the queue that the records before it must be sent'''
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class BatchedHTTPJSONHandler(HTTPJSONHandler):
+    '''HTTP JSON handler that sends the records in bulk from a background
+    thread and spools them to disk when the server cannot be reached'''
+
+    def __init__(self, url, extras=None, ignore_keys=None,
+                 json_formatter=None, authorization_header=None,
+                 extra_headers=None, debug=False, backoff_intervals=(1, 2, 3),
+                 retry_timeout=0, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL, payload='ndjson',
+                 request_timeout=REQUEST_TIMEOUT, spool_dir=None):
+        super().__init__(url, extras, ignore_keys, json_formatter,
+                         authorization_header, extra_headers, debug,
+                         backoff_intervals, retry_timeout)
+        if payload not in _CONTENT_TYPES:
+            raise ConfigError(f'httpjson_batched: invalid payload '
+                              f'{payload!r}: use '
+                              f'{" or ".join(_CONTENT_TYPES)}')
+
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._payload = payload
+        self._request_timeout = request_timeout
+        self._headers['Content-type'] = _CONTENT_TYPES[payload]
+
+        # The spool of every server is kept apart
+        self._spool_dir = os.path.join(
+            spool_dir or _default_spool_dir(),
+            hashlib.sha256(url.encode()).hexdigest()[:16]
+        )
+        self._spooled = 0
+        self._sent = 0
+        self._rejected = 0
+
+        # While the server is unreachable the batches are spooled directly
+        self._retry_at = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._closed = False
+        if not self._debug:
+            self._thread = threading.Thread(target=self._run,
+                                            name='httpjson-batched',
+                                            daemon=True)
+            self._thread.start()
+
+    @property
+    def spool_dir(self):
+        return self._spool_dir
+
+    @property
+    def sent(self):
+        '''Number of records sent to the server'''
+        return self._sent
+
+    @property
+    def spooled(self):
+        '''Number of records spooled to disk by this handler'''
+        return self._spooled
+
+    @property
+    def rejected(self):
+        '''Number of records rejected by the server'''
+        return self._rejected
+
+    def emit(self, record):
+        if self._debug:
+            super().emit(record)
+            return
+
+        # Convert tags to a list to make them JSON friendly
+        record.check_tags = list(record.check_tags)
+        json_record = self._json_format(record,
+                                        self._extras,
+                                        self._ignore_keys)
+        if json_record is not None:
+            self._queue.put(json_record)
+
+    def flush(self, timeout: Optional[float] = _CLOSE_TIMEOUT):
+        '''Wait until the queued records are sent or spooled'''
+        if self._thread is None or not self._thread.is_alive():
+            return
+
+        marker = _Flush()
+        self._queue.put(marker)
+        marker.done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(_CLOSE_TIMEOUT)
+
+            # Do not lose the records if the server is too slow to receive
+            # them before ReFrame exits
+            records = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if isinstance(item, str):
+                    records.append(item)
+
+            if records:
+                self._spool(records)
+
+            if self._spooled:
+                getlogger().warning(
+                    f'httpjson_batched: {self._spooled} records could not '
+                    f'be sent to {self._url}; they are spooled in '
+                    f'{self._spool_dir} and will be sent by the next run'
+                )
+
+        super().close()
+
+    def _run(self):
+        self._replay()
+        batch = []
+        deadline = None
+        while True:
+            timeout = None
+            if batch:
+                timeout = max(0, deadline - time.monotonic())
+
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _Flush()
+
+            if isinstance(item, str):
+                if not batch:
+                    deadline = time.monotonic() + self._flush_interval
+
+                batch.append(item)
+                if len(batch) < self._batch_size:
+                    continue
+
+            if batch:
+                self._deliver(batch)
+                batch = []
+
+            if item is None:
+                return
+
+            if isinstance(item, _Flush):
+                item.done.set()
+
+    def _post(self, records: List[str]) -> bool:
+        '''Send the records, retrying on transient errors
+
+        :raises _RejectedBatch: if the server refuses the records.
+        '''
+        if self._payload == 'ndjson':
+            data = '\n'.join(records) + '\n'
+        else:
+            data = f'[{",".join(records)}]'
+
+        if self._authorization_header is not None:
+            self._headers['Authorization'] = self._authorization_header()
+
+        timeout_time = time.time() + self._timeout
+        intervals = iter(self._backoff_intervals)
+        while True:
+            try:
+                response = requests.post(self._url, data=data.encode(),
+                                         headers=self._headers,
+                                         timeout=self._request_timeout)
+                if response.ok:
+                    return True
+
+                error = f'HTTP response code {response.status_code}'
+                retry = response.status_code in _RETRY_STATUS
+                if 400 <= response.status_code < 500 and not retry:
+                    raise _RejectedBatch(error)
+            except requests.exceptions.RequestException as err:
+                error, retry = str(err), True
+
+            interval = next(intervals, None)
+            expired = self._timeout and time.time() >= timeout_time
+            if not retry or interval is None or expired:
+                getlogger().debug(f'httpjson_batched: sending '
+                                  f'{len(records)} records failed: {error}')
+                return False
+
+            time.sleep(interval)
+
+    def _deliver(self, records: List[str]):
+        if time.monotonic() < self._retry_at:
+            self._spool(records)
+            return
+
+        try:
+            sent = self._post(records)
+        except _RejectedBatch as err:
+            self._reject(records, err)
+            return
+
+        if not sent:
+            self._retry_at = (time.monotonic() +
+                              max(self._backoff_intervals, default=0))
+            self._spool(records)
+            return
+
+        self._sent += len(records)
+        if self._spooled:
+            # The server is reachable again
+            self._replay()
+
+    def _write_records(self, directory: str, records: List[str]) -> bool:
+        '''Write the records atomically to a new file of ``directory``'''
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                fp.writelines(r + '\n' for r in records)
+
+            os.replace(tmp_file, os.path.join(
+                directory, f'{time.time_ns()}-{os.getpid()}.ndjson'
+            ))
+        except OSError as err:
+            getlogger().warning(f'httpjson_batched: could not write '
+                                f'{len(records)} records to {directory}: '
+                                f'{err}')
+            return False
+
+        return True
+
+    def _spool(self, records: List[str]):
+        if self._write_records(self._spool_dir, records):
+            self._spooled += len(records)
+
+    def _reject(self, records: List[str], error: _RejectedBatch):
+        '''Keep the records refused by the server apart from the spool'''
+        rejected_dir = os.path.join(self._spool_dir, _REJECTED_DIR)
+        log = getlogger().debug if self._rejected else getlogger().warning
+        log(f'httpjson_batched: {self._url} rejected {len(records)} '
+            f'records ({error}); they are moved to {rejected_dir} and will '
+            f'not be sent again')
+        self._write_records(rejected_dir, records)
+        self._rejected += len(records)
+
+    def _claim_spool_files(self) -> List[str]:
+        '''Rename the spool files that this process will replay, so that
+        concurrent runs do not send them twice'''
+        try:
+            filenames = sorted(os.listdir(self._spool_dir))
+        except FileNotFoundError:
+            return []
+
+        hostname = socket.gethostname().replace('.', '_')
+        claimed = []
+        for filename in filenames:
+            if filename.endswith('.replay'):
+                # Claimed by a run of this host that did not finish
+                name, host, pid, _ = filename.rsplit('.', 3)
+                if host != hostname or _pid_exists(int(pid)):
+                    continue
+            elif filename.endswith('.ndjson'):
+                name = filename
+            else:
+                continue
+
+            claim = f'{name}.{hostname}.{os.getpid()}.replay'
+            try:
+                os.rename(os.path.join(self._spool_dir, filename),
+                          os.path.join(self._spool_dir, claim))
+            except OSError:
+                # Claimed by another run
+                continue
+
+            claimed.append((name, claim))
+
+        return claimed
+
+    def _replay(self):
+        '''Send the spooled records, oldest first, until one batch fails;
+        the rejected batches are dropped from the spool'''
+        replayed = 0
+        claimed = self._claim_spool_files()
+        for i, (name, claim) in enumerate(claimed):
+            path = os.path.join(self._spool_dir, claim)
+            try:
+                with open(path) as fp:
+                    records = [line.rstrip('\n') for line in fp
+                               if line.strip()]
+            except OSError:
+                continue
+
+            for start in range(0, len(records), self._batch_size):
+                batch = records[start:start + self._batch_size]
+                try:
+                    sent = self._post(batch)
+                except _RejectedBatch as err:
+                    self._reject(batch, err)
+                    continue
+
+                if not sent:
+                    # Keep the records that were not sent for later
+                    self._retry_at = (time.monotonic() +
+                                      max(self._backoff_intervals, default=0))
+                    with open(path, 'w') as fp:
+                        fp.writelines(r + '\n' for r in records[start:])
+
+                    for name, claim in claimed[i:]:
+                        os.rename(os.path.join(self._spool_dir, claim),
+                                  os.path.join(self._spool_dir, name))
+
+                    self._sent += replayed
+                    return
+
+                replayed += len(batch)
+
+            os.remove(path)
+
+        self._sent += replayed
+        self._spooled = 0
+        if replayed:
+            getlogger().debug(f'httpjson_batched: sent {replayed} spooled '
+                              f'records to {self._url}')
+
+
+@register_log_handler('httpjson_batched')
+def _create_httpjson_batched_handler(site_config, config_prefix):
+    def get(option, default=None):
+        value = site_config.get(f'{config_prefix}/{option}')
+        return default if value is None else value
+
+    url = get('url')
+    parsed_url = urllib.parse.urlparse(url)
+    if parsed_url.scheme not in {'http', 'https'}:
+        raise ConfigError(
+            "httpjson_batched handler: invalid url scheme: use 'http' or "
+            "'https'"
+        )
+
+    if not parsed_url.hostname:
+        raise ConfigError('httpjson_batched handler: invalid hostname')
+
+    # Unlike the httpjson handler, an unreachable server does not disable
+    # the handler; the records are spooled instead
+    return BatchedHTTPJSONHandler(
+        url, get('extras', {}), get('ignore_keys', []),
+        get('json_formatter'), get('authorization_header'),
+        get('extra_headers', {}), get('debug', False),
+        get('backoff_intervals', [1, 2, 3]), get('retry_timeout', 0),
+        get('batch_size', BATCH_SIZE), get('flush_interval', FLUSH_INTERVAL),
+        get('payload', 'ndjson'),
+        get('request_timeout', REQUEST_TIMEOUT), get('spool_dir')
+    )
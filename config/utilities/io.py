@@ -7,9 +7,14 @@ import asyncio
 import itertools
 import logging
 import sys
+import time
+from contextlib import contextmanager
 from typing import Union
 from utilities.modules import ModulesSystem
 
+_START_TIME = time.perf_counter()
+_startup_profile = []
+
 
 async def status_bar():
     """
@@ -90,6 +95,27 @@ def getlogger():
     return _logger
 
 
+@contextmanager
+def profile_stage(stage: str):
+    '''Record the time spent in a stage of the configuration generation'''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _startup_profile.append((stage, time.perf_counter() - start))
+
+
+def record_imports():
+    '''Record the time spent importing the generator modules'''
+    _startup_profile.append(('imports', time.perf_counter() - _START_TIME))
+
+
+def print_profile():
+    getlogger().info('\nStartup profile:', color=False)
+    for stage, elapsed in _startup_profile:
+        getlogger().info(f'  {stage:<20} {elapsed:8.3f} s', color=False)
+
+
 def user_yn(prompt: str) -> bool:
     ''' Request user yes or no'''
 
@@ -5,6 +5,7 @@
 
 import asyncio
 import fnmatch
+import functools
 import grp
 import os
 import re
@@ -12,8 +13,10 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import time
 from contextlib import contextmanager
 from typing import Union
+from utilities.cache import DetectionCache
 from utilities.constants import (amd_gpu_architecture,
                                  containers_detect_bash,
                                  devices_detect_bash,
@@ -21,9 +24,12 @@ from utilities.constants import (amd_gpu_architecture,
                                  resources)
 from utilities.io import (getlogger, status_bar, user_descr,
                           user_integer, user_selection, user_yn)
+from utilities.slurm_inventory import SlurmInventory
 
 WDIR = os.getcwd()
 TIME_OUT_POLICY = 200
+PENDING_TIME_OUT = 1800
+MAX_DETECTION_JOBS = 8
 
 
 @contextmanager
@@ -34,6 +40,34 @@ def change_dir(destination: str):
     finally:
         os.chdir(WDIR)  # Change back to the original directory
 
+
+@functools.lru_cache(maxsize=None)
+def _path_index() -> dict:
+    '''Map the names of the files in PATH to their full paths
+
+    The PATH directories are listed only once, so that probing for many
+    commands does not require spawning a ``which`` process for each one.
+    '''
+    index = {}
+    for path_dir in os.getenv('PATH', '').split(os.pathsep):
+        try:
+            with os.scandir(path_dir or '.') as entries:
+                for entry in entries:
+                    index.setdefault(entry.name, []).append(entry.path)
+        except OSError:
+            continue
+
+    return index
+
+
+def which(cmd: str) -> Union[str, None]:
+    '''In-process equivalent of ``which``'''
+    for path in _path_index().get(cmd, []):
+        if os.access(path, os.X_OK) and not os.path.isdir(path):
+            return path
+
+    return None
+
 # TODO: create a common base class for Scheduler and Launcher
 
 
@@ -52,21 +86,11 @@ class Scheduler:
 
     def detect_scheduler(self, user_input: bool = True):
 
-        schedulers_found = []
-        for schd in self._scheduler_dic:
-            try:
-                subprocess.run(
-                    ['which', f'{schd["cmd"]}'],
-                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                    universal_newlines=True, check=True
-                )
-            except subprocess.CalledProcessError:
-                pass
-            else:
-                schedulers_found.append(schd['name'])
+        schedulers_found = [schd['name'] for schd in self._scheduler_dic
+                            if which(schd['cmd'])]
 
         if not schedulers_found:
-            self._scheduler = 'local'
+            self._name = 'local'
             getlogger().warning(
                 'No remote scheduler was detected in the system'
             )
@@ -105,18 +129,8 @@ class Launcher:
 
     def detect_launcher(self, user_input: bool = True):
 
-        launchers_found = []
-        for lnchr in self._launcher_dic:
-            try:
-                subprocess.run(
-                    ['which', f'{lnchr["cmd"]}'],
-                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                    universal_newlines=True, check=True
-                )
-            except subprocess.CalledProcessError:
-                pass
-            else:
-                launchers_found.append(lnchr['name'])
+        launchers_found = [lnchr['name'] for lnchr in self._launcher_dic
+                           if which(lnchr['cmd'])]
 
         if not launchers_found:
             self._name = 'local'
@@ -144,7 +158,10 @@ class SlurmContext:
 
     def __init__(self, modules_system: str, detect_containers: bool = True,
                  detect_devices: bool = True, wait: bool = True,
-                 access_opt: list = [], tmp_dir: str = None):
+                 access_opt: list = [], tmp_dir: str = None,
+                 cache: Union[DetectionCache, None] = None,
+                 inventory: Union[SlurmInventory, None] = None,
+                 max_jobs: int = MAX_DETECTION_JOBS):
         self.node_types = []
         self.default_nodes = []
         self.reservations = []
@@ -158,6 +175,9 @@ class SlurmContext:
         self._job_poll = []  # Job id's to poll
         self._p_n = 0  # Number of partitions created
         self._keep_tmp_dir = False
+        self._cache = cache
+        self._inventory = inventory or SlurmInventory()
+        self._scheduler = DetectionScheduler(max_jobs)
         if not tmp_dir:
             self.TMP_DIR = tempfile.mkdtemp(
                 prefix='reframe_config_detection_', dir=os.getenv('SCRATCH'))
@@ -169,36 +189,21 @@ class SlurmContext:
 
         getlogger().debug('Filtering nodes based on ActiveFeatures...')
         try:
-            nodes_info = subprocess.run(
-                'scontrol show nodes -o | grep "ActiveFeatures"',
-                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-                universal_newlines=True, check=True, shell=True
-            )
-            nodes_info = nodes_info.stdout
-            raw_node_types = re.findall(
-                r'ActiveFeatures=([^ ]+) .*? Partitions=([^ ]+)', nodes_info)
-            # Unique combinations of features and partitions
-            raw_node_types = set(raw_node_types)
             # List of [[features, partition]...]
-            raw_node_types = [[tuple(n[0].split(',')), tuple(
-                n[1].split(','))] for n in raw_node_types]
+            raw_node_types = [list(n) for n in self._inventory.node_types()]
         except Exception:
             getlogger().error(
                 'Node types could not be retrieved from scontrol'
             )
             return
 
-        default_partition = subprocess.run(
-            'scontrol show partitions -o | grep "Default=YES"',
-            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            universal_newlines=True, check=True, shell=True
-        )
-        default_partition = re.findall(
-            r'PartitionName=([\w]+)', default_partition.stdout)[0]
-        getlogger().debug(f'Detected default partition: {default_partition}')
+        default_partition = self._inventory.default_partition
         if not default_partition:
             default_partition = None
             getlogger().warning('Default partition could not be detected')
+        else:
+            getlogger().debug(
+                f'Detected default partition: {default_partition}')
 
         self._set_nodes_types(exclude_feats, raw_node_types, default_partition)
 
@@ -255,20 +260,16 @@ class SlurmContext:
 
         getlogger().debug(
             f'Detecting devices for node with features {node_feats}...')
-        devices = subprocess.run(
-            'scontrol show nodes -o | grep '
-            f'"ActiveFeatures=.*{".*,.*".join(node_feats)}.*"',
-            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            universal_newlines=True, check=True, shell=True)
-        try:
-            devices_raw = re.findall(r'Gres=([\w,:()]+)', devices.stdout)[0]
-        except Exception:
+        nodes = self._inventory.nodes_with_features(node_feats)
+        devices_raw = {n.gres for n in nodes}
+        if not devices_raw:
             getlogger().warning('Unable to detect the devices in the node')
             return None
 
-        devices = [item.rsplit(':', 1)[0]
-                   for item in devices_raw.split(',')]  # Remove the number
-        devices = [','.join(devices)]
+        # Remove the number of devices
+        devices = {','.join(item.rsplit(':', 1)[0]
+                            for item in gres.split(','))
+                   for gres in devices_raw}
         if len(devices) > 1:
             # This means that the nodes with this set of features
             # do not all have the same devices installed. If the
@@ -280,7 +281,7 @@ class SlurmContext:
                                 'Please check the devices option in '
                                 'the configuration file.')
             return None
-        elif '(null)' in list(devices) or 'gpu' not in next(iter(devices)):
+        elif '(null)' in devices or 'gpu' not in next(iter(devices)):
             # Detects if the nodes have no devices installed at
             # all or if not GPUs are installed
             getlogger().debug('No devices were found for this node type.')
@@ -289,23 +290,16 @@ class SlurmContext:
             getlogger().debug('Detected GPUs.')
             # We only reach here if the devices installation
             # is homogeneous accross the nodes
-            return self._count_gpus(devices_raw)
+            return self._count_gpus(','.join(devices_raw))
 
-    @staticmethod
-    def _get_access_partition(node_feats: list) -> Union[str, None]:
-
-        nd_partitions = subprocess.run(
-            'scontrol show nodes -o | grep '
-            f'"ActiveFeatures=.*{".*,.*".join(node_feats)}.*"',
-            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            universal_newlines=True, check=True, shell=True)
-        nd_partitions = re.findall(
-            r'Partitions=([\w,:()]+)', nd_partitions.stdout)
-        nd_partitions = set(nd_partitions)
-        if len(nd_partitions) > 1:
+    def _get_access_partition(self, node_feats: list) -> Union[str, None]:
+
+        nd_partitions = {n.partitions for n in
+                         self._inventory.nodes_with_features(node_feats)}
+        if len(nd_partitions) != 1:
             return None
         else:
-            nd_partitions = nd_partitions.pop().split(",")
+            nd_partitions = nd_partitions.pop()
             for n_f in node_feats:
                 if n_f in nd_partitions:
                     return f'-p{n_f}'
@@ -343,16 +337,11 @@ class SlurmContext:
     def search_reservations(self):
 
         getlogger().debug('Searching for reservations...')
-        reservations_info = subprocess.run(
-            'scontrol show res | grep "ReservationName"',
-            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            universal_newlines=True, check=True, shell=True
-        )
-        reservations_info = reservations_info.stdout
-        # Detecting the different types of nodes in the system
-        reservations = None
-        reservations = re.findall(
-            r'ReservationName=([\w-]+)', reservations_info)
+        try:
+            reservations = list(self._inventory.reservations)
+        except Exception:
+            reservations = []
+
         self.reservations = reservations
         if not reservations:
             getlogger().warning('Unable to retrieve reservations')
@@ -502,15 +491,41 @@ class SlurmContext:
 
             # Handle the job submission only if required
             if _detect_devices or _detect_containers:
-                self._keep_tmp_dir = True
                 # All this must be inside a function
                 remote_job = JobRemoteDetect(
-                    self.TMP_DIR, _detect_containers, _detect_devices)
+                    self.TMP_DIR, _detect_containers, _detect_devices,
+                    scheduler=self._scheduler)
                 access_partition = self._get_access_partition(node_features)
-                access_options = await remote_job.job_submission(
-                    name, access_options, access_node,
-                    access_partition, wait=self._wait
-                )
+                cache_key = None
+                cached = None
+                if self._cache and self._wait:
+                    cache_key = self._cache.make_key(
+                        node_feats, access_partition,
+                        access_options + [access_node or ''],
+                        remote_job.script
+                    )
+                    cached = self._cache.get(cache_key)
+
+                if cached:
+                    getlogger().info(
+                        f'Using cached detection results for {name}',
+                        color=False
+                    )
+                    remote_job.container_platforms = \
+                        cached['container_platforms']
+                    remote_job.devices = cached['devices']
+                    access_options = list(cached['access'])
+                else:
+                    self._keep_tmp_dir = True
+                    access_options = await remote_job.job_submission(
+                        name, access_options, access_node,
+                        access_partition, wait=self._wait
+                    )
+                    if cache_key and remote_job.completed:
+                        self._cache.put(cache_key,
+                                        remote_job.container_platforms,
+                                        remote_job.devices, access_options)
+
                 if not self._wait and remote_job.job_id:
                     self._job_poll.append(remote_job.job_id)
                     # Here, the job failed or the output was already read
@@ -678,6 +693,9 @@ class SlurmContext:
                 )
             else:
                 shutil.rmtree(self.TMP_DIR)
+            # Persist the results of the detection jobs
+            if self._cache:
+                self._cache.save()
             # Cancel the status bar if it was started
             if status_task:
                 status_task.cancel()
@@ -689,6 +707,176 @@ class SlurmContext:
             sys.stdout.flush()
 
 
+class DetectionScheduler:
+    '''Bounded-concurrency scheduler of the remote detection jobs
+
+    At most ``max_jobs`` detection jobs are in the queue at any time. The
+    jobs are submitted without ``-W`` and the state of all the outstanding
+    jobs is polled with a single ``squeue`` (and ``sacct`` for the jobs that
+    already left the queue) call, backing off while nothing changes.
+    '''
+
+    _FINAL_STATES = ('BOOT_FAIL', 'CANCELLED', 'COMPLETED', 'DEADLINE',
+                     'FAILED', 'NODE_FAIL', 'OUT_OF_MEMORY', 'PREEMPTED',
+                     'TIMEOUT')
+
+    def __init__(self, max_jobs: int = MAX_DETECTION_JOBS,
+                 min_interval: float = 1, max_interval: float = 30):
+        self._max_jobs = max_jobs
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._semaphore = None
+        self._poll_task = None
+        # job_id -> {'future', 'partition', 'state', 'submitted', 'started'}
+        self._jobs = {}
+        self._num_submitted = 0
+        self._num_finished = 0
+
+    def slot(self) -> asyncio.Semaphore:
+        '''Return the semaphore bounding the number of queued jobs'''
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_jobs)
+
+        return self._semaphore
+
+    async def wait(self, job_id: str, partition_name: str) -> str:
+        '''Wait for a job to finish and return its final state
+
+        ``EXPIRED`` is returned if the job did not finish within the time
+        limits and ``UNKNOWN`` if Slurm has no record of it.
+        '''
+        future = asyncio.get_event_loop().create_future()
+        self._jobs[job_id] = {'future': future, 'partition': partition_name,
+                              'state': 'PENDING', 'submitted': time.time(),
+                              'started': None}
+        self._num_submitted += 1
+        if self._poll_task is None or self._poll_task.done():
+            self._poll_task = asyncio.ensure_future(self._poll_loop())
+
+        return await future
+
+    @staticmethod
+    async def _run(*cmd) -> Union[str, None]:
+        '''Return the output of the command or None if it failed'''
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+            stdout, stderr = await proc.communicate()
+        except OSError as err:
+            getlogger().debug(f'\n{cmd[0]} failed: {err}')
+            return None
+
+        if proc.returncode != 0:
+            getlogger().debug(
+                f'\n{cmd[0]} failed with exit code {proc.returncode}: '
+                f'{stderr.decode().strip()}'
+            )
+            return None
+
+        return stdout.decode()
+
+    async def _query_states(self, job_ids: list) -> Union[dict, None]:
+        '''Return the states of the jobs or None if squeue failed
+
+        The jobs that left the queue are looked up with sacct; they are
+        ``UNKNOWN`` if sacct has no record of them and they are left out if
+        sacct failed.
+        '''
+        states = {}
+        jobs = ','.join(job_ids)
+        squeue = await self._run('squeue', '-h', '-o', '%i %T', '-j', jobs)
+        if squeue is None:
+            return None
+
+        for line in squeue.splitlines():
+            job_id, _, state = line.strip().partition(' ')
+            states[job_id] = state
+
+        missing = [j for j in job_ids if j not in states]
+        if missing:
+            sacct = await self._run('sacct', '-n', '-X', '-P',
+                                    '-o', 'JobID,State',
+                                    '-j', ','.join(missing))
+            if sacct is None:
+                return states
+
+            for line in sacct.splitlines():
+                job_id, _, state = line.strip().partition('|')
+                # e.g. 'CANCELLED by 1234'
+                states[job_id] = state.split(' ')[0]
+
+            for job_id in missing:
+                # Slurm has already forgotten about the job
+                states.setdefault(job_id, 'UNKNOWN')
+
+        return states
+
+    def _finish(self, job_id: str, state: str):
+        job = self._jobs.pop(job_id)
+        self._num_finished += 1
+        getlogger().debug(
+            f'\nDetection job {job_id} for {job["partition"]} finished '
+            f'with state {state} '
+            f'({self._num_finished}/{self._num_submitted})'
+        )
+        if not job['future'].done():
+            job['future'].set_result(state)
+
+    async def _poll_loop(self):
+        interval = self._min_interval
+        while self._jobs:
+            await asyncio.sleep(interval)
+            job_ids = list(self._jobs)
+            states = await self._query_states(job_ids)
+            if states is None:
+                # Skip this cycle, a transient failure of squeue must not
+                # make the jobs look finished
+                states = {}
+
+            changed = False
+            now = time.time()
+            for job_id in job_ids:
+                job = self._jobs[job_id]
+                state = states.get(job_id)
+                if state == 'UNKNOWN':
+                    self._finish(job_id, 'UNKNOWN')
+                    changed = True
+                    continue
+
+                if state is None:
+                    # Not queried in this cycle, only its time limits apply
+                    state = job['state']
+
+                if state != job['state']:
+                    getlogger().debug(
+                        f'\nDetection job {job_id} for {job["partition"]}: '
+                        f'{job["state"]} -> {state}'
+                    )
+                    job['state'] = state
+                    changed = True
+
+                if state in self._FINAL_STATES:
+                    self._finish(job_id, state)
+                    continue
+
+                if state != 'PENDING' and job['started'] is None:
+                    job['started'] = now
+
+                if job['started'] is not None:
+                    expired = now - job['started'] > TIME_OUT_POLICY
+                else:
+                    expired = now - job['submitted'] > PENDING_TIME_OUT
+
+                if expired:
+                    self._finish(job_id, 'EXPIRED')
+
+            if changed:
+                interval = self._min_interval
+            else:
+                interval = min(interval * 2, self._max_interval)
+
+
 class JobRemoteDetect:
     '''Job to detect information about the remote nodes'''
 
@@ -704,14 +892,29 @@ class JobRemoteDetect:
     _OUTPUT_FILE = 'config_autodetection_{partition_name}.out'
 
     def __init__(self, tmp_dir: str, detect_containers: bool = True,
-                 detect_devices: bool = True):
+                 detect_devices: bool = True,
+                 scheduler: Union['DetectionScheduler', None] = None):
         self._detect_containers = detect_containers
         self._detect_devices = detect_devices
+        self._scheduler = scheduler or DetectionScheduler()
         self.container_platforms = []
         self.devices = {}
         self.job_id = None
+        self.completed = False
         self.TMP_DIR = tmp_dir
 
+    @property
+    def script(self) -> str:
+        '''The detection commands executed by the job'''
+        script = ''
+        if self._detect_containers:
+            script += containers_detect_bash
+        script += '\n\n'
+        if self._detect_devices:
+            script += devices_detect_bash
+
+        return script
+
     def _prepare_job(self, partition_name: str, access_options: list):
         with change_dir(self.TMP_DIR):
             with open(self._SBATCH_FILE.format(partition_name=partition_name),
@@ -720,66 +923,50 @@ class JobRemoteDetect:
                     partition_name=partition_name))
                 for access in access_options:
                     file.write(f"#SBATCH {access}\n")
-                if self._detect_containers:
-                    file.write(containers_detect_bash)
-                file.write("\n")
-                file.write("\n")
-                if self._detect_devices:
-                    file.write(devices_detect_bash)
+                file.write(self.script)
 
     async def _submit_job(self, partition_name: str,
                           wait: bool) -> Union[bool, None, str]:
 
-        with change_dir(self.TMP_DIR):
-            cmd_parts = ['sbatch']
-            if wait:
-                cmd_parts.append('-W')
-            cmd_parts += [f'autodetection_{partition_name}.sh']
-            cmd = ' '.join(cmd_parts)
-            completed = await asyncio.create_subprocess_shell(
-                cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        async with self._scheduler.slot():
+            completed = await asyncio.create_subprocess_exec(
+                'sbatch', f'autodetection_{partition_name}.sh',
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                cwd=self.TMP_DIR
             )
-            cmd_out = await completed.stdout.readline()
-            cmd_out = cmd_out.decode().strip()
+            stdout, _ = await completed.communicate()
+            cmd_out = stdout.decode().strip()
             job_id = re.search(r'Submitted batch job (?P<jobid>\d+)', cmd_out)
-            if job_id:
-                job_id = job_id.group('jobid')
-                getlogger().info(
-                    f'\nJob submitted to partition {partition_name}: {job_id}'
-                )
-            elif 'error' in cmd_out or not cmd_out:
-                return False
-
-            try:
-                stdout, stderr = await asyncio.wait_for(
-                    completed.communicate(), timeout=TIME_OUT_POLICY
-                )
-            except asyncio.TimeoutError:
-                getlogger().warning(
-                    f'\nJob submitted to {partition_name} took too long...'
-                )
-                getlogger().info('Cancelling...', color=False)
-                subprocess.run(
-                    f'scancel {job_id}', universal_newlines=True,
-                    check=True, shell=True
-                )
-                return 'cancelled'
-
-            if completed.returncode != 0:
+            if completed.returncode != 0 or not job_id:
                 # Do not print error, second attempt with -p
                 return False
 
-            stdout = stdout.decode('utf-8')
-            stdout = stdout.strip()
+            job_id = job_id.group('jobid')
+            getlogger().info(
+                f'\nJob submitted to partition {partition_name}: {job_id}'
+            )
             if not wait:
-                jobid = re.search(r'Submitted batch job (?P<jobid>\d+)',
-                                  stdout)
-                if not jobid:
-                    return None
-                else:
-                    return jobid.group('jobid')
-            else:
-                return True
+                return job_id
+
+            state = await self._scheduler.wait(job_id, partition_name)
+
+        if state == 'EXPIRED':
+            getlogger().warning(
+                f'\nJob submitted to {partition_name} took too long...'
+            )
+            getlogger().info('Cancelling...', color=False)
+            subprocess.run(['scancel', job_id], universal_newlines=True)
+            return 'cancelled'
+
+        output_file = os.path.join(
+            self.TMP_DIR,
+            self._OUTPUT_FILE.format(partition_name=partition_name)
+        )
+        if state == 'COMPLETED' or (state == 'UNKNOWN' and
+                                    os.path.exists(output_file)):
+            return True
+
+        return False
 
     async def job_submission(self, partition_name: str,
                              access_options: list,
@@ -813,6 +1000,7 @@ class JobRemoteDetect:
 
         if job_exec and wait:
             self._extract_info(partition_name)
+            self.completed = True
         elif not job_exec and not cancelled:
             if access_node:
                 access_options.append(f'--constraint="{access_node}"')
@@ -0,0 +1,213 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Store of the performance references derived from the test history
+
+Every reference is keyed by the system, the uarch of the partition, the test
+name, its parameters, the version of the uenv or of the CPE image and the
+performance variable, and holds a reference tuple ``(value, lower, upper,
+unit)`` as in the ``reference`` of the tests. The system, the uarch and the
+version may be ``*`` to match any value; the most specific reference wins.
+
+The references are written by ``utility/calibrate_references.py`` and read
+by the tests that use ``checks/mixins/perf_references.py``. The database is
+``$CSCS_RFM_PERF_REFERENCES`` or by default
+``$XDG_CACHE_HOME/reframe/perf_references.db``.
+'''
+
+import fnmatch
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+SCHEMA_VERSION = 1
+
+# Matches any system, uarch or version
+WILDCARD = '*'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS refs (
+    system TEXT NOT NULL,
+    uarch TEXT NOT NULL,
+    test TEXT NOT NULL,
+    params TEXT NOT NULL,
+    version TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    lower REAL,
+    upper REAL,
+    unit TEXT,
+    samples INTEGER,
+    first INTEGER,
+    last INTEGER,
+    updated INTEGER NOT NULL,
+    PRIMARY KEY (test, params, system, uarch, version, metric)
+);
+'''
+
+_COLUMNS = ('system', 'uarch', 'test', 'params', 'version', 'metric',
+            'value', 'lower', 'upper', 'unit', 'samples', 'first', 'last',
+            'updated')
+
+
+class Reference(NamedTuple):
+    '''A reference and the time span of the ``samples`` it derives from'''
+    system: str
+    uarch: str
+    test: str
+    params: str
+    version: str
+    metric: str
+    value: float
+    lower: Optional[float]
+    upper: Optional[float]
+    unit: Optional[str]
+    samples: Optional[int] = None
+    first: Optional[int] = None
+    last: Optional[int] = None
+    updated: Optional[int] = None
+
+    @property
+    def key(self) -> tuple:
+        return self[:6]
+
+    @property
+    def reference(self) -> tuple:
+        '''The reference tuple of the tests'''
+        return (self.value, self.lower, self.upper, self.unit)
+
+
+def default_db_file() -> str:
+    db_file = os.getenv('CSCS_RFM_PERF_REFERENCES')
+    if db_file:
+        return db_file
+
+    cache_home = os.getenv('XDG_CACHE_HOME',
+                           os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'reframe', 'perf_references.db')
+
+
+def split_name(display_name: str) -> Tuple[str, str]:
+    '''Split the display name of a test, e.g. ``'XCCLTests
+    %test_name=all_reduce'``, into its name and parameters'''
+    name, _, params = display_name.partition(' ')
+    return name, params
+
+
+def environ_version(environ) -> str:
+    '''The version of the uenv of a ReFrame environment, ``ver:tag``, or
+    the tag of its CPE container image'''
+    try:
+        ver, tag = environ.extras['version']
+    except (KeyError, TypeError, ValueError):
+        ver = tag = None
+
+    if ver:
+        return f'{ver}:{tag}' if tag else ver
+
+    try:
+        image = environ.resources['cpe_ce_image']['image']
+    except (KeyError, TypeError):
+        image = ''
+
+    # 'registry#repository/cpe-gnu:25.03'
+    name, _, tag = image.rpartition(':')
+    if name and '/' not in tag:
+        return tag
+
+    return WILDCARD
+
+
+class ReferenceStore:
+    '''SQLite store of the performance references'''
+
+    def __init__(self, filename: str):
+        self._db = sqlite3.connect(filename)
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f'{filename}: unsupported schema version '
+                             f'{version}')
+
+        self._db.executescript(_SCHEMA)
+        self._db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def update(self, references: Iterable[Reference]) -> int:
+        '''Insert or replace the references'''
+        now = int(time.time())
+        rows = [r._replace(updated=now) for r in references]
+        with self._db:
+            self._db.executemany(
+                f'INSERT OR REPLACE INTO refs ({", ".join(_COLUMNS)}) '
+                f'VALUES ({", ".join("?" * len(_COLUMNS))})', rows
+            )
+
+        return len(rows)
+
+    def references(self, **patterns: Optional[str]) -> List[Reference]:
+        '''The references whose fields match the shell-style patterns'''
+        return [
+            r for r in map(Reference._make, self._db.execute(
+                f'SELECT {", ".join(_COLUMNS)} FROM refs '
+                'ORDER BY test, params, system, uarch, version, metric'
+            ))
+            if all(p is None or fnmatch.fnmatchcase(getattr(r, f), p)
+                   for f, p in patterns.items())
+        ]
+
+    def remove(self, references: Iterable[Reference]) -> int:
+        with self._db:
+            return self._db.executemany(
+                'DELETE FROM refs WHERE system = ? AND uarch = ? AND '
+                'test = ? AND params = ? AND version = ? AND metric = ?',
+                [r.key for r in references]
+            ).rowcount
+
+    def lookup(self, system: str, uarch: Optional[str], test: str,
+               params: str, version: str) -> Dict[str, Reference]:
+        '''The most specific reference of every performance variable of a
+        test; a specific version is preferred over a specific system and a
+        specific system over a specific uarch'''
+        rows = self._db.execute(
+            f'SELECT {", ".join(_COLUMNS)} FROM refs '
+            'WHERE test = ? AND params = ? AND system IN (?, ?) AND '
+            'uarch IN (?, ?) AND version IN (?, ?) '
+            'ORDER BY version = ?, system = ?, uarch = ?',
+            (test, params, system, WILDCARD, uarch or WILDCARD, WILDCARD,
+             version, WILDCARD, WILDCARD, WILDCARD, WILDCARD)
+        )
+        found = {}
+        for r in map(Reference._make, rows):
+            found.setdefault(r.metric, r)
+
+        return found
+
+
+# The stores opened by the tests of a ReFrame run
+_stores = {}
+
+
+def lookup_references(system: str, uarch: Optional[str], display_name: str,
+                      version: str,
+                      db_file: Optional[str] = None) -> Dict[str, Reference]:
+    '''The references of a test in the database, if it exists'''
+    db_file = db_file or default_db_file()
+    store = _stores.get(db_file)
+    if store is None:
+        if not os.path.exists(db_file):
+            return {}
+
+        store = _stores[db_file] = ReferenceStore(db_file)
+
+    return store.lookup(system, uarch, *split_name(display_name), version)
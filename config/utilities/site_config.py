@@ -0,0 +1,230 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import ast
+import hashlib
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+from reframe.utility import import_module_from_file
+
+# Default lifetime of the cached site configuration (in hours)
+CACHE_TTL = 24
+CACHE_VERSION = 2
+
+# Maximum number of cached configurations, e.g. for different systems
+_MAX_ENTRIES = 16
+
+# Environment variables read by the configuration files
+_ENV_REFS = re.compile(r'''os\.(?:getenv|environ\.get)\(\s*['"](\w+)['"]|'''
+                       r'''os\.environ\[\s*['"](\w+)['"]''')
+_HOSTNAMES = re.compile(r'''['"]hostnames['"]\]?\s*[:=]\s*(\[[^\]]*\])''')
+
+
+def _default_cache_file() -> str:
+    cache_home = os.getenv('XDG_CACHE_HOME',
+                           os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'reframe', 'site_config.json')
+
+
+def _is_var_true(var: str) -> bool:
+    return os.getenv(var, '').lower() in ['true', 'yes', '1']
+
+
+def _read_source(filename: str) -> str:
+    with open(filename) as fp:
+        return fp.read()
+
+
+def system_hostnames(source: str) -> Optional[List[str]]:
+    '''Hostname patterns of the systems in a configuration file, extracted
+    without importing it, or None if they are not literals'''
+    hostnames = []
+    for match in _HOSTNAMES.finditer(source):
+        try:
+            hostnames += ast.literal_eval(match.group(1))
+        except (ValueError, SyntaxError):
+            return None
+
+    return hostnames or None
+
+
+def _system_is_explicit() -> bool:
+    '''Whether ReFrame does not pick the system from the hostname'''
+    if os.getenv('RFM_SYSTEM') or os.getenv('RFM_AUTODETECT_METHODS'):
+        return True
+
+    return any(arg == '--system' or arg.startswith('--system=')
+               for arg in sys.argv)
+
+
+def select_system_files(sources: dict, hostname: str) -> List[str]:
+    '''The system configuration files that may match the hostname
+
+    All the files are selected when the system is passed explicitly to
+    ReFrame or when no file matches, so that ReFrame reports the same
+    errors as with the full configuration.
+    '''
+    if _system_is_explicit():
+        return list(sources)
+
+    selected = []
+    for filename, source in sources.items():
+        hostnames = system_hostnames(source)
+        if hostnames is None or any(re.match(p, hostname)
+                                    for p in hostnames):
+            selected.append(filename)
+
+    return selected or list(sources)
+
+
+def _encode(value):
+    '''Store the functions in the configuration, e.g. the log formatters, by
+    reference'''
+    if callable(value) and hasattr(value, '__code__'):
+        return {'__callable__': [value.__code__.co_filename,
+                                 value.__qualname__]}
+
+    raise TypeError(f'{value!r} cannot be cached')
+
+
+def _decode(obj: dict):
+    if list(obj) == ['__callable__']:
+        filename, qualname = obj['__callable__']
+        value = import_module_from_file(filename)
+        for attr in qualname.split('.'):
+            value = getattr(value, attr)
+
+        return value
+
+    return obj
+
+
+class SiteConfigCache:
+    '''Persistent cache of the assembled site configuration
+
+    The entries are keyed by the contents of the configuration files, the
+    environment variables that they read, the user and group and the
+    selected system files, so that ReFrame starts without importing the
+    system files when nothing has changed.
+    '''
+
+    def __init__(self, cache_file: Optional[str] = None,
+                 ttl: float = CACHE_TTL):
+        self._file = cache_file or _default_cache_file()
+        self._ttl = ttl * 3600
+        self._entries = self._load()
+
+    @property
+    def filename(self):
+        return self._file
+
+    def _load(self) -> dict:
+        try:
+            with open(self._file, 'r') as fp:
+                cache = json.load(fp, object_hook=_decode)
+        except (OSError, ValueError, ImportError, AttributeError):
+            return {}
+
+        if cache.get('version') != CACHE_VERSION:
+            return {}
+
+        return cache.get('entries', {})
+
+    def make_key(self, sources: dict, selected: list) -> str:
+        '''Build the key of the configuration assembled from the
+        ``selected`` files'''
+        env_vars = set()
+        for source in sources.values():
+            for match in _ENV_REFS.finditer(source):
+                env_vars.add(match.group(1) or match.group(2))
+
+        key = json.dumps([
+            {f: hashlib.sha256(s.encode()).hexdigest()
+             for f, s in sources.items()},
+            {v: os.getenv(v) for v in sorted(env_vars)},
+            os.getuid(), os.getgid(), sorted(selected)
+        ])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        '''Return the cached configuration or None if not valid'''
+        entry = self._entries.get(key)
+        if not entry or time.time() - entry['timestamp'] > self._ttl:
+            return None
+
+        return entry['config']
+
+    def put(self, key: str, config: dict):
+        '''Store the configuration and write the cache to disk atomically'''
+        now = time.time()
+        entries = {k: v for k, v in self._entries.items()
+                   if now - v['timestamp'] <= self._ttl}
+        entries[key] = {'timestamp': now, 'config': config}
+        self._entries = dict(
+            sorted(entries.items(),
+                   key=lambda e: e[1]['timestamp'])[-_MAX_ENTRIES:]
+        )
+        cache_dir = os.path.dirname(self._file)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as fp:
+                    json.dump({'version': CACHE_VERSION,
+                               'entries': self._entries}, fp,
+                              default=_encode)
+
+                os.replace(tmp_file, self._file)
+            except BaseException:
+                os.remove(tmp_file)
+                raise
+        except (OSError, TypeError):
+            # The configuration is still valid, it is only not cached
+            pass
+
+
+def load_site_configuration(config_files: List[str],
+                            system_files: List[str],
+                            build: Callable[[List[str]], dict],
+                            depends: List[str] = [],
+                            extend: Optional[Callable[[dict], dict]] = None
+                            ) -> dict:
+    '''Assemble the site configuration or reuse it from the cache
+
+    Only the system files that may match the hostname are passed to
+    ``build`` together with the ``config_files``; ``depends`` are the other
+    sources that affect the assembled configuration. ``extend`` adds the
+    parts of the configuration that are never cached.
+    The cache is controlled by the ``CSCS_RFM_CONFIG_CACHE`` (file),
+    ``CSCS_RFM_CONFIG_CACHE_TTL`` (hours) and ``CSCS_RFM_NO_CONFIG_CACHE``
+    environment variables.
+    '''
+    system_sources = {f: _read_source(f) for f in system_files}
+    selected = config_files + select_system_files(system_sources,
+                                                  socket.gethostname())
+    if _is_var_true('CSCS_RFM_NO_CONFIG_CACHE'):
+        config = build(selected)
+        return extend(config) if extend else config
+
+    sources = {f: _read_source(f) for f in config_files + depends}
+    sources.update(system_sources)
+    cache = SiteConfigCache(
+        os.getenv('CSCS_RFM_CONFIG_CACHE'),
+        float(os.getenv('CSCS_RFM_CONFIG_CACHE_TTL', CACHE_TTL))
+    )
+    key = cache.make_key(sources, selected)
+    config = cache.get(key)
+    if config is None:
+        config = build(selected)
+        cache.put(key, config)
+
+    return extend(config) if extend else config
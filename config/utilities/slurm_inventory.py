@@ -0,0 +1,218 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+import json
+import re
+import subprocess
+from typing import NamedTuple, Union
+from utilities.io import getlogger
+
+_NODE_NAME = re.compile(r'NodeName=(\S+)')
+_NODE_FIELDS = {
+    field: re.compile(rf' {field}=(\S*)')
+    for field in ('ActiveFeatures', 'Gres', 'Partitions')
+}
+_GRES_SOCKETS = re.compile(r'\(S:[^)]*\)')
+
+
+class SlurmNode(NamedTuple):
+    name: str
+    features: tuple
+    partitions: tuple
+    gres: str
+
+
+def _split_list(value: Union[str, list, None]) -> tuple:
+    '''Normalize a Slurm list field (text or json) into a tuple'''
+    if not value or value == '(null)':
+        return ()
+
+    if isinstance(value, str):
+        value = value.split(',')
+
+    return tuple(v for v in value if v)
+
+
+def _normalize_gres(gres: Union[str, None]) -> str:
+    '''Drop the socket affinity annotations, e.g. ``gpu:4(S:0-3)``'''
+    if not gres:
+        return '(null)'
+
+    return _GRES_SOCKETS.sub('', gres)
+
+
+def _run_scontrol(*args) -> str:
+    completed = subprocess.run(
+        ['scontrol', *args],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True
+    )
+    return completed.stdout
+
+
+class SlurmInventory:
+    '''Structured inventory of the Slurm nodes, partitions and reservations
+
+    ``scontrol`` is queried only once per object type and the results are
+    indexed by feature set, partition, reservation and GRes, so that all the
+    queries of the configuration generator are answered from memory.
+    The JSON output of ``scontrol`` is used when supported, otherwise the
+    one-liner text output is parsed.
+    '''
+
+    def __init__(self):
+        self._nodes = None
+        self._by_name = {}
+        self._by_features = {}
+        self._by_partition = {}
+        self._by_gres = {}
+        self._default_partition = None
+        self._partitions_loaded = False
+        self._reservations = None
+
+    @classmethod
+    def from_text(cls, nodes_info: str, partitions_info: str = '',
+                  reservations_info: str = ''):
+        '''Build the inventory from the text output of ``scontrol -o``'''
+        inventory = cls()
+        inventory._index_nodes(cls._parse_nodes_text(nodes_info))
+        inventory._default_partition = cls._parse_default_partition_text(
+            partitions_info)
+        inventory._partitions_loaded = True
+        inventory._reservations = cls._parse_reservations_text(
+            reservations_info)
+        return inventory
+
+    @staticmethod
+    def _parse_nodes_text(nodes_info: str) -> list:
+        nodes = []
+        for line in nodes_info.splitlines():
+            name = _NODE_NAME.match(line)
+            if not name:
+                continue
+
+            fields = {}
+            for field, regex in _NODE_FIELDS.items():
+                value = regex.search(line)
+                fields[field] = value.group(1) if value else None
+
+            nodes.append(SlurmNode(
+                name.group(1),
+                _split_list(fields['ActiveFeatures']),
+                _split_list(fields['Partitions']),
+                _normalize_gres(fields['Gres'])
+            ))
+
+        return nodes
+
+    @staticmethod
+    def _parse_nodes_json(nodes_info: str) -> list:
+        nodes = []
+        for node in json.loads(nodes_info)['nodes']:
+            nodes.append(SlurmNode(
+                node['name'],
+                _split_list(node.get('active_features')),
+                _split_list(node.get('partitions')),
+                _normalize_gres(node.get('gres'))
+            ))
+
+        return nodes
+
+    @staticmethod
+    def _parse_default_partition_text(partitions_info: str) -> Union[str,
+                                                                     None]:
+        for line in partitions_info.splitlines():
+            if 'Default=YES' in line:
+                partition = re.search(r'PartitionName=([\w]+)', line)
+                if partition:
+                    return partition.group(1)
+
+        return None
+
+    @staticmethod
+    def _parse_reservations_text(reservations_info: str) -> dict:
+        reservations = {}
+        for line in reservations_info.splitlines():
+            name = re.search(r'ReservationName=([\w-]+)', line)
+            if not name:
+                continue
+
+            nodes = re.search(r'Nodes=(\S+)', line)
+            reservations[name.group(1)] = nodes.group(1) if nodes else ''
+
+        return reservations
+
+    def _index_nodes(self, nodes: list):
+        self._nodes = nodes
+        for node in nodes:
+            self._by_name[node.name] = node
+            self._by_features.setdefault(node.features, []).append(node)
+            for part in node.partitions:
+                self._by_partition.setdefault(part, []).append(node)
+
+            self._by_gres.setdefault(node.gres, []).append(node)
+
+    def _load_nodes(self):
+        try:
+            nodes = self._parse_nodes_json(
+                _run_scontrol('--json', 'show', 'nodes'))
+        except Exception:
+            getlogger().debug('scontrol --json is not available, '
+                              'falling back to the text output')
+            nodes = self._parse_nodes_text(
+                _run_scontrol('show', 'nodes', '-o'))
+
+        self._index_nodes(nodes)
+
+    def _ensure_nodes(self):
+        if self._nodes is None:
+            self._load_nodes()
+
+    @property
+    def nodes(self) -> list:
+        self._ensure_nodes()
+        return self._nodes
+
+    @property
+    def default_partition(self) -> Union[str, None]:
+        if not self._partitions_loaded:
+            self._default_partition = self._parse_default_partition_text(
+                _run_scontrol('show', 'partitions', '-o'))
+            self._partitions_loaded = True
+
+        return self._default_partition
+
+    @property
+    def reservations(self) -> dict:
+        '''Reservations and their node lists'''
+        if self._reservations is None:
+            self._reservations = self._parse_reservations_text(
+                _run_scontrol('show', 'res', '-o'))
+
+        return self._reservations
+
+    def node_types(self) -> set:
+        '''Unique combinations of (ActiveFeatures, Partitions)'''
+        return {(n.features, n.partitions) for n in self.nodes
+                if n.features}
+
+    def nodes_with_features(self, node_feats: list) -> list:
+        '''Nodes having at least all the features in ``node_feats``'''
+        self._ensure_nodes()
+        node_feats = set(node_feats)
+        matched = []
+        for feats, nodes in self._by_features.items():
+            if node_feats.issubset(feats):
+                matched += nodes
+
+        return matched
+
+    def nodes_in_partition(self, partition: str) -> list:
+        self._ensure_nodes()
+        return self._by_partition.get(partition, [])
+
+    def nodes_with_gres(self, gres: str) -> list:
+        self._ensure_nodes()
+        return self._by_gres.get(gres, [])
@@ -0,0 +1,500 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Content-addressed mirror of the sources downloaded by the fetch fixtures
+
+The mirror is a directory on a shared filesystem, ``$CSCS_RFM_MIRROR``,
+that holds the downloaded files by their sha256 digest and, for every URL,
+the digest of its content. A file is downloaded once and then served from
+the mirror; with ``$CSCS_RFM_MIRROR_OFFLINE`` set, it is only served from
+the mirror, e.g. on network-isolated systems.
+
+The digests of the sources are pinned in ``mirror_sources.json``, next to
+this file, which is also the list of sources prefetched at the start of a
+session. The sources without a pinned digest are pinned to the digest of
+their first download in the mirror; ``pin`` downloads the given URLs, or
+the unpinned sources of the manifest, and records their digests in the
+manifest. A source is only added to the manifest with its digest.
+
+    python3 config/utilities/source_mirror.py prefetch
+    python3 config/utilities/source_mirror.py list
+    python3 config/utilities/source_mirror.py pin [--auth PREFIX] [URL ...]
+    python3 config/utilities/source_mirror.py verify
+
+The fixtures fetch their sources through ``MirroredDownloadMixin`` (see
+``checks/mixins/mirrored_download.py``).
+'''
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+MIRROR_VERSION = 1
+
+MANIFEST = os.path.join(os.path.dirname(__file__), 'mirror_sources.json')
+
+_CHUNK_SIZE = 1 << 20
+_TIMEOUT = 60
+_RETRIES = 3
+
+# Downloads left behind by interrupted runs
+_PENDING_TTL = 24 * 3600
+
+# Read once, since setting it is the only way to read it
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class MirrorError(Exception):
+    '''A source could not be fetched or does not match its pinned digest'''
+
+
+def default_mirror_dir() -> Optional[str]:
+    return os.getenv('CSCS_RFM_MIRROR') or None
+
+
+def offline() -> bool:
+    return os.getenv('CSCS_RFM_MIRROR_OFFLINE', '').lower() in ('1', 'y',
+                                                                'yes', 'true')
+
+
+def load_manifest(path: str = MANIFEST) -> Dict[str, dict]:
+    '''The sources of the fixtures by URL, with their pinned ``sha256`` and
+    the prefix of the variables of their credentials, ``auth``'''
+    try:
+        with open(path) as fp:
+            return json.load(fp)['sources']
+    except FileNotFoundError:
+        return {}
+
+
+def github_latest_tarball(url: str, auth: Optional[str] = None) -> str:
+    '''The tarball of the latest release from the GitHub API ``url``'''
+    request = urllib.request.Request(url, headers=_auth_headers(auth))
+    with urllib.request.urlopen(request, timeout=_TIMEOUT) as response:
+        return json.load(response)['tarball_url']
+
+
+def _auth_headers(auth: Optional[str]) -> Dict[str, str]:
+    if not auth:
+        return {}
+
+    username = os.getenv(f'{auth}_USERNAME')
+    password = os.getenv(f'{auth}_PASSWORD')
+    if not username or not password:
+        raise MirrorError(f'{auth}_USERNAME and {auth}_PASSWORD must be set')
+
+    credentials = base64.b64encode(f'{username}:{password}'.encode())
+    return {'Authorization': f'Basic {credentials.decode()}'}
+
+
+def _write_json(path: str, data: dict):
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path),
+                                    prefix='.', suffix='.tmp')
+    with os.fdopen(fd, 'w') as fp:
+        json.dump(data, fp, indent=2)
+
+    _make_readable(tmp_file)
+    os.replace(tmp_file, path)
+
+
+def _make_readable(path: str):
+    # The mirror is shared, but mkstemp() creates private files
+    os.chmod(path, 0o666 & ~_UMASK)
+
+
+class SourceMirror:
+    '''A directory of downloaded files by digest and of the digests of the
+    URLs'''
+
+    def __init__(self, directory: str, offline: bool = False,
+                 pins: Optional[Dict[str, dict]] = None):
+        self._dir = directory
+        self._offline = offline
+        self._pins = load_manifest() if pins is None else pins
+        self._locks = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return self._dir
+
+    @property
+    def offline(self):
+        return self._offline
+
+    def _blob(self, digest: str) -> str:
+        return os.path.join(self._dir, 'blobs', digest[:2], digest)
+
+    def _entry_file(self, url: str) -> str:
+        name = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self._dir, 'urls', f'{name}.json')
+
+    def _lock(self, url: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks[url]
+
+    def entry(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._entry_file(url)) as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get('version') != MIRROR_VERSION:
+            return None
+
+        return entry
+
+    def entries(self) -> List[dict]:
+        entries = []
+        try:
+            filenames = os.listdir(os.path.join(self._dir, 'urls'))
+        except FileNotFoundError:
+            return []
+
+        for filename in filenames:
+            if not filename.endswith('.json'):
+                continue
+
+            try:
+                with open(os.path.join(self._dir, 'urls', filename)) as fp:
+                    entries.append(json.load(fp))
+            except (OSError, ValueError):
+                continue
+
+        return sorted(entries, key=lambda e: e['url'])
+
+    def pin(self, url: str) -> Optional[str]:
+        return self._pins.get(url, {}).get('sha256')
+
+    def resolve(self, url: str,
+                resolver: Callable[[str, Optional[str]], str],
+                auth: Optional[str] = None) -> str:
+        '''Resolve an alias, e.g. of the latest release, to the URL of a
+        file; offline, the last resolution is used'''
+        entry = self.entry(url)
+        if self._offline:
+            if entry is None or 'resolved' not in entry:
+                raise MirrorError(f'{url} was never resolved in the mirror '
+                                  f'{self._dir} (offline mode)')
+
+            return entry['resolved']
+
+        try:
+            resolved = resolver(url, auth)
+        except (OSError, ValueError, KeyError) as err:
+            if entry is None or 'resolved' not in entry:
+                raise MirrorError(f'could not resolve {url}: {err}') from err
+
+            return entry['resolved']
+
+        if entry is None or entry.get('resolved') != resolved:
+            os.makedirs(os.path.dirname(self._entry_file(url)),
+                        exist_ok=True)
+            _write_json(self._entry_file(url), {
+                'version': MIRROR_VERSION, 'url': url, 'resolved': resolved,
+                'fetched': time.time()
+            })
+
+        return resolved
+
+    def fetch(self, url: str, dest: Optional[str] = None,
+              sha256: Optional[str] = None,
+              auth: Optional[str] = None) -> dict:
+        '''Copy the file of ``url`` to ``dest``, downloading it into the
+        mirror first if needed, and return its entry'''
+        pin = sha256 or self.pin(url)
+        auth = auth or self._pins.get(url, {}).get('auth')
+        with self._lock(url):
+            entry = self.entry(url)
+            if entry is not None and 'sha256' in entry:
+                if pin and entry['sha256'] != pin:
+                    raise MirrorError(
+                        f'{url} is mirrored with sha256 {entry["sha256"]}, '
+                        f'but pinned to {pin}'
+                    )
+
+                if os.path.exists(self._blob(entry['sha256'])):
+                    if dest:
+                        self._install(entry['sha256'], dest)
+
+                    return entry
+
+                # Pin the content to the first download
+                pin = pin or entry['sha256']
+
+            if self._offline:
+                raise MirrorError(f'{url} is not in the mirror {self._dir} '
+                                  f'(offline mode)')
+
+            entry = self._download(url, pin, auth)
+
+        if dest:
+            self._install(entry['sha256'], dest)
+
+        return entry
+
+    def _download(self, url: str, pin: Optional[str],
+                  auth: Optional[str]) -> dict:
+        request = urllib.request.Request(url, headers=_auth_headers(auth))
+        os.makedirs(os.path.join(self._dir, 'blobs'), exist_ok=True)
+        os.makedirs(os.path.join(self._dir, 'urls'), exist_ok=True)
+        for attempt in range(_RETRIES):
+            fd, tmp_file = tempfile.mkstemp(dir=os.path.join(self._dir,
+                                                             'blobs'),
+                                            prefix='.', suffix='.tmp')
+            h = hashlib.sha256()
+            size = 0
+            start = time.time()
+            try:
+                with os.fdopen(fd, 'wb') as fp, \
+                     urllib.request.urlopen(request,
+                                            timeout=_TIMEOUT) as response:
+                    for chunk in iter(lambda: response.read(_CHUNK_SIZE),
+                                      b''):
+                        h.update(chunk)
+                        fp.write(chunk)
+                        size += len(chunk)
+                break
+            except urllib.error.HTTPError as err:
+                os.remove(tmp_file)
+
+                # The client errors, e.g. a missing file, are not retried
+                if err.code < 500 or attempt == _RETRIES - 1:
+                    raise MirrorError(f'could not download {url}: {err}')
+            except OSError as err:
+                os.remove(tmp_file)
+                if attempt == _RETRIES - 1:
+                    raise MirrorError(f'could not download {url}: {err}')
+
+            time.sleep(2 ** attempt)
+
+        digest = h.hexdigest()
+        if pin and digest != pin:
+            os.remove(tmp_file)
+            raise MirrorError(f'{url} has sha256 {digest}, but is pinned to '
+                              f'{pin}')
+
+        blob = self._blob(digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        _make_readable(tmp_file)
+        os.replace(tmp_file, blob)
+        entry = {
+            'version': MIRROR_VERSION, 'url': url, 'sha256': digest,
+            'size': size, 'filename': os.path.basename(
+                urllib.parse.urlparse(url).path
+            ),
+            'fetched': time.time(), 'download_time': time.time() - start
+        }
+        _write_json(self._entry_file(url), entry)
+        return entry
+
+    def _install(self, digest: str, dest: str):
+        # The blobs are never modified, so a hard link is as good as a copy
+        if os.path.lexists(dest):
+            os.remove(dest)
+
+        try:
+            os.link(self._blob(digest), dest)
+        except OSError:
+            shutil.copyfile(self._blob(digest), dest)
+
+    def prefetch(self, urls: Iterable[str],
+                 workers: int = 8) -> Dict[str, Optional[str]]:
+        '''Fetch the URLs concurrently into the mirror and return the errors
+        by URL'''
+        def fetch(url):
+            try:
+                self.fetch(url)
+            except MirrorError as err:
+                return str(err)
+
+        urls = list(dict.fromkeys(urls))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(urls, pool.map(fetch, urls)))
+
+    def remove(self, url: str) -> bool:
+        '''Forget the content of a URL; its file is removed if no other URL
+        has the same content'''
+        entry = self.entry(url)
+        if entry is None:
+            return False
+
+        os.remove(self._entry_file(url))
+        digest = entry.get('sha256')
+        if digest and not any(e.get('sha256') == digest
+                              for e in self.entries()):
+            try:
+                os.remove(self._blob(digest))
+            except FileNotFoundError:
+                pass
+
+        return True
+
+    def verify(self) -> List[str]:
+        '''The URLs whose mirrored file is missing or corrupted'''
+        failed = []
+        for entry in self.entries():
+            digest = entry.get('sha256')
+            if not digest:
+                continue
+
+            h = hashlib.sha256()
+            try:
+                with open(self._blob(digest), 'rb') as fp:
+                    for chunk in iter(lambda: fp.read(_CHUNK_SIZE), b''):
+                        h.update(chunk)
+            except OSError:
+                failed.append(entry['url'])
+                continue
+
+            if h.hexdigest() != digest:
+                failed.append(entry['url'])
+
+        return failed
+
+    def cleanup(self):
+        '''Remove the downloads left behind by interrupted runs'''
+        tmp_dir = os.path.join(self._dir, 'blobs')
+        try:
+            for filename in os.listdir(tmp_dir):
+                path = os.path.join(tmp_dir, filename)
+                if filename.endswith('.tmp') and \
+                   time.time() - os.path.getmtime(path) > _PENDING_TTL:
+                    os.remove(path)
+        except OSError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Manage the mirror of the sources of the fetch fixtures'
+    )
+    parser.add_argument('--mirror', default=default_mirror_dir(),
+                        help='The mirror directory (default: '
+                             '$CSCS_RFM_MIRROR)')
+    parser.add_argument('--manifest', default=MANIFEST,
+                        help=f'The pinned sources (default: {MANIFEST})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    prefetch = commands.add_parser(
+        'prefetch', help='Download the sources of the manifest and the '
+                         'missing files of the mirrored ones'
+    )
+    prefetch.add_argument('--workers', type=int, default=8,
+                          help='Number of concurrent downloads (default: 8)')
+    commands.add_parser('list', help='List the mirrored sources')
+    pin = commands.add_parser(
+        'pin', help='Download the given sources, or the unpinned ones of '
+                    'the manifest, and pin them in the manifest to their '
+                    'mirrored digest'
+    )
+    pin.add_argument('--workers', type=int, default=8,
+                     help='Number of concurrent downloads (default: 8)')
+    pin.add_argument('--auth', metavar='PREFIX',
+                     help='The prefix of the variables of the credentials '
+                          'of the given sources')
+    pin.add_argument('urls', nargs='*', metavar='URL')
+    commands.add_parser('verify', help='Check the digests of the mirrored '
+                                       'files')
+    remove = commands.add_parser('remove', help='Remove sources from the '
+                                                'mirror')
+    remove.add_argument('urls', nargs='+', metavar='URL')
+    args = parser.parse_args(argv)
+    if not args.mirror:
+        parser.error('no --mirror given and CSCS_RFM_MIRROR is not set')
+
+    manifest = load_manifest(args.manifest)
+    if args.command == 'pin':
+        # The new sources are only written to the manifest once pinned
+        for url in args.urls:
+            source = manifest.setdefault(url, {'sha256': None})
+            if args.auth:
+                source['auth'] = args.auth
+
+    mirror = SourceMirror(args.mirror, offline(), manifest)
+    if args.command == 'prefetch':
+        mirror.cleanup()
+        urls = [*manifest, *(e['url'] for e in mirror.entries()
+                             if 'sha256' in e)]
+        start = time.time()
+        errors = mirror.prefetch(urls, args.workers)
+        for url, error in errors.items():
+            print(f'{"FAIL" if error else "OK  "} {url}'
+                  f'{f": {error}" if error else ""}')
+
+        failed = sum(1 for e in errors.values() if e)
+        print(f'Fetched {len(errors) - failed}/{len(errors)} sources in '
+              f'{time.time() - start:.1f} sec')
+        if failed:
+            raise SystemExit(1)
+    elif args.command == 'list':
+        for e in mirror.entries():
+            if 'resolved' in e:
+                print(f'{"alias":16s} {"":>12s}  {e["url"]} -> '
+                      f'{e["resolved"]}')
+            else:
+                pinned = '*' if manifest.get(e['url'], {}).get('sha256') \
+                    else ' '
+                print(f'{e["sha256"][:16]}{pinned}{e["size"]:>12d}  '
+                      f'{e["url"]}')
+    elif args.command == 'pin':
+        errors = mirror.prefetch(
+            [url for url, source in manifest.items()
+             if not source.get('sha256') and
+             (not args.urls or url in args.urls)], args.workers
+        )
+        count = 0
+        for url, source in manifest.items():
+            entry = mirror.entry(url)
+            if not source.get('sha256') and entry and 'sha256' in entry:
+                source['sha256'] = entry['sha256']
+                count += 1
+
+        with open(args.manifest) as fp:
+            data = json.load(fp)
+
+        unpinned = [url for url, source in manifest.items()
+                    if not source.get('sha256')]
+        data['sources'] = {url: source for url, source in manifest.items()
+                           if url not in args.urls or url not in unpinned}
+        with open(args.manifest, 'w') as fp:
+            json.dump(data, fp, indent=4)
+            fp.write('\n')
+
+        print(f'Pinned {count} sources in {args.manifest}')
+        for url in unpinned:
+            print(f'FAIL {url}{f": {errors[url]}" if errors.get(url) else ""}')
+
+        if unpinned:
+            raise SystemExit(1)
+    elif args.command == 'verify':
+        failed = mirror.verify()
+        for url in failed:
+            print(f'FAIL {url}')
+
+        print(f'{len(failed)} missing or corrupted files')
+        if failed:
+            raise SystemExit(1)
+    else:
+        for url in args.urls:
+            if not mirror.remove(url):
+                print(f'{url} is not in the mirror')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Read-only access to the files of a squashfs (4.0) image
+
+Only the metadata blocks on the path to a file and the data blocks of the
+file are read and decompressed, through a memory map of the image, so that
+the metadata of uenv images can be read without mounting them.
+'''
+
+import lzma
+import mmap
+import struct
+import zlib
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+_MAGIC = 0x73717368
+_SUPERBLOCK = struct.Struct('<IIIIIHHHHHHQQQQQQQQ')
+_INODE_HEADER = struct.Struct('<HHHHII')
+_BASIC_DIR = struct.Struct('<IIHHI')
+_EXT_DIR = struct.Struct('<IIIIHHI')
+_BASIC_FILE = struct.Struct('<IIII')
+_EXT_FILE = struct.Struct('<QQQIIII')
+_DIR_HEADER = struct.Struct('<III')
+_DIR_ENTRY = struct.Struct('<HhHH')
+_FRAGMENT_ENTRY = struct.Struct('<QII')
+
+_METADATA_SIZE = 8192
+_METADATA_UNCOMPRESSED = 0x8000
+_BLOCK_UNCOMPRESSED = 0x1000000
+_NO_FRAGMENT = 0xffffffff
+_FRAGMENTS_PER_BLOCK = _METADATA_SIZE // _FRAGMENT_ENTRY.size
+
+_BASIC_DIR_TYPE, _BASIC_FILE_TYPE = 1, 2
+_EXT_DIR_TYPE, _EXT_FILE_TYPE = 8, 9
+_DIR_TYPES = (_BASIC_DIR_TYPE, _EXT_DIR_TYPE)
+_FILE_TYPES = (_BASIC_FILE_TYPE, _EXT_FILE_TYPE)
+
+
+class SquashfsError(Exception):
+    '''The image is not a valid or supported squashfs image'''
+
+
+def _zstd_decompress(data: bytes, max_size: int) -> bytes:
+    return zstandard.ZstdDecompressor().decompress(
+        data, max_output_size=max_size
+    )
+
+
+def _decompressor(compression_id: int) -> Callable[[bytes, int], bytes]:
+    if compression_id == 1:
+        return lambda data, max_size: zlib.decompress(data)
+    elif compression_id == 2:
+        return lambda data, max_size: lzma.decompress(
+            data, format=lzma.FORMAT_ALONE)
+    elif compression_id == 4:
+        return lambda data, max_size: lzma.decompress(
+            data, format=lzma.FORMAT_XZ)
+    elif compression_id == 6:
+        if zstandard is None:
+            raise SquashfsError('reading zstd compressed images requires '
+                                'the zstandard Python package')
+
+        return _zstd_decompress
+
+    raise SquashfsError(f'unsupported compression id {compression_id}')
+
+
+class _Superblock(NamedTuple):
+    magic: int
+    inode_count: int
+    modification_time: int
+    block_size: int
+    fragment_count: int
+    compression_id: int
+    block_log: int
+    flags: int
+    id_count: int
+    version_major: int
+    version_minor: int
+    root_inode: int
+    bytes_used: int
+    id_table_start: int
+    xattr_table_start: int
+    inode_table_start: int
+    directory_table_start: int
+    fragment_table_start: int
+    export_table_start: int
+
+
+class _Inode(NamedTuple):
+    type: int
+    # Directories: position of the listing in the directory table
+    # Files: start of the data blocks, fragment and offset in the fragment
+    start: int
+    offset: int
+    size: int
+    fragment: int = _NO_FRAGMENT
+    block_sizes: Tuple[int, ...] = ()
+
+
+class SquashfsImage:
+    '''A squashfs image opened for reading its files'''
+
+    def __init__(self, filename: str):
+        with open(filename, 'rb') as fp:
+            try:
+                self._image = mmap.mmap(fp.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SquashfsError(f'{filename} is empty') from None
+
+        try:
+            if len(self._image) < _SUPERBLOCK.size:
+                raise SquashfsError(f'{filename} is too small')
+
+            self._sb = _Superblock(*_SUPERBLOCK.unpack_from(self._image))
+            if self._sb.magic != _MAGIC:
+                raise SquashfsError(f'{filename} is not a squashfs image')
+
+            if self._sb.version_major != 4:
+                raise SquashfsError(
+                    f'unsupported squashfs version '
+                    f'{self._sb.version_major}.{self._sb.version_minor}'
+                )
+
+            self._decompress = _decompressor(self._sb.compression_id)
+        except BaseException:
+            self._image.close()
+            raise
+
+        # Decompressed metadata blocks by position
+        self._metadata: Dict[int, Tuple[bytes, int]] = {}
+
+    def close(self):
+        self._image.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _metadata_block(self, pos: int) -> Tuple[bytes, int]:
+        '''The decompressed metadata block at ``pos`` and the position of
+        the next one'''
+        if pos not in self._metadata:
+            header, = struct.unpack_from('<H', self._image, pos)
+            size = header & ~_METADATA_UNCOMPRESSED
+            data = self._image[pos + 2:pos + 2 + size]
+            if not header & _METADATA_UNCOMPRESSED:
+                data = self._decompress(data, _METADATA_SIZE)
+
+            self._metadata[pos] = (data, pos + 2 + size)
+
+        return self._metadata[pos]
+
+    def _read_metadata(self, pos: int, offset: int,
+                       size: int) -> Tuple[bytes, int, int]:
+        '''Read ``size`` bytes of the metadata starting at ``offset`` of the
+        block at ``pos``, returning also where the read ended'''
+        chunks = []
+        while size > 0:
+            data, next_pos = self._metadata_block(pos)
+            chunk = data[offset:offset + size]
+            if not chunk:
+                raise SquashfsError('truncated metadata')
+
+            chunks.append(chunk)
+            size -= len(chunk)
+            offset += len(chunk)
+            if offset == len(data):
+                pos, offset = next_pos, 0
+
+        return b''.join(chunks), pos, offset
+
+    def _inode(self, ref: int) -> _Inode:
+        pos = self._sb.inode_table_start + (ref >> 16)
+        header, pos, offset = self._read_metadata(pos, ref & 0xffff,
+                                                  _INODE_HEADER.size)
+        inode_type = _INODE_HEADER.unpack(header)[0]
+        if inode_type == _BASIC_DIR_TYPE:
+            data, *_ = self._read_metadata(pos, offset, _BASIC_DIR.size)
+            block, _, size, offset, _ = _BASIC_DIR.unpack(data)
+            return _Inode(inode_type, block, offset, size)
+        elif inode_type == _EXT_DIR_TYPE:
+            data, *_ = self._read_metadata(pos, offset, _EXT_DIR.size)
+            _, size, block, _, _, offset, _ = _EXT_DIR.unpack(data)
+            return _Inode(inode_type, block, offset, size)
+        elif inode_type == _BASIC_FILE_TYPE:
+            data, pos, offset = self._read_metadata(pos, offset,
+                                                    _BASIC_FILE.size)
+            start, fragment, frag_offset, size = _BASIC_FILE.unpack(data)
+        elif inode_type == _EXT_FILE_TYPE:
+            data, pos, offset = self._read_metadata(pos, offset,
+                                                    _EXT_FILE.size)
+            start, size, _, _, fragment, frag_offset, _ = _EXT_FILE.unpack(
+                data
+            )
+        else:
+            return _Inode(inode_type, 0, 0, 0)
+
+        num_blocks, tail = divmod(size, self._sb.block_size)
+        if tail and fragment == _NO_FRAGMENT:
+            num_blocks += 1
+
+        data, *_ = self._read_metadata(pos, offset, 4 * num_blocks)
+        return _Inode(inode_type, start, frag_offset, size, fragment,
+                      struct.unpack(f'<{num_blocks}I', data))
+
+    def _listdir(self, inode: _Inode) -> Dict[str, int]:
+        '''The inode references of the entries of a directory'''
+        # The listing size includes the implicit '.' and '..' entries
+        size = inode.size - 3
+        if size <= 0:
+            return {}
+
+        data, *_ = self._read_metadata(
+            self._sb.directory_table_start + inode.start, inode.offset, size
+        )
+        entries = {}
+        pos = 0
+        while pos < len(data):
+            count, start, _ = _DIR_HEADER.unpack_from(data, pos)
+            pos += _DIR_HEADER.size
+            for _ in range(count + 1):
+                offset, _, _, name_size = _DIR_ENTRY.unpack_from(data, pos)
+                pos += _DIR_ENTRY.size
+                name = data[pos:pos + name_size + 1].decode()
+                pos += name_size + 1
+                entries[name] = (start << 16) | offset
+
+        return entries
+
+    def _lookup(self, path: str) -> _Inode:
+        inode = self._inode(self._sb.root_inode)
+        for name in path.strip('/').split('/'):
+            if inode.type not in _DIR_TYPES:
+                raise NotADirectoryError(path)
+
+            ref = self._listdir(inode).get(name)
+            if ref is None:
+                raise FileNotFoundError(path)
+
+            inode = self._inode(ref)
+
+        return inode
+
+    def _data_block(self, pos: int, stored_size: int,
+                    size: int) -> bytes:
+        if stored_size == 0:
+            # Sparse block
+            return bytes(size)
+
+        length = stored_size & ~_BLOCK_UNCOMPRESSED
+        data = self._image[pos:pos + length]
+        if not stored_size & _BLOCK_UNCOMPRESSED:
+            data = self._decompress(data, self._sb.block_size)
+
+        return data
+
+    def _fragment(self, index: int) -> bytes:
+        block, entry = divmod(index, _FRAGMENTS_PER_BLOCK)
+        table_pos, = struct.unpack_from(
+            '<Q', self._image, self._sb.fragment_table_start + 8 * block
+        )
+        data, *_ = self._read_metadata(table_pos,
+                                       entry * _FRAGMENT_ENTRY.size,
+                                       _FRAGMENT_ENTRY.size)
+        start, stored_size, _ = _FRAGMENT_ENTRY.unpack(data)
+        return self._data_block(start, stored_size, self._sb.block_size)
+
+    def read_file(self, path: str) -> bytes:
+        '''Read a regular file, with ``path`` relative to the image root'''
+        inode = self._lookup(path)
+        if inode.type in _DIR_TYPES:
+            raise IsADirectoryError(path)
+
+        if inode.type not in _FILE_TYPES:
+            raise SquashfsError(f'{path} is not a regular file')
+
+        chunks: List[bytes] = []
+        pos = inode.start
+        remaining = inode.size
+        for stored_size in inode.block_sizes:
+            chunks.append(self._data_block(
+                pos, stored_size, min(remaining, self._sb.block_size)
+            ))
+            pos += stored_size & ~_BLOCK_UNCOMPRESSED
+            remaining -= len(chunks[-1])
+
+        if inode.fragment != _NO_FRAGMENT:
+            fragment = self._fragment(inode.fragment)
+            chunks.append(
+                fragment[inode.offset:inode.offset + remaining]
+            )
+
+        return b''.join(chunks)
@@ -1,10 +1,16 @@
+import copy
+import json
 import os
 import pathlib
+import tempfile
+import threading
 import yaml
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Optional, Tuple
 
 import reframe.utility.osext as osext
+import squashfs
 from reframe.core.exceptions import ConfigError
 from packaging.version import Version
 
@@ -16,6 +22,11 @@ _UENV_MOUNT_DELIMITER = '@'
 _UENV_LABEL_DELIMITER = '^'
 _RFM_META = pathlib.Path('extra') / 'reframe.yaml'
 _RFM_META_DIR = pathlib.Path('meta')
+_MAX_INSPECTIONS = 8
+_CACHE_VERSION = 1
+
+# Prefer the (much faster) C implementation of the YAML loader
+_YAML_LOADER = getattr(yaml, 'CBaseLoader', yaml.BaseLoader)
 
 
 def uarch(partition):
@@ -102,58 +113,133 @@ def _parse_uenv_identifier(
     return (uenv_name, uenv_path)
 
 
-def _get_uenvs() -> Optional[List]:
-    uenv = os.environ.get('CSCS_RFM_UENV', None)
-    if uenv is None:
-        return uenv
+class _UenvMetaCache:
+    """
+    Persistent cache of the reframe metadata of the uenv images.
 
-    uenv_environments = []
-    uenv_list = uenv.split(_UENV_DELIMITER)
-    uenv_version = osext.run_command(
-        f'{_UENV_CLI} --version', shell=True
-    ).stdout.strip()
+    The entries are keyed by the squashfs path, size and modification time,
+    so that the metadata of an image is parsed only once.
+    """
 
-    for uenv in uenv_list:
-        uenv_identifier, *uenv_mountpoint = uenv.split(_UENV_MOUNT_DELIMITER)
-        uenv_name, uenv_path = _parse_uenv_identifier(uenv_identifier)
+    def __init__(self):
+        cache_home = os.getenv('XDG_CACHE_HOME',
+                               os.path.join(os.path.expanduser('~'), '.cache'))
+        self._file = os.path.join(cache_home, 'reframe', 'uenv_meta.json')
+        self._lock = threading.Lock()
+        self._modified = False
+        try:
+            with open(self._file) as fp:
+                cache = json.load(fp)
+        except (OSError, ValueError):
+            cache = {}
 
-        if len(uenv_mountpoint) > 0:
-            uenv_mountpoint = uenv_mountpoint[0]
+        if cache.get('version') == _CACHE_VERSION:
+            self._entries = cache.get('entries', {})
         else:
-            uenv_mountpoint = None
+            self._entries = {}
+
+    @staticmethod
+    def make_key(image_path: pathlib.Path, uenv_version: str) -> str:
+        st = image_path.stat()
+        return f'{image_path}:{st.st_size}:{st.st_mtime_ns}:{uenv_version}'
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, image_environments: dict):
+        with self._lock:
+            self._entries[key] = image_environments
+            self._modified = True
+
+    def save(self):
+        if not self._modified:
+            return
+
+        # Forget the images that have been removed
+        entries = {k: v for k, v in self._entries.items()
+                   if os.path.exists(k.rsplit(':', 3)[0])}
+        cache_dir = os.path.dirname(self._file)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({'version': _CACHE_VERSION,
+                           'entries': entries}, fp)
+
+            os.replace(tmp_file, self._file)
+        except OSError as err:
+            print(f'The uenv metadata could not be cached: {err}')
 
-        # Check if given uenv_name is a path to a squashfs archive
-        if uenv_path:
-            if not uenv_path.is_file():
-                raise ConfigError(f"{uenv_name} is not a valid path to a squashfs uenv image")
 
-            # We cannot inspect for target systems
-            target_system = '*'
-            image_path = uenv_path
-            rfm_meta = image_path.parent / _RFM_META_DIR / _RFM_META
-        else:
-            inspect_cmd = f'{_UENV_CLI} image inspect {uenv_name} --format'
+def _read_image_metadata(image_path: pathlib.Path) -> Optional[dict]:
+    """
+    Read the reframe metadata from the squashfs image itself.
+
+    returns: the parsed metadata or None if it cannot be read from the image
+    """
+    try:
+        with squashfs.SquashfsImage(str(image_path)) as image:
+            rfm_meta = image.read_file(str(_RFM_META_DIR / _RFM_META))
+    except (OSError, squashfs.SquashfsError):
+        return None
+
+    return yaml.load(rfm_meta, Loader=_YAML_LOADER)
+
+
+def _inspect_uenv(uenv: str, uenv_version: str,
+                  meta_cache: _UenvMetaCache) -> List:
+    """
+    Return the reframe environments of a uenv in CSCS_RFM_UENV.
+    """
+    uenv_identifier, *uenv_mountpoint = uenv.split(_UENV_MOUNT_DELIMITER)
+    uenv_name, uenv_path = _parse_uenv_identifier(uenv_identifier)
 
-            image_path = osext.run_command(
-                f"{inspect_cmd}='{{sqfs}}'", shell=True).stdout.strip()
-            target_system = '*'
+    if len(uenv_mountpoint) > 0:
+        uenv_mountpoint = uenv_mountpoint[0]
+    else:
+        uenv_mountpoint = None
+
+    # Check if given uenv_name is a path to a squashfs archive
+    if uenv_path:
+        if not uenv_path.is_file():
+            raise ConfigError(f"{uenv_name} is not a valid path to a squashfs uenv image")
 
-            image_path = pathlib.Path(image_path)
-            # Check that uenv was pulled
-            if not image_path.is_file():
+        # We cannot inspect for target systems
+        target_system = '*'
+        image_path = uenv_path
+    else:
+        inspect_cmd = f'{_UENV_CLI} image inspect {uenv_name} --format'
+
+        image_path = osext.run_command(
+            f"{inspect_cmd}='{{sqfs}}'", shell=True).stdout.strip()
+        target_system = '*'
+
+        image_path = pathlib.Path(image_path)
+        # Check that uenv was pulled
+        if not image_path.is_file():
+            raise ConfigError(
+                f"{uenv_name} is missing, "
+                f"try pulling it with: uenv image pull {uenv_name}")
+        try:
+            if image_path.stat().st_size == 0:
                 raise ConfigError(
-                    f"{uenv_name} is missing, "
+                    f"{uenv_name} is empty, "
                     f"try pulling it with: uenv image pull {uenv_name}")
-            try:
-                if image_path.stat().st_size == 0:
-                    raise ConfigError(
-                        f"{uenv_name} is empty, "
-                        f"try pulling it with: uenv image pull {uenv_name}")
-            except FileNotFoundError:
-                raise ConfigError(f"{uenv_name} was not found")
-
+        except FileNotFoundError:
+            raise ConfigError(f"{uenv_name} was not found")
+
+    cache_key = meta_cache.make_key(image_path, uenv_version)
+    image_environments = meta_cache.get(cache_key)
+    if image_environments is None:
+        # The metadata is read from the image when possible, which does not
+        # need the uenv command
+        image_environments = _read_image_metadata(image_path)
+        if image_environments is None:
+            if uenv_path:
+                rfm_meta = image_path.parent / _RFM_META_DIR / _RFM_META
             # FIXME temporary workaround for older uenv versions
-            if Version(uenv_version) >= Version('5.1.0-dev'):
+            elif Version(uenv_version) >= Version('5.1.0-dev'):
                 meta_path = osext.run_command(
                     f"{inspect_cmd}='{{meta}}'", shell=True
                 ).stdout.strip()
@@ -161,66 +247,104 @@ def _get_uenvs() -> Optional[List]:
             else:
                 rfm_meta = image_path.parent / 'store.yaml'
 
-        try:
-            with open(rfm_meta) as image_envs:
-                image_environments = yaml.load(
-                    image_envs.read(), Loader=yaml.BaseLoader)
-        except OSError as err:
-            print(f'Skipping uenv `{uenv}`, there was an error '
-                  f'reading the metadata: {err}')
-
-            continue
+            try:
+                with open(rfm_meta) as image_envs:
+                    image_environments = yaml.load(image_envs,
+                                                   Loader=_YAML_LOADER)
+            except OSError as err:
+                print(f'Skipping uenv `{uenv}`, there was an error '
+                      f'reading the metadata: {err}')
 
-        for k, v in image_environments.items():
-            # strip out the fields that are not to be part reframe environment
-            activation = v.pop('activation', [])
-            views = v.pop('views', [])
+                return []
 
-            env = {
-                'target_systems': [target_system]
-            }
-            env.update(v)
+        meta_cache.put(cache_key, image_environments)
 
-            if isinstance(activation, list):
-                env['prepare_cmds'] = activation
-            # FIXME: this is deprecated and should be removed
-            elif isinstance(activation, str):
-                env['prepare_cmds'] = [f'source {activation}']
-            else:
-                raise ConfigError(
-                    'activation has to be a list of commands to be '
-                    'executed to configure the environment'
-                )
-
-            # Replace characters that create problems in environment names
-            uenv_name_pretty = (
-                (uenv_name if uenv_name else str(uenv_path))
-                .replace(":", "_")
-                .replace("/", "_")
-                .replace("%", "_")
+    uenv_environments = []
+    for k, v in image_environments.items():
+        # strip out the fields that are not to be part reframe environment
+        activation = v.get('activation', [])
+        views = v.get('views', [])
+
+        env = {
+            'target_systems': [target_system]
+        }
+        env.update(copy.deepcopy({
+            field: value for field, value in v.items()
+            if field not in ('activation', 'views')
+        }))
+
+        if isinstance(activation, list):
+            env['prepare_cmds'] = list(activation)
+        # FIXME: this is deprecated and should be removed
+        elif isinstance(activation, str):
+            env['prepare_cmds'] = [f'source {activation}']
+        else:
+            raise ConfigError(
+                'activation has to be a list of commands to be '
+                'executed to configure the environment'
             )
-            env['name'] = f'{uenv_name_pretty}_{k}'
-
-            env.setdefault("extras", {})["version"] = _uenv_version_and_tag_from_label(uenv_name)
-
-            env['resources'] = {
-                'uenv': {
-                    'file': str(image_path),
-                    'mount': uenv_mountpoint,
-                    'uenv': (
-                        f'{str(image_path):{uenv_mountpoint}}' if uenv_mountpoint else str(image_path)
-                    ),
-                }
+
+        # Replace characters that create problems in environment names
+        uenv_name_pretty = (
+            (uenv_name if uenv_name else str(uenv_path))
+            .replace(":", "_")
+            .replace("/", "_")
+            .replace("%", "_")
+        )
+        env['name'] = f'{uenv_name_pretty}_{k}'
+
+        env.setdefault("extras", {})["version"] = _uenv_version_and_tag_from_label(uenv_name)
+
+        env['resources'] = {
+            'uenv': {
+                'file': str(image_path),
+                'mount': uenv_mountpoint,
+                'uenv': (
+                    f'{str(image_path):{uenv_mountpoint}}' if uenv_mountpoint else str(image_path)
+                ),
             }
-            if len(views) > 0:
-                env['resources']['uenv_views'] = {'views': ','.join(views)}
-            env['features'] += ['uenv']
-            if env['name'].startswith('prgenv'):
-                env['features'] += ['prgenv']
+        }
+        if len(views) > 0:
+            env['resources']['uenv_views'] = {'views': ','.join(views)}
+        env['features'] += ['uenv']
+        if env['name'].startswith('prgenv'):
+            env['features'] += ['prgenv']
 
-            uenv_environments.append(env)
+        uenv_environments.append(env)
 
     return uenv_environments
 
 
-UENV = _get_uenvs() or None
+def _get_uenvs() -> Optional[List]:
+    uenv = os.environ.get('CSCS_RFM_UENV', None)
+    if uenv is None:
+        return uenv
+
+    uenv_list = uenv.split(_UENV_DELIMITER)
+    uenv_version = osext.run_command(
+        f'{_UENV_CLI} --version', shell=True
+    ).stdout.strip()
+
+    # The images are inspected concurrently, since most of the time is spent
+    # waiting for the uenv commands
+    meta_cache = _UenvMetaCache()
+    with ThreadPoolExecutor(
+        max_workers=min(len(uenv_list), _MAX_INSPECTIONS)
+    ) as executor:
+        image_environments = list(executor.map(
+            lambda u: _inspect_uenv(u, uenv_version, meta_cache), uenv_list
+        ))
+
+    meta_cache.save()
+    return [env for envs in image_environments for env in envs]
+
+
+def __getattr__(name):
+    # The uenv images are inspected only when the environments are first
+    # needed, so that importing the module for `uarch` is cheap
+    if name == 'UENV':
+        global UENV
+        UENV = _get_uenvs() or None
+        return UENV
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
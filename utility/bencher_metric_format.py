@@ -1,28 +1,156 @@
 # https://bencher.dev/docs/reference/bencher-metric-format/
 
+import argparse
 import json
+import statistics
 import sys
+from array import array
+from collections import defaultdict
 from pathlib import Path
 
+# Size of the chunks read from the report
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = " \t\n\r"
+
+
+class JSONStream:
+    """Pull parser over a JSON file that decodes one value at a time.
+
+    Only the containers on the path to the values of interest are walked,
+    every other value is decoded (or skipped) as a whole, so the memory
+    needed is bounded by the largest of those values and not by the size of
+    the file.
+    """
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        chunk = self._fp.read(CHUNK_SIZE)
+        if not chunk:
+            self._eof = True
+            return False
+
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            while (self._pos < len(self._buf) and
+                   self._buf[self._pos] in _WHITESPACE):
+                self._pos += 1
+
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+
+            if not self._fill():
+                raise ValueError("Unexpected end of the JSON file")
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char not in chars:
+            raise ValueError(f"Invalid JSON: expected {chars!r} but found "
+                             f"{char!r}")
+
+        self._pos += 1
+        return char
+
+    def value(self):
+        """Decode the next value"""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+            else:
+                # Numbers may continue in the next chunk
+                if end < len(self._buf) or self._eof or not self._fill():
+                    self._pos = end
+                    return value
+
+    def items(self):
+        """Iterate over the keys of the next object; the value of every key
+        must be consumed before the next iteration"""
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+
+        while True:
+            key = self.value()
+            self._expect(":")
+            yield key
+            if self._expect(",}") == "}":
+                return
+
+    def elements(self):
+        """Iterate over the elements of the next array; every element must
+        be consumed before the next iteration"""
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+
+        while True:
+            yield
+            if self._expect(",]") == "]":
+                return
+
+
+def iter_testcases(reframe_report):
+    """Yield the testcases of all the runs of a ReFrame report"""
+    with open(reframe_report, "r", encoding="utf-8") as f:
+        stream = JSONStream(f)
+        for key in stream.items():
+            if key != "runs":
+                stream.value()
+                continue
 
-def reframe_to_bmf(reframe_report):
-    path = Path(reframe_report)
-    if not path.exists():
-        sys.exit(f"Error: File '{reframe_report}' not found.")
+            for _ in stream.elements():
+                for run_key in stream.items():
+                    if run_key != "testcases":
+                        stream.value()
+                        continue
 
-    print("Converting ReFrame report to Bencher Metric Format...", flush=True)
-    print(f"File: {reframe_report}", flush=True)
+                    for _ in stream.elements():
+                        yield stream.value()
+
+
+def bounds(samples, kind):
+    """Return the value and the lower and upper bounds of the samples"""
+    value = statistics.median(samples)
+    if kind == "none":
+        return value, None, None
+
+    if kind == "minmax" or len(samples) < 2:
+        return value, min(samples), max(samples)
+
+    lower, _, upper = statistics.quantiles(samples, n=4, method="inclusive")
+    return value, lower, upper
 
-    with open(reframe_report, "r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # Bencher Metric Format: format used to upload JSON files on bencher.dev
-    # testcases with key (system, partition, environ) to handle multiple
-    # partitions
-    bmf_testcase = {}
+def reframe_to_bmf(reframe_reports, bounds_kind="iqr", output_dir="."):
+    # Samples of every (system, partition, environ) testbed, test and metric
+    samples = defaultdict(lambda: defaultdict(lambda: defaultdict(
+        lambda: array("d")
+    )))
 
-    for run in data["runs"]:
-        for testcase in run["testcases"]:
+    print("Converting ReFrame report to Bencher Metric Format...", flush=True)
+    for reframe_report in reframe_reports:
+        path = Path(reframe_report)
+        if not path.exists():
+            sys.exit(f"Error: File '{reframe_report}' not found.")
+
+        print(f"File: {reframe_report}", flush=True)
+        for testcase in iter_testcases(reframe_report):
             if testcase["result"] != "pass":
                 if testcase["fail_phase"] != "performance":
                     continue
@@ -30,33 +158,32 @@ def reframe_to_bmf(reframe_report):
             key = (testcase["system"],
                    testcase["partition"],
                    testcase["environ"])
+            benchmark = samples[key][testcase["display_name"]]
+            for k, v in (testcase["perfvalues"] or {}).items():
+                if v[0] is not None:
+                    measure = k.split(':')[-1]
+                    benchmark[measure].append(v[0])
 
-            if key not in bmf_testcase:
-                bmf_testcase[key] = {}
-
-            perfvalues = testcase["perfvalues"]
-            benchmark_measures = {}
-            for k, v in perfvalues.items():
-                measure = k.split(':')[-1]
-                benchmark_measures[measure] = {"value": v[0]}
-
-            benchmark_name = testcase["display_name"]
-            if benchmark_name in bmf_testcase[key]:
-                raise ValueError(
-                    f"Error: Duplicate benchmark name '{benchmark_name}' "
-                    f"found in the report for {key}."
-                )
-            bmf_testcase[key][benchmark_name] = benchmark_measures
-
-    if not bmf_testcase:
+    if not samples:
         raise ValueError(
             "Error: No passing testcases found; "
             "cannot determine environment, partition, or system."
         )
 
     # The bencher file name is used in CI/CD as the testbed option
-    for (system_, partition_, environ_), bmf in bmf_testcase.items():
-        bencher_file_name = f"bencher={system_}={partition_}={environ_}.json"
+    for (system_, partition_, environ_), benchmarks in samples.items():
+        bmf = {}
+        for benchmark_name, measures in benchmarks.items():
+            bmf[benchmark_name] = {}
+            for measure, values in measures.items():
+                value, lower, upper = bounds(values, bounds_kind)
+                bmf[benchmark_name][measure] = {"value": value}
+                if lower is not None:
+                    bmf[benchmark_name][measure]["lower_value"] = lower
+                    bmf[benchmark_name][measure]["upper_value"] = upper
+
+        bencher_file_name = (Path(output_dir) /
+                             f"bencher={system_}={partition_}={environ_}.json")
         with open(bencher_file_name, "w") as f:
             json.dump(bmf, f, indent=2)
 
@@ -65,7 +192,20 @@ def reframe_to_bmf(reframe_report):
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        sys.exit(f"Usage: your_python {sys.argv[0]} <reframe_report.json>")
-
-    reframe_to_bmf(sys.argv[1])
+    parser = argparse.ArgumentParser(
+        description="Convert ReFrame reports to Bencher Metric Format files, "
+                    "one per (system, partition, environ) testbed. The "
+                    "samples of all the runs of a test are aggregated into "
+                    "their median."
+    )
+    parser.add_argument("reports", nargs="+", metavar="reframe_report.json")
+    parser.add_argument("--bounds", choices=["iqr", "minmax", "none"],
+                        default="iqr",
+                        help="Lower and upper values of the samples: the "
+                             "interquartile range (default), the minimum "
+                             "and maximum or none")
+    parser.add_argument("--output-dir", default=".",
+                        help="Directory of the Bencher files")
+    args = parser.parse_args()
+
+    reframe_to_bmf(args.reports, args.bounds, args.output_dir)
@@ -0,0 +1,96 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Detection time and accuracy of the change-point detector
+
+Synthetic series of Gaussian noise, some with a step of the mean at a uenv
+update, are segmented together and one by one. The detected changes are
+compared with the injected steps.
+
+Usage: python3 benchmarks/perf_changepoints.py [--series=20000]
+           [--length=200] [--steps=0.1]
+'''
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import perf_changepoints  # noqa: E402
+
+
+def make_histories(series, length, steps, seed=0):
+    '''Series with lengths between ``length / 2`` and ``length``; the
+    ``steps`` fraction of them has a step of 10-30% of the mean'''
+    rng = random.Random(seed)
+    histories, injected = {}, {}
+    for i in range(series):
+        key = perf_changepoints.SeriesKey(f'Test{i % 500} %size={i // 500}',
+                                          'daint', 'normal', 'gnu', 'bw')
+        history = perf_changepoints.History()
+        n = rng.randint(length // 2, length)
+        at = None
+        if rng.random() < steps:
+            at = rng.randint(n // 4, 3 * n // 4)
+            injected[key] = at
+
+        level, noise = rng.uniform(10, 1000), rng.uniform(0.005, 0.03)
+        drop = rng.uniform(0.1, 0.3)
+        for j in range(n):
+            after = at is not None and j >= at
+            environ = f'prgenv-gnu_{"25.6" if after else "24.11"}_v1_default'
+            mean = level * (1 - drop) if after else level
+            history.append(j * 86400, rng.gauss(mean, noise * level),
+                           1000 + j, environ, '4.7.4', 4, 'GB/s', level,
+                           -0.1, None)
+
+        histories[key] = history
+
+    return histories, injected
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--series', type=int, default=20000,
+                        help='Number of series')
+    parser.add_argument('--length', type=int, default=200,
+                        help='Maximum number of samples per series')
+    parser.add_argument('--steps', type=float, default=0.1,
+                        help='Fraction of the series with a step')
+    args = parser.parse_args()
+
+    histories, injected = make_histories(args.series, args.length,
+                                         args.steps)
+    samples = sum(len(h) for h in histories.values())
+    start = time.perf_counter()
+    changes = perf_changepoints.detect(histories)
+    elapsed = time.perf_counter() - start
+
+    found = {c.series: c for c in changes}
+    hits = [k for k in injected if k in found]
+    exact = sum(abs(found[k].index - injected[k]) <= 1 for k in hits)
+    attributed = sum(found[k].cause.startswith('uenv 24.11:v1 -> 25.6:v1')
+                     for k in hits)
+    false = sum(1 for c in changes if c.series not in injected)
+    print(f'{args.series} series, {samples} samples, {len(injected)} steps')
+    print(f'Vectorized:  {elapsed:.2f} sec ({samples / elapsed:.0f} '
+          f'samples/sec)')
+
+    # The same detection one series at a time
+    subset = dict(list(histories.items())[:1000])
+    start = time.perf_counter()
+    for key, history in subset.items():
+        perf_changepoints.detect({key: history})
+
+    single = (time.perf_counter() - start) * len(histories) / len(subset)
+    print(f'Per series:  {single:.2f} sec (extrapolated from '
+          f'{len(subset)} series, {single / elapsed:.0f}x slower)')
+    print(f'Detected:    {len(hits)}/{len(injected)} steps, {exact} within '
+          f'one sample, {attributed} attributed to the uenv update, '
+          f'{false} false changes')
+    print(f'Regressions: {sum(c.regression for c in changes)}')
@@ -0,0 +1,158 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Ingestion and query times of the perflog store
+
+Synthetic perflogs in the ``filelog`` format of ``config/common.py`` are
+written for a year of runs, ingested from scratch and incrementally after
+appending to them. The last 90 days of a metric and of a system are
+queried from the store and by scanning the text files.
+
+Usage: python3 benchmarks/perflog_queries.py [--lines=2000000] [--tests=50]
+'''
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import perflog_store  # noqa: E402
+
+SYSTEMS = {'daint': ['normal', 'debug'], 'eiger': ['mc']}
+METRICS = [('bw', 'GB/s'), ('latency', 'us'), ('time', 's'),
+           ('flops', 'Gflop/s')]
+HEADER = ('job_completion_time|reframe version|info|jobid=jobid|'
+          'num_tasks=num_tasks|perf_var=perf_value|ref=perf_ref '
+          '(l=perf_lower_thres, u=perf_upper_thres)|perf_unit\n')
+
+
+def write_perflogs(prefix, lines, tests, start, days, jobid=1000):
+    '''Append ``lines`` lines to the perflogs of ``tests`` tests per
+    partition, for runs spread over ``days`` days after ``start``'''
+    partitions = [(s, p) for s, parts in SYSTEMS.items() for p in parts]
+    runs = max(1, lines // (len(partitions) * tests * len(METRICS)))
+    rng = random.Random(jobid)
+    for system, partition in partitions:
+        os.makedirs(os.path.join(prefix, system, partition), exist_ok=True)
+        for t in range(tests):
+            filename = os.path.join(prefix, system, partition,
+                                    f'Test{t}.log')
+            new = not os.path.exists(filename)
+            with open(filename, 'a') as fp:
+                if new:
+                    fp.write(HEADER)
+
+                for r in range(runs):
+                    jobid += 1
+                    when = start + timedelta(days=days * r / runs)
+                    stamp = when.isoformat(timespec='seconds')
+                    info = (f'Test{t} %size={t % 4} /{jobid:08x} '
+                            f'@{system}:{partition}+gnu')
+                    fp.writelines(
+                        f'{stamp}|reframe 4.7.4|{info}|jobid={jobid}|'
+                        f'num_tasks=4|{m}={rng.gauss(100, 5):.3f}|'
+                        f'ref=100 (l=-0.1, u=null)|{unit}\n'
+                        for m, unit in METRICS
+                    )
+
+    return jobid
+
+
+def scan_series(prefix, test, metric, since):
+    '''The samples of a metric found by scanning the text files'''
+    samples = []
+    needle = f'|{metric}='
+    parse = perflog_store.LineParser()
+    for path in perflog_store.find_perflogs([prefix]):
+        with open(path) as fp:
+            for line in fp:
+                if test in line and needle in line:
+                    parsed = parse(line)
+                    if not parsed or parsed[0][3] != test:
+                        continue
+
+                    if parsed[1][0] >= since:
+                        samples.append(parsed[1][:2])
+
+    return samples
+
+
+def scan_window(prefix, system, since):
+    '''The number of samples of a system found by scanning the text
+    files'''
+    count = 0
+    for path in perflog_store.find_perflogs([prefix]):
+        parse = perflog_store.LineParser()
+        with open(path) as fp:
+            for line in fp:
+                parsed = parse(line)
+                if parsed and parsed[0][0] == system and parsed[1][0] >= since:
+                    count += 1
+
+    return count
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=2000000,
+                        help='Number of perflog lines')
+    parser.add_argument('--tests', type=int, default=50,
+                        help='Number of tests per partition')
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prefix = os.path.join(tmpdir, 'perflogs')
+        jobid = write_perflogs(prefix, args.lines, args.tests,
+                               now - timedelta(days=365), 364)
+        db = os.path.join(tmpdir, 'perflogs.db')
+        with perflog_store.PerflogStore(db) as store:
+            stats, full = timed(store.ingest, [prefix])
+            _, noop = timed(store.ingest, [prefix])
+            write_perflogs(prefix, args.lines // 100, args.tests,
+                           now - timedelta(days=1), 1, jobid)
+            update, incremental = timed(store.ingest, [prefix])
+
+            since = perflog_store.parse_time('90d', now)
+            series, query = timed(store.series, since=since,
+                                  system='daint', partition='normal',
+                                  test='Test7 %size=3', metric='bw')
+            samples, = series.values()
+            scanned, scan = timed(scan_series, prefix, 'Test7 %size=3',
+                                  'bw', since)
+            assert len(scanned) == 3 * len(samples)
+            window, window_query = timed(
+                lambda: sum(1 for _ in store.query(since, system='daint'))
+            )
+            window_scanned, window_scan = timed(scan_window, prefix,
+                                                'daint', since)
+            assert window == window_scanned
+
+        size = os.path.getsize(db) / 2**20
+        text = sum(os.path.getsize(p)
+                   for p in perflog_store.find_perflogs([prefix])) / 2**20
+
+    print(f'Full ingest:        {full:.2f} sec ({stats.samples} samples, '
+          f'{stats.samples / full:.0f} lines/sec)')
+    print(f'Unchanged ingest:   {noop:.4f} sec')
+    print(f'Incremental ingest: {incremental:.2f} sec '
+          f'({update.samples} samples)')
+    print(f'Series query:       {query:.4f} sec ({len(samples)} samples)')
+    print(f'Text scan:          {scan:.2f} sec ({scan / query:.0f}x slower)')
+    print(f'Window query:       {window_query:.2f} sec ({window} samples)')
+    print(f'Text scan:          {window_scan:.2f} sec '
+          f'({window_scan / window_query:.0f}x slower)')
+    print(f'Store size:         {size:.0f} MiB ({text:.0f} MiB of perflogs)')
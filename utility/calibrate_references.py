@@ -0,0 +1,270 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Calibrate the performance references on the history of the tests
+
+The references are derived from the samples of a perflog database (see
+``utility/perflog_store.py``) and written to the reference database read by
+the tests with ``PerfReferencesMixin`` (see
+``config/utilities/reference_store.py``):
+
+    python3 utility/calibrate_references.py calibrate \\
+        --perflogs perflogs.db --system daint --partition normal \\
+        --uarch gh200 --test 'XCCLTests*' --since 90d
+    python3 utility/calibrate_references.py show --test 'XCCLTests*'
+
+The samples are grouped by the key of the references. The uarch of a
+partition is given with ``--uarch`` because the perflogs do not record it,
+and the uenv version is taken from the name of the ReFrame environment
+unless ``--version`` is given. The reference value is the median of the last
+``--last`` passing samples, i.e. within the thresholds of the reference
+that they were tested against, and the tolerance is ``--mad-factor`` times
+the robust standard deviation (1.4826 times the median absolute deviation),
+but at least ``--min-tolerance``. A side of the tolerance band that the
+previous reference left open, e.g. the upper one of a bandwidth, stays open.
+'''
+
+import argparse
+import csv
+import math
+import os
+import re
+import statistics
+import sys
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'config',
+                                'utilities'))
+
+from reference_store import (WILDCARD, Reference,             # noqa: E402
+                             ReferenceStore, default_db_file, split_name)
+from perflog_store import PerflogStore, Sample, parse_time    # noqa: E402
+
+# Normal-consistent scale factor of the median absolute deviation
+MAD_SCALE = 1.4826
+
+# Name of a uenv environment: 'name/ver:tag' and the view joined by '_'
+_UENV_ENVIRON = re.compile(r'[^_]+_(\d[^_]*)_([^_]+)_[^_].*$')
+
+
+def environ_version(environ: Optional[str]) -> str:
+    '''The ``ver:tag`` of the uenv of an environment name'''
+    match = _UENV_ENVIRON.match(environ or '')
+    if not match:
+        return WILDCARD
+
+    return f'{match[1]}:{match[2]}'
+
+
+def passed(sample: Sample) -> bool:
+    '''Whether the sample is within the thresholds of its reference'''
+    if sample.value is None:
+        return False
+
+    if not sample.ref:
+        return True
+
+    scale = abs(sample.ref)
+    if sample.lower is not None and \
+       sample.value < sample.ref + sample.lower * scale:
+        return False
+
+    if sample.upper is not None and \
+       sample.value > sample.ref + sample.upper * scale:
+        return False
+
+    return True
+
+
+class UarchMap:
+    '''The uarch of the partitions given as ``uarch``, ``part=uarch`` or
+    ``system:part=uarch``'''
+
+    def __init__(self, specs: Iterable[str]):
+        self._uarchs = {}
+        for spec in specs:
+            partition, _, uarch = spec.rpartition('=')
+            self._uarchs[partition] = uarch
+
+    def __call__(self, system: Optional[str],
+                 partition: Optional[str]) -> Optional[str]:
+        for name in (f'{system}:{partition}', partition, ''):
+            if name in self._uarchs:
+                return self._uarchs[name]
+
+        return None
+
+
+def calibrate(samples: Iterable[Sample], uarch_of: UarchMap,
+              version: Optional[str] = None, last: int = 20,
+              min_samples: int = 5, mad_factor: float = 3.0,
+              min_tolerance: float = 0.05,
+              include_failures: bool = False) -> List[Reference]:
+    '''Derive the references from the samples, ordered by time'''
+    groups: Dict[tuple, List[Sample]] = defaultdict(list)
+    unmapped = set()
+    for s in samples:
+        uarch = uarch_of(s.system, s.partition)
+        if uarch is None:
+            unmapped.add(f'{s.system}:{s.partition}')
+            continue
+
+        test, params = split_name(s.test)
+        key = (s.system or WILDCARD, uarch, test, params,
+               version or environ_version(s.environ), s.metric)
+        groups[key].append(s)
+
+    for name in sorted(unmapped):
+        print(f'warning: no uarch for partition {name}: skipping it '
+              f'(use --uarch)', file=sys.stderr)
+
+    references = []
+    for key, group in groups.items():
+        if not include_failures:
+            group = [s for s in group if passed(s)]
+
+        group = [s for s in group if s.value is not None][-last:]
+        if len(group) < min_samples:
+            continue
+
+        values = [s.value for s in group]
+        median = statistics.median(values)
+        mad = statistics.median(abs(v - median) for v in values)
+        tolerance = min_tolerance
+        if median:
+            tolerance = max(tolerance,
+                            mad_factor * MAD_SCALE * mad / abs(median))
+
+        # Round up to 0.1%
+        tolerance = math.ceil(tolerance * 1000) / 1000
+        lower, upper = -tolerance, tolerance
+        latest = group[-1]
+        if latest.ref and (latest.lower, latest.upper) != (None, None):
+            if latest.lower is None:
+                lower = None
+
+            if latest.upper is None:
+                upper = None
+
+        references.append(Reference(
+            *key, value=median, lower=lower, upper=upper, unit=latest.unit,
+            samples=len(group), first=group[0].time, last=latest.time
+        ))
+
+    return sorted(references)
+
+
+def _print_references(references: Iterable[Reference]):
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['test', 'params', 'system', 'uarch', 'version',
+                     'metric', 'value', 'lower', 'upper', 'unit', 'samples'])
+    for r in references:
+        writer.writerow([r.test, r.params, r.system, r.uarch, r.version,
+                         r.metric, f'{r.value:.6g}', r.lower, r.upper,
+                         r.unit, r.samples])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Calibrate the performance references on the perflog '
+                    'history and manage the reference database'
+    )
+    parser.add_argument('--db', default=default_db_file(),
+                        help=f'The reference database '
+                             f'(default: {default_db_file()})')
+    commands = parser.add_subparsers(dest='command', required=True)
+    calibrate_cmd = commands.add_parser(
+        'calibrate', help='Derive the references from the perflogs'
+    )
+    calibrate_cmd.add_argument('--perflogs', default='perflogs.db',
+                               help='The perflog database '
+                                    '(default: perflogs.db)')
+    for name in ('system', 'partition', 'environ', 'test', 'metric'):
+        calibrate_cmd.add_argument(f'--{name}',
+                                   help=f'Shell-style pattern of the {name}')
+
+    calibrate_cmd.add_argument(
+        '--uarch', action='append', default=[], required=True,
+        metavar='[[SYSTEM:]PARTITION=]UARCH',
+        help='The uarch of the partitions; may be repeated'
+    )
+    calibrate_cmd.add_argument(
+        '--version',
+        help='The uenv or CPE version of the references, or * for any '
+             '(default: from the environment name)'
+    )
+    calibrate_cmd.add_argument('--since', type=parse_time,
+                               help='Ignore the samples before this time: '
+                                    'an ISO date or a time relative to '
+                                    'now, e.g. 90d')
+    calibrate_cmd.add_argument('--last', type=int, default=20,
+                               help='Number of samples to calibrate on '
+                                    '(default: 20)')
+    calibrate_cmd.add_argument('--min-samples', type=int, default=5,
+                               help='Minimum number of samples of a '
+                                    'reference (default: 5)')
+    calibrate_cmd.add_argument('--mad-factor', type=float, default=3.0,
+                               help='Tolerance in robust standard '
+                                    'deviations (default: 3)')
+    calibrate_cmd.add_argument('--min-tolerance', type=float, default=0.05,
+                               help='Minimum relative tolerance '
+                                    '(default: 0.05)')
+    calibrate_cmd.add_argument(
+        '--include-failures', action='store_true',
+        help='Use also the samples outside the thresholds of their '
+             'reference, e.g. to rebase a known regression'
+    )
+    calibrate_cmd.add_argument('--dry-run', action='store_true',
+                               help='Print the references without storing '
+                                    'them')
+    filters = argparse.ArgumentParser(add_help=False)
+    for name in ('system', 'uarch', 'test', 'params', 'version', 'metric'):
+        filters.add_argument(f'--{name}',
+                             help=f'Shell-style pattern of the {name}')
+
+    commands.add_parser('show', parents=[filters],
+                        help='Print the stored references')
+    commands.add_parser('remove', parents=[filters],
+                        help='Remove the stored references')
+    args = parser.parse_args(argv)
+
+    if args.command == 'calibrate':
+        with PerflogStore(args.perflogs) as perflogs:
+            references = calibrate(
+                perflogs.query(args.since, system=args.system,
+                               partition=args.partition,
+                               environ=args.environ, test=args.test,
+                               metric=args.metric),
+                UarchMap(args.uarch), args.version, args.last,
+                args.min_samples, args.mad_factor, args.min_tolerance,
+                args.include_failures
+            )
+
+        _print_references(references)
+        if args.dry_run:
+            return
+
+        with ReferenceStore(args.db) as store:
+            count = store.update(references)
+
+        print(f'Stored {count} references in {args.db}', file=sys.stderr)
+        return
+
+    patterns = {name: getattr(args, name)
+                for name in ('system', 'uarch', 'test', 'params', 'version',
+                             'metric')}
+    with ReferenceStore(args.db) as store:
+        references = store.references(**patterns)
+        if args.command == 'show':
+            _print_references(references)
+        else:
+            count = store.remove(references)
+            print(f'Removed {count} references from {args.db}',
+                  file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
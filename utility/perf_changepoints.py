@@ -0,0 +1,465 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Detect the step changes in the performance history of the tests
+
+The samples are read from a perflog database (see ``utility/perflog_store.py``)
+or from ReFrame JSON reports and grouped into series by test, system,
+partition, environment and performance variable. The environments of the
+different versions of a uenv, e.g. ``prgenv-gnu_24.11_v1_default`` and
+``prgenv-gnu_25.6_v1_default``, belong to the same series, so that a uenv
+update shows up as a step:
+
+    python3 utility/perf_changepoints.py --db perflogs.db --since 180d
+    python3 utility/perf_changepoints.py --report run-report-*.json \\
+        --regressions-only --top 20
+
+The change points are found by binary segmentation with the CUSUM statistic
+of a shift of the mean, i.e. the difference of the means before and after a
+split in units of its standard error, where the noise is estimated robustly
+from the differences of consecutive samples. A split is kept if the
+statistic exceeds ``--threshold`` and the relative change of the mean
+exceeds ``--min-change``. All the series of similar length are segmented at
+once with NumPy.
+
+Every change is attributed to the uenv version, environment, ReFrame
+version or number of tasks that changed next to it and is reported with the
+first job after it. The report is ranked with the regressions first, by the
+size of the relative change. Whether a regression is an increase or a
+decrease is taken from the thresholds of the references, or else from the
+unit: times are better when lower, everything else when higher.
+'''
+
+import argparse
+import csv
+import fnmatch
+import json
+import math
+import re
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from bencher_metric_format import iter_testcases
+from perflog_store import PerflogStore, parse_time
+
+# Normal-consistent scale factor of the median absolute deviation
+MAD_SCALE = 1.4826
+
+# Minimum number of samples on each side of a change
+MIN_SEGMENT = 5
+
+# Maximum number of changes per series
+MAX_CHANGES = 8
+
+# Maximum number of elements of the arrays of a segmentation step
+_CHUNK_ELEMENTS = 1 << 22
+
+# Name of a uenv environment: 'name/ver:tag' and the view joined by '_'
+_UENV_ENVIRON = re.compile(r'([^_]+)_(\d[^_]*)_([^_]+)_([^_].*)$')
+
+_TIME_UNITS = {'s', 'ms', 'us', 'ns', 'min', 'h'}
+
+
+class SeriesKey(NamedTuple):
+    test: str
+    system: Optional[str]
+    partition: Optional[str]
+    environ: Optional[str]
+    metric: str
+
+
+class Change(NamedTuple):
+    '''A change of the mean of a series before the sample at ``index``'''
+    series: SeriesKey
+    index: int
+    time: float
+    jobid: Optional[str]
+    before: float
+    after: float
+    unit: Optional[str]
+    statistic: float
+    regression: bool
+    cause: str
+
+    @property
+    def change(self) -> float:
+        '''The relative change of the mean'''
+        if not self.before:
+            return math.copysign(math.inf, self.after)
+
+        return (self.after - self.before) / abs(self.before)
+
+
+def environ_family(environ: Optional[str]) -> Tuple[Optional[str],
+                                                    Optional[str]]:
+    '''Split the name of an environment into its name without the uenv
+    version and the ``ver:tag`` of the uenv'''
+    match = _UENV_ENVIRON.match(environ or '')
+    if not match:
+        return environ, None
+
+    return f'{match[1]}_{match[4]}', f'{match[2]}:{match[3]}'
+
+
+class History:
+    '''The samples of a series and the metadata of their runs'''
+
+    def __init__(self):
+        self.times = []
+        self.values = []
+        self.jobids = []
+        self.environs = []
+        self.versions = []
+        self.num_tasks = []
+        self.unit = None
+        self.thresholds = (None, None)
+
+    def append(self, time, value, jobid, environ, version, num_tasks, unit,
+               ref, lower, upper):
+        self.times.append(time)
+        self.values.append(value)
+        self.jobids.append(jobid)
+        self.environs.append(environ)
+        self.versions.append(version)
+        self.num_tasks.append(num_tasks)
+        self.unit = unit
+        if ref:
+            self.thresholds = (lower, upper)
+
+    def __len__(self):
+        return len(self.values)
+
+    def sort(self):
+        '''Order the samples by time'''
+        order = np.argsort(self.times, kind='stable')
+        if np.any(order[1:] < order[:-1]):
+            for name in ('times', 'values', 'jobids', 'environs', 'versions',
+                         'num_tasks'):
+                column = getattr(self, name)
+                setattr(self, name, [column[i] for i in order])
+
+    @property
+    def lower_is_better(self) -> bool:
+        lower, upper = self.thresholds
+        if (lower is None) != (upper is None):
+            return lower is None
+
+        return self.unit in _TIME_UNITS
+
+
+def _series_key(test, system, partition, environ, metric) -> SeriesKey:
+    return SeriesKey(test, system, partition, environ_family(environ)[0],
+                     metric)
+
+
+def load_perflogs(filename: str, since: Optional[int] = None,
+                  until: Optional[int] = None,
+                  histories: Optional[Dict[SeriesKey, History]] = None,
+                  **patterns: Optional[str]) -> Dict[SeriesKey, History]:
+    '''Add the samples of a perflog database to the histories'''
+    histories = histories if histories is not None else defaultdict(History)
+    with PerflogStore(filename) as store:
+        for s in store.query(since, until, **patterns):
+            if s.value is None:
+                continue
+
+            histories[_series_key(s.test, s.system, s.partition, s.environ,
+                                  s.metric)].append(
+                s.time, s.value, s.jobid, s.environ, s.version, s.num_tasks,
+                s.unit, s.ref, s.lower, s.upper
+            )
+
+    return histories
+
+
+def load_reports(filenames: Iterable[str], since: Optional[int] = None,
+                 until: Optional[int] = None,
+                 histories: Optional[Dict[SeriesKey, History]] = None,
+                 **patterns: Optional[str]) -> Dict[SeriesKey, History]:
+    '''Add the samples of ReFrame JSON reports to the histories'''
+    histories = histories if histories is not None else defaultdict(History)
+    for filename in filenames:
+        for testcase in iter_testcases(filename):
+            time = testcase.get('job_completion_time_unix')
+            if time is None or not testcase.get('perfvalues'):
+                continue
+
+            if since is not None and time < since:
+                continue
+
+            if until is not None and time >= until:
+                continue
+
+            fields = {'system': testcase['system'],
+                      'partition': testcase['partition'],
+                      'environ': testcase['environ'],
+                      'test': testcase['display_name']}
+            for name, (value, ref, lower, upper, unit, *_) in \
+                    testcase['perfvalues'].items():
+                fields['metric'] = name.split(':')[-1]
+                if value is None or not all(
+                    p is None or fnmatch.fnmatchcase(fields[f] or '', p)
+                    for f, p in patterns.items()
+                ):
+                    continue
+
+                histories[_series_key(**fields)].append(
+                    time, value, testcase.get('jobid'), fields['environ'],
+                    None, testcase.get('num_tasks'), unit, ref, lower, upper
+                )
+
+    return histories
+
+
+def _noise(X: np.ndarray) -> np.ndarray:
+    '''Robust standard deviation of the noise of the padded rows, estimated
+    from the differences of consecutive samples so that the steps do not
+    inflate it'''
+    d = np.diff(X, axis=1)
+    med = np.nanmedian(d, axis=1, keepdims=True)
+    sigma = MAD_SCALE * np.nanmedian(np.abs(d - med), axis=1)
+
+    # Quantized values, e.g. node counts, may have a zero MAD
+    fallback = np.nanstd(d, axis=1)
+    sigma = np.where(sigma > 0, sigma, fallback) / math.sqrt(2)
+    return np.maximum(sigma, np.finfo(float).tiny)
+
+
+def segment(X: np.ndarray, n: np.ndarray, threshold: float,
+            min_change: float, min_size: int = MIN_SEGMENT,
+            max_changes: int = MAX_CHANGES) -> List[Tuple[int, int, float]]:
+    '''Binary segmentation of the rows of ``X``, padded with NaN after
+    their length ``n``; return the (row, index, statistic) of the changes'''
+    R, L = X.shape
+    C = np.zeros((R, L + 1))
+    np.cumsum(np.nan_to_num(X), axis=1, out=C[:, 1:])
+    sigma = _noise(X)
+
+    # The segments still to split
+    rows = np.arange(R)
+    starts = np.zeros(R, dtype=int)
+    ends = n.astype(int)
+    k = np.arange(L + 1)
+    step = max(1, _CHUNK_ELEMENTS // (L + 1))
+    changes = []
+    for _ in range(max_changes):
+        keep = ends - starts >= 2 * min_size
+        rows, starts, ends = rows[keep], starts[keep], ends[keep]
+        if not rows.size:
+            break
+
+        split_rows, split_at, split_starts, split_ends = [], [], [], []
+        for c in range(0, rows.size, step):
+            r, s, e = rows[c:c + step], starts[c:c + step], ends[c:c + step]
+            idx = np.arange(r.size)
+            Cr = C[r]
+            nl = k - s[:, None]
+            nr = e[:, None] - k
+            valid = (nl >= min_size) & (nr >= min_size)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ml = (Cr - Cr[idx, s][:, None]) / nl
+                mr = (Cr[idx, e][:, None] - Cr) / nr
+                stat = np.abs(mr - ml) / np.sqrt(1 / nl + 1 / nr)
+
+            stat = np.where(valid, stat, -1.0)
+            best = np.argmax(stat, axis=1)
+            stat = stat[idx, best] / sigma[r]
+            before, after = ml[idx, best], mr[idx, best]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rel = np.abs(after - before) / np.abs(before)
+
+            accept = (stat > threshold) & (rel > min_change)
+            changes += zip(r[accept].tolist(), best[accept].tolist(),
+                           stat[accept].tolist())
+            split_rows += [r[accept], r[accept]]
+            split_at += [best[accept]]
+            split_starts += [s[accept], best[accept]]
+            split_ends += [best[accept], e[accept]]
+
+        if not split_at:
+            break
+
+        rows = np.concatenate(split_rows)
+        starts = np.concatenate(split_starts)
+        ends = np.concatenate(split_ends)
+
+    return changes
+
+
+def _cause(history: History, index: int, window: int) -> str:
+    '''The metadata that changed closest to the sample at ``index``'''
+    uenvs = [environ_family(e)[1] for e in history.environs]
+    causes = []
+    lo = max(1, index - window)
+    hi = min(len(history), index + window + 1)
+    for name, column in (('uenv', uenvs), ('environ', history.environs),
+                         ('reframe', history.versions),
+                         ('num_tasks', history.num_tasks)):
+        # The environment name changes with the uenv version
+        if name == 'environ' and causes:
+            continue
+
+        moves = [j for j in range(lo, hi) if column[j] != column[j - 1]]
+        if moves:
+            j = min(moves, key=lambda j: abs(j - index))
+            causes.append(f'{name} {column[j - 1]} -> {column[j]}')
+
+    return '; '.join(causes)
+
+
+def detect(histories: Dict[SeriesKey, History], threshold: float = 5.0,
+           min_change: float = 0.05, min_size: int = MIN_SEGMENT,
+           max_changes: int = MAX_CHANGES) -> List[Change]:
+    '''Detect the changes of all the series, segmenting together the series
+    whose lengths are within a factor of two'''
+    buckets = defaultdict(list)
+    for key, history in histories.items():
+        if len(history) >= 2 * min_size:
+            buckets[(len(history) - 1).bit_length()].append(key)
+
+    changes = []
+    for keys in buckets.values():
+        lengths = np.array([len(histories[key]) for key in keys])
+        X = np.full((len(keys), lengths.max()), np.nan)
+        for i, key in enumerate(keys):
+            history = histories[key]
+            history.sort()
+            X[i, :lengths[i]] = history.values
+
+        found = defaultdict(list)
+        for row, index, stat in segment(X, lengths, threshold, min_change,
+                                        min_size, max_changes):
+            found[row].append((index, stat))
+
+        for row, points in found.items():
+            # The means before and after a change are those of its adjacent
+            # segments of the final segmentation
+            points.sort()
+            bounds = [0] + [i for i, _ in points] + [lengths[row]]
+            means = [np.mean(X[row, a:b]) for a, b in zip(bounds, bounds[1:])]
+            history = histories[keys[row]]
+            for j, (index, stat) in enumerate(points):
+                before, after = means[j], means[j + 1]
+                worse = after < before
+                if history.lower_is_better:
+                    worse = not worse
+
+                changes.append(Change(
+                    keys[row], index, history.times[index],
+                    history.jobids[index], float(before), float(after),
+                    history.unit, stat, worse,
+                    _cause(history, index, min_size // 2)
+                ))
+
+    changes.sort(key=lambda c: (not c.regression, -abs(c.change),
+                                -c.statistic))
+    return changes
+
+
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).astimezone().isoformat(
+        timespec='seconds'
+    )
+
+
+_COLUMNS = ('rank', 'kind', 'test', 'system', 'partition', 'environ',
+            'metric', 'time', 'jobid', 'before', 'after', 'unit', 'change',
+            'statistic', 'cause')
+
+
+def _rows(changes: Iterable[Change]) -> Iterable[dict]:
+    for rank, c in enumerate(changes, start=1):
+        yield {
+            'rank': rank,
+            'kind': 'regression' if c.regression else 'improvement',
+            **c.series._asdict(),
+            'time': _isoformat(c.time), 'jobid': c.jobid,
+            'before': round(c.before, 6), 'after': round(c.after, 6),
+            'unit': c.unit, 'change': round(c.change, 4),
+            'statistic': round(c.statistic, 2), 'cause': c.cause
+        }
+
+
+def _print_table(changes: List[Change]):
+    for row in _rows(changes):
+        series = (f'{row["test"]} @{row["system"]}:{row["partition"]}'
+                  f'+{row["environ"]}')
+        print(f'{row["rank"]:4d} {row["kind"]:11s} {row["change"]:+8.1%} '
+              f'{row["metric"]}: {row["before"]:.6g} -> {row["after"]:.6g} '
+              f'{row["unit"] or ""} (z={row["statistic"]:.1f}) {series}')
+        print(f'     since {row["time"]} (jobid {row["jobid"]})'
+              f'{"; " + row["cause"] if row["cause"] else ""}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Detect and rank the step changes of the performance '
+                    'history of the tests'
+    )
+    parser.add_argument('--db', help='Perflog database of perflog_store.py')
+    parser.add_argument('--report', nargs='+', default=[],
+                        help='ReFrame JSON report')
+    for name in ('system', 'partition', 'environ', 'test', 'metric'):
+        parser.add_argument(f'--{name}',
+                            help=f'Shell-style pattern of the {name}')
+
+    parser.add_argument('--since', type=parse_time,
+                        help='Ignore the samples before this time: an ISO '
+                             'date or a time relative to now, e.g. 180d')
+    parser.add_argument('--until', type=parse_time,
+                        help='Ignore the samples after this time')
+    parser.add_argument('--threshold', type=float, default=5.0,
+                        help='Minimum CUSUM statistic of a change, in '
+                             'standard errors (default: 5)')
+    parser.add_argument('--min-change', type=float, default=0.05,
+                        help='Minimum relative change of the mean '
+                             '(default: 0.05)')
+    parser.add_argument('--min-size', type=int, default=MIN_SEGMENT,
+                        help=f'Minimum number of samples on each side of a '
+                             f'change (default: {MIN_SEGMENT})')
+    parser.add_argument('--regressions-only', action='store_true',
+                        help='Report only the regressions')
+    parser.add_argument('--top', type=int,
+                        help='Report only the first changes')
+    parser.add_argument('--format', choices=['table', 'csv', 'json'],
+                        default='table',
+                        help='Output format (default: table)')
+    args = parser.parse_args(argv)
+    if not args.db and not args.report:
+        parser.error('no --db or --report given')
+
+    patterns = {name: getattr(args, name)
+                for name in ('system', 'partition', 'environ', 'test',
+                             'metric')}
+    histories = defaultdict(History)
+    if args.db:
+        load_perflogs(args.db, args.since, args.until, histories, **patterns)
+
+    load_reports(args.report, args.since, args.until, histories, **patterns)
+    changes = detect(histories, args.threshold, args.min_change,
+                     args.min_size)
+    if args.regressions_only:
+        changes = [c for c in changes if c.regression]
+
+    changes = changes[:args.top]
+    print(f'{len(changes)} changes in {len(histories)} series',
+          file=sys.stderr)
+    if args.format == 'json':
+        json.dump(list(_rows(changes)), sys.stdout, indent=2)
+        print()
+    elif args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, _COLUMNS)
+        writer.writeheader()
+        writer.writerows(_rows(changes))
+    else:
+        _print_table(changes)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,543 @@
+# Copyright 2024 Swiss National Supercomputing Centre (CSCS/ETH Zurich)
+# ReFrame Project Developers. See the top-level LICENSE file for details.
+#
+# SPDX-License-Identifier: BSD-3-Clause
+
+'''Indexed store of the ReFrame performance logs
+
+The ``filelog`` perflogs of ``config/common.py`` are ingested into an SQLite
+database, so that the evolution of a metric can be queried without scanning
+the text files:
+
+    python3 utility/perflog_store.py --db perflogs.db ingest $PERFLOG_DIR
+    python3 utility/perflog_store.py --db perflogs.db series --test 'OSU*'
+    python3 utility/perflog_store.py --db perflogs.db query --since 90d \\
+        --system daint --test 'OSU*' --metric bw
+
+Every line is stored as a sample of a series, i.e. a (system, partition,
+environ, test, metric, unit) tuple, and the samples are indexed by series
+and time. The ingestion is incremental: the files are tracked by inode and
+only the lines appended since the previous ingestion are read, including
+after ReFrame renames a perflog to ``.h<N>`` because its header changed.
+'''
+
+import argparse
+import csv
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import (Dict, Iterable, Iterator, List, NamedTuple, Optional,
+                    Tuple)
+
+SCHEMA_VERSION = 1
+
+# Number of samples inserted per transaction
+BATCH_SIZE = 100000
+
+# Size of the chunks read from the perflogs
+CHUNK_SIZE = 1 << 22
+
+# Bytes of the beginning of a file that identify it besides its inode
+_FINGERPRINT_SIZE = 1024
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS series (
+    id INTEGER PRIMARY KEY,
+    system TEXT,
+    partition TEXT,
+    environ TEXT,
+    test TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    unit TEXT,
+    UNIQUE (system, partition, environ, test, metric, unit)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    series INTEGER NOT NULL REFERENCES series (id),
+    time INTEGER NOT NULL,
+    value REAL,
+    ref REAL,
+    lower REAL,
+    upper REAL,
+    jobid INTEGER,
+    num_tasks INTEGER,
+    hash TEXT,
+    version TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (device, inode)
+);
+'''
+_INDEXES = '''
+CREATE INDEX IF NOT EXISTS samples_series_time ON samples (series, time);
+CREATE INDEX IF NOT EXISTS samples_time ON samples (time);
+'''
+
+# '%(check_info)s' of a test: 'name %param=value /hash @system:part+env'
+_CHECK_INFO = re.compile(r'(.*?) /([0-9a-f]+)'
+                         r'(?: @([^:+]+)(?::([^+]+))?)?(?:\+(.+))?$')
+_REF = re.compile(r'ref=(\S*) \(l=(\S*), u=(\S*)\)$')
+
+# Perflogs and the ones renamed by ReFrame when their header changed
+_PERFLOG_NAME = re.compile(r'.+\.log(\.h\d+)?$')
+
+_RELATIVE_TIME = re.compile(r'(\d+(?:\.\d+)?)([smhdw])$')
+_TIME_UNITS = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days',
+               'w': 'weeks'}
+
+_COLUMNS = ('time', 'system', 'partition', 'environ', 'test', 'metric',
+            'value', 'unit', 'ref', 'lower', 'upper', 'jobid', 'num_tasks',
+            'hash', 'version')
+
+
+class Series(NamedTuple):
+    id: int
+    system: Optional[str]
+    partition: Optional[str]
+    environ: Optional[str]
+    test: str
+    metric: str
+    unit: Optional[str]
+
+
+class Sample(NamedTuple):
+    '''A performance value; ``lower`` and ``upper`` are the thresholds
+    relative to ``ref``, as in the test references'''
+    time: int
+    system: Optional[str]
+    partition: Optional[str]
+    environ: Optional[str]
+    test: str
+    metric: str
+    value: Optional[float]
+    unit: Optional[str]
+    ref: Optional[float]
+    lower: Optional[float]
+    upper: Optional[float]
+    jobid: Optional[int]
+    num_tasks: Optional[int]
+    hash: Optional[str]
+    version: Optional[str]
+
+
+class IngestStats(NamedTuple):
+    files: int
+    lines: int
+    samples: int
+    skipped: int
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        # 'null' or 'None'
+        return None
+
+
+def _integer(value: str) -> Optional[int]:
+    return int(value) if value.isdigit() else None
+
+
+class LineParser:
+    '''Parse the lines of a perflog into the series key (system, partition,
+    environ, test, metric, unit) and the sample (time, value, ref, lower,
+    upper, jobid, num_tasks, hash, version)
+
+    None is returned for the header lines and the lines that are not in the
+    ``filelog`` format of ``config/common.py``. The time and the check info
+    are parsed once for the consecutive lines of a test and the references
+    once per perflog.
+    '''
+
+    def __init__(self):
+        self._time = (None, None)
+        self._info = (None, None)
+        self._refs = {}
+
+    def __call__(self, line: str) -> Optional[tuple]:
+        fields = line.split('|')
+        if len(fields) < 8:
+            return None
+
+        timestamp, version = fields[:2]
+        jobid, num_tasks, perf, ref, unit = fields[-5:]
+        # The check info may only contain '|' in parameter values
+        info = fields[2] if len(fields) == 8 else '|'.join(fields[2:-5])
+        valid = (version.startswith('reframe ') and
+                 jobid.startswith('jobid=') and
+                 num_tasks.startswith('num_tasks='))
+        if not valid:
+            return None
+
+        if timestamp != self._time[0]:
+            try:
+                self._time = (timestamp, int(
+                    datetime.fromisoformat(timestamp).timestamp()
+                ))
+            except ValueError:
+                return None
+
+        if info != self._info[0]:
+            info_match = _CHECK_INFO.match(info)
+            if not info_match:
+                return None
+
+            self._info = (info, info_match.groups())
+
+        thresholds = self._refs.get(ref)
+        if thresholds is None:
+            ref_match = _REF.match(ref)
+            if not ref_match:
+                return None
+
+            thresholds = tuple(_number(v) for v in ref_match.groups())
+            self._refs[ref] = thresholds
+
+        metric, _, value = perf.rpartition('=')
+        if not metric:
+            return None
+
+        test, hash_, system, partition, environ = self._info[1]
+        return ((system, partition, environ, test, metric, unit),
+                (self._time[1], _number(value), *thresholds,
+                 _integer(jobid[6:]), _integer(num_tasks[10:]), hash_,
+                 version[8:]))
+
+
+def parse_line(line: str) -> Optional[tuple]:
+    '''Parse a single perflog line; see :class:`LineParser`'''
+    return LineParser()(line)
+
+
+def parse_time(value: str, now: Optional[datetime] = None) -> int:
+    '''Parse an ISO date or a time relative to now, e.g. ``90d`` or ``12h``,
+    into seconds since the epoch'''
+    match = _RELATIVE_TIME.match(value)
+    if match:
+        delta = timedelta(**{_TIME_UNITS[match[2]]: float(match[1])})
+        return int(((now or datetime.now(timezone.utc)) - delta).timestamp())
+
+    return int(datetime.fromisoformat(value).timestamp())
+
+
+def find_perflogs(paths: Iterable[str]) -> List[str]:
+    '''The perflogs in the ``paths``, which are files or directories'''
+    perflogs = []
+    for path in paths:
+        if not os.path.isdir(path):
+            perflogs.append(path)
+            continue
+
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            perflogs += [os.path.join(dirpath, f) for f in sorted(filenames)
+                         if _PERFLOG_NAME.match(f)]
+
+    return perflogs
+
+
+def _fingerprint(fp, size: int) -> str:
+    fp.seek(0)
+    head = fp.read(min(size, _FINGERPRINT_SIZE))
+    return f'{len(head)}:{hashlib.sha1(head).hexdigest()}'
+
+
+class PerflogStore:
+    '''SQLite store of the perflog samples'''
+
+    def __init__(self, filename: str):
+        self._db = sqlite3.connect(filename)
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = NORMAL')
+        self._db.execute('PRAGMA cache_size = -65536')
+        version = self._db.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            raise ValueError(f'{filename}: unsupported schema version '
+                             f'{version}')
+
+        # The indexes are missing if the first ingestion was interrupted
+        self._db.executescript(_SCHEMA + _INDEXES)
+        self._db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._pending = []
+        self._sources = {}
+        self._series_ids = {
+            tuple(row[1:]): row[0]
+            for row in self._db.execute('SELECT * FROM series')
+        }
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _series_id(self, key: tuple) -> int:
+        series_id = self._series_ids.get(key)
+        if series_id is None:
+            series_id = self._db.execute(
+                'INSERT INTO series (system, partition, environ, test, '
+                'metric, unit) VALUES (?, ?, ?, ?, ?, ?)', key
+            ).lastrowid
+            self._series_ids[key] = series_id
+
+        return series_id
+
+    def _ingest_file(self, path: str) -> Tuple[int, int]:
+        '''Read the new lines of a file; the samples are inserted in batches
+        together with the offset of the file'''
+        with open(path, 'rb') as fp:
+            st = os.fstat(fp.fileno())
+            row = self._db.execute(
+                'SELECT offset, fingerprint FROM sources '
+                'WHERE device = ? AND inode = ?', (st.st_dev, st.st_ino)
+            ).fetchone()
+            offset = 0
+            if row:
+                # Another file may have reused the inode
+                prev_offset, fingerprint = row
+                size = int(fingerprint.partition(':')[0])
+                unchanged = _fingerprint(fp, size) == fingerprint
+                if unchanged and prev_offset <= st.st_size:
+                    offset = prev_offset
+
+            if offset == st.st_size:
+                return 0, 0
+
+            fingerprint = _fingerprint(fp, max(offset, st.st_size))
+            fp.seek(offset)
+            lines = skipped = 0
+            parse = LineParser()
+            while True:
+                chunk = fp.read(CHUNK_SIZE)
+                # The last line may still be being written
+                end = chunk.rfind(b'\n') + 1
+                if not end:
+                    break
+
+                fp.seek(offset + end)
+                offset += end
+                text = chunk[:end - 1].decode(errors='replace').split('\n')
+                lines += len(text)
+                for line in text:
+                    parsed = parse(line)
+                    if parsed is None:
+                        skipped += 1
+                        continue
+
+                    self._pending.append(
+                        (self._series_id(parsed[0]),) + parsed[1]
+                    )
+
+                self._sources[st.st_dev, st.st_ino] = (path, offset,
+                                                       fingerprint)
+                if len(self._pending) >= BATCH_SIZE:
+                    self._flush()
+
+            return lines, skipped
+
+    def _flush(self):
+        '''Insert the pending samples and advance the offsets of their
+        files in the same transaction'''
+        with self._db:
+            self._db.executemany(
+                'INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                self._pending
+            )
+            self._db.executemany(
+                'INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)',
+                (k + v for k, v in self._sources.items())
+            )
+
+        self._pending = []
+        self._sources = {}
+
+    def ingest(self, paths: Iterable[str]) -> IngestStats:
+        '''Ingest the lines appended to the perflogs in ``paths`` since the
+        previous ingestion'''
+        # Building the indexes after the first ingestion is faster than
+        # updating them for every sample
+        empty = not self._db.execute('SELECT 1 FROM samples').fetchone()
+        if empty:
+            self._db.executescript('DROP INDEX samples_series_time;'
+                                   'DROP INDEX samples_time;')
+
+        files = lines = skipped = 0
+        for path in find_perflogs(paths):
+            file_lines, file_skipped = self._ingest_file(path)
+            if file_lines:
+                files += 1
+                lines += file_lines
+                skipped += file_skipped
+
+        self._flush()
+        if empty:
+            self._db.executescript(_INDEXES)
+
+        return IngestStats(files, lines, lines - skipped, skipped)
+
+    def find_series(self, system: Optional[str] = None,
+                    partition: Optional[str] = None,
+                    environ: Optional[str] = None,
+                    test: Optional[str] = None,
+                    metric: Optional[str] = None) -> List[Series]:
+        '''The series matching the shell-style patterns'''
+        patterns = (system, partition, environ, test, metric)
+        return [
+            Series(series_id, *key)
+            for key, series_id in sorted(self._series_ids.items(),
+                                         key=lambda s: s[1])
+            if all(p is None or fnmatch.fnmatchcase(v or '', p)
+                   for v, p in zip(key, patterns))
+        ]
+
+    def query(self, since: Optional[int] = None,
+              until: Optional[int] = None,
+              **patterns: Optional[str]) -> Iterator[Sample]:
+        '''The samples of the matching series taken in [since, until),
+        ordered by time; see :func:`find_series` for the patterns'''
+        conditions, params = [], []
+        if since is not None:
+            conditions.append('x.time >= ?')
+            params.append(since)
+
+        if until is not None:
+            conditions.append('x.time < ?')
+            params.append(until)
+
+        if any(p is not None for p in patterns.values()):
+            self._db.execute('CREATE TEMP TABLE IF NOT EXISTS selected '
+                             '(id INTEGER PRIMARY KEY)')
+            with self._db:
+                self._db.execute('DELETE FROM temp.selected')
+                self._db.executemany(
+                    'INSERT INTO temp.selected VALUES (?)',
+                    ((s.id,) for s in self.find_series(**patterns))
+                )
+
+            conditions.append('x.series IN (SELECT id FROM temp.selected)')
+
+        where = f'WHERE {" AND ".join(conditions)}' if conditions else ''
+        cursor = self._db.execute(
+            'SELECT x.time, s.system, s.partition, s.environ, s.test, '
+            's.metric, x.value, s.unit, x.ref, x.lower, x.upper, x.jobid, '
+            'x.num_tasks, x.hash, x.version '
+            f'FROM samples x JOIN series s ON s.id = x.series {where} '
+            'ORDER BY x.time', params
+        )
+        for row in cursor:
+            yield Sample(*row)
+
+    def series(self, since: Optional[int] = None,
+               until: Optional[int] = None,
+               **patterns: Optional[str]) -> Dict[Series,
+                                                  List[Tuple[int, float]]]:
+        '''The (time, value) pairs of every matching series taken in
+        [since, until)'''
+        conditions, params = ['series = ?'], []
+        if since is not None:
+            conditions.append('time >= ?')
+            params.append(since)
+
+        if until is not None:
+            conditions.append('time < ?')
+            params.append(until)
+
+        query = ('SELECT time, value FROM samples '
+                 f'WHERE {" AND ".join(conditions)} ORDER BY time')
+        return {s: self._db.execute(query, [s.id] + params).fetchall()
+                for s in self.find_series(**patterns)}
+
+    def summary(self, **patterns: Optional[str]) -> Iterator[tuple]:
+        '''The number of samples and the time span of the matching series'''
+        for s in self.find_series(**patterns):
+            count, first, last = self._db.execute(
+                'SELECT count(*), min(time), max(time) FROM samples '
+                'WHERE series = ?', (s.id,)
+            ).fetchone()
+            yield s, count, first, last
+
+
+def _isoformat(timestamp: Optional[int]) -> Optional[str]:
+    if timestamp is None:
+        return None
+
+    return datetime.fromtimestamp(timestamp).astimezone().isoformat()
+
+
+def _patterns(args) -> dict:
+    return {'system': args.system, 'partition': args.partition,
+            'environ': args.environ, 'test': args.test,
+            'metric': args.metric}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Ingest the ReFrame perflogs into an SQLite database '
+                    'and query the performance samples'
+    )
+    parser.add_argument('--db', default='perflogs.db',
+                        help='The database file (default: perflogs.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser(
+        'ingest', help='Ingest the new lines of the perflogs'
+    )
+    ingest.add_argument('paths', nargs='+', metavar='path',
+                        help='Perflog file or directory')
+    filters = argparse.ArgumentParser(add_help=False)
+    for name in ('system', 'partition', 'environ', 'test', 'metric'):
+        filters.add_argument(f'--{name}',
+                             help=f'Shell-style pattern of the {name}')
+
+    commands.add_parser('series', parents=[filters],
+                        help='List the series and their time span')
+    query = commands.add_parser('query', parents=[filters],
+                                help='Print the samples in a time window')
+    query.add_argument('--since', type=parse_time,
+                       help='Start of the window: an ISO date or a time '
+                            'relative to now, e.g. 90d, 12h')
+    query.add_argument('--until', type=parse_time,
+                       help='End of the window (default: now)')
+    query.add_argument('--format', choices=['csv', 'json'], default='csv',
+                       help='Output format (default: csv)')
+    args = parser.parse_args(argv)
+
+    with PerflogStore(args.db) as store:
+        if args.command == 'ingest':
+            stats = store.ingest(args.paths)
+            print(f'Ingested {stats.samples} samples from {stats.lines} new '
+                  f'lines of {stats.files} files ({stats.skipped} skipped)')
+        elif args.command == 'series':
+            writer = csv.writer(sys.stdout)
+            writer.writerow(['system', 'partition', 'environ', 'test',
+                             'metric', 'unit', 'samples', 'first', 'last'])
+            for s, count, first, last in store.summary(**_patterns(args)):
+                writer.writerow(list(s[1:]) + [count, _isoformat(first),
+                                               _isoformat(last)])
+        else:
+            samples = store.query(args.since, args.until, **_patterns(args))
+            if args.format == 'json':
+                json.dump([dict(s._asdict(), time=_isoformat(s.time))
+                           for s in samples], sys.stdout, indent=2)
+                print()
+            else:
+                writer = csv.writer(sys.stdout)
+                writer.writerow(_COLUMNS)
+                for s in samples:
+                    writer.writerow((_isoformat(s.time),) + s[1:])
+
+
+if __name__ == '__main__':
+    main()